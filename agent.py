@@ -2,8 +2,11 @@
 
 import os
 import sys
+import json
+import time
 import argparse
 import asyncio
+from typing import Any, Dict, Optional, TextIO
 
 import dotenv
 from pydantic_ai import RunContext
@@ -12,15 +15,25 @@ from pydantic_ai.agent import Agent
 from lightrag import QueryParam
 
 from common import WORKING_DIR, RAGDeps, get_lightrag_instance
+from service.query.cache import get_query_cache
+from service.query.client import QueryServerClient
+from service.query.planner import get_query_planner
+from service.query.shards import load_sharded_rag
+from service.telemetry.metrics import metrics
 
 # Load environment variables from .env file
 dotenv.load_dotenv()
 
+# questions answered at once in --batch mode
+AGENT_BATCH_CONCURRENCY = int(os.getenv("AGENT_BATCH_CONCURRENCY", "4"))
+
 # dictionary to map llm types to model name to be used with Pydantic AI agents
 llm_agent_names: dict[str, str] = {
     "openai": f"openai:{os.getenv('LLM_MODEL', 'gpt-4o-mini')}",
     "gemini": f"google-gla:{os.getenv('LLM_MODEL', 'gemini-2.0-flash')}",
-    "ollama": "not-supported-yet"
+    "ollama": "not-supported-yet",
+    # pydantic-ai's offline TestModel, used by the benchmarks
+    "fake": "test"
 }
 
 # Create the doc AI agent
@@ -44,9 +57,68 @@ async def retrieve(context: RunContext[RAGDeps], search_query: str) -> str:
     Returns:
         Formatted context information from the retrieved documents.
     """
-    return await context.deps.lightrag.aquery(
-        search_query, param=QueryParam(mode="mix")
-    )
+    return await retrieve_context(context.deps, search_query)
+
+async def retrieve_context(deps: RAGDeps, search_query: str) -> str:
+    """Retrieve context for a search query (shared by the tool and the query server).
+
+    Args:
+        deps: The agent dependencies.
+        search_query: The search query to find relevant documents.
+
+    Returns:
+        Formatted context information from the retrieved documents.
+    """
+    if deps.query_server is not None:
+        with metrics.span("retrieve", source="server"):
+            return await deps.query_server.retrieve(search_query)
+
+    async def query() -> str:
+        if deps.query_planner is not None:
+            return await deps.query_planner.aquery(deps.lightrag, search_query)
+        with metrics.span("aquery", mode="mix"):
+            return await deps.lightrag.aquery(
+                search_query, param=QueryParam(mode="mix")
+            )
+
+    with metrics.span("retrieve", source="local"):
+        if deps.query_cache is None:
+            return await query()
+        return await deps.query_cache.get_or_compute(search_query, query)
+
+async def create_rag_deps() -> RAGDeps:
+    """Load the index (or connect to the warm query server) and build the agent dependencies."""
+    if os.getenv("QUERY_SERVER_URL"):
+        return RAGDeps(lightrag=None, query_server=QueryServerClient(os.getenv("QUERY_SERVER_URL")))
+
+    lightrag = await initialize_rag()
+    return RAGDeps(lightrag=lightrag,
+                   query_cache=get_query_cache(lightrag.embedding_func, WORKING_DIR),
+                   query_planner=get_query_planner(lightrag.embedding_func))
+
+async def answer_question(deps: RAGDeps, question: str) -> Dict[str, Any]:
+    """Answer one question, returning the answer with its latency and token usage.
+
+    Args:
+        deps: The agent dependencies, shared between questions.
+        question: The question to answer.
+
+    Returns:
+        A dict with `answer`, `latency_ms` and `usage` (None through the query server).
+    """
+    start = time.perf_counter()
+    with metrics.span("answer"):
+        if deps.lightrag is None:
+            # the query server runs the agent, usage is not reported back
+            answer, usage = await deps.query_server.query(question), None
+        else:
+            result = await doc_agent.run(question, deps=deps)
+            run_usage = result.usage
+            answer = result.output
+            usage = {"requests": run_usage.requests,
+                     "input_tokens": run_usage.input_tokens,
+                     "output_tokens": run_usage.output_tokens}
+    return {"answer": answer, "latency_ms": (time.perf_counter() - start) * 1000, "usage": usage}
 
 async def run_rag_agent(question: str,) -> str:
     """Run the RAG agent to answer a question about URL documentation.
@@ -57,28 +129,115 @@ async def run_rag_agent(question: str,) -> str:
     Returns:
         The agent's response.
     """
+    # Use the warm query server when one is configured
+    if os.getenv("QUERY_SERVER_URL"):
+        return await QueryServerClient(os.getenv("QUERY_SERVER_URL")).query(question)
+
     # Create dependencies
-    lightrag = await initialize_rag()
-    deps = RAGDeps(lightrag=lightrag)
+    deps = await create_rag_deps()
     
     # Run the agent
     result = await doc_agent.run(question, deps=deps)
     
-    return result.data
+    return result.output
+
+def _parse_batch_line(line: str, line_number: int) -> Optional[Dict[str, Any]]:
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        item = json.loads(line)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"line {line_number}: {e}")
+    if isinstance(item, str):
+        item = {"question": item}
+    if not isinstance(item, dict) or not item.get("question"):
+        raise ValueError(f"line {line_number}: expected an object with a 'question'")
+    item.setdefault("id", line_number)
+    return item
+
+async def run_batch(source: TextIO, sink: TextIO, concurrency: int = AGENT_BATCH_CONCURRENCY) -> Dict[str, Any]:
+    """Answer a JSONL stream of questions on one warm set of dependencies.
+
+    Each input line is `{"id": ..., "question": ...}` (or a bare JSON
+    string). Answers are written to `sink` as JSONL in completion order,
+    each with the question's `id`, `latency_ms` and token `usage`; a failed
+    question gets an `error` instead of an `answer`.
+
+    Args:
+        source: The JSONL questions.
+        sink: Where the JSONL answers are written.
+        concurrency: Number of questions answered at once.
+
+    Returns:
+        Totals of the batch: questions, errors, latency percentiles and tokens.
+    """
+    deps = await create_rag_deps()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    latencies = []
+    totals = {"questions": 0, "errors": 0, "input_tokens": 0, "output_tokens": 0}
+
+    async def produce():
+        line_number = 0
+        # questions are read as workers free up, so large inputs are never loaded whole
+        while line := await asyncio.to_thread(source.readline):
+            line_number += 1
+            try:
+                item = _parse_batch_line(line, line_number)
+            except ValueError as e:
+                item = {"id": line_number, "error": f"Invalid input {e}"}
+            if item is not None:
+                await queue.put(item)
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    async def work():
+        while (item := await queue.get()) is not None:
+            record = {"id": item["id"], "question": item.get("question")}
+            if "error" in item:
+                record["error"] = item["error"]
+            else:
+                try:
+                    record.update(await answer_question(deps, item["question"]))
+                    latencies.append(record["latency_ms"])
+                    for key in ("input_tokens", "output_tokens"):
+                        totals[key] += (record["usage"] or {}).get(key) or 0
+                except Exception as e:
+                    record["error"] = str(e)
+            totals["questions"] += 1
+            totals["errors"] += "error" in record
+            sink.write(json.dumps(record, default=str) + "\n")
+            sink.flush()
+
+    try:
+        await asyncio.gather(produce(), *(work() for _ in range(concurrency)))
+    finally:
+        if deps.lightrag is not None:
+            await deps.lightrag.finalize_storages()
+
+    latencies.sort()
+    totals["latency_p50_ms"] = latencies[len(latencies) // 2] if latencies else 0.0
+    totals["latency_p95_ms"] = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else 0.0
+    return totals
 
 async def initialize_rag():
+    # a sharded index (build.py --shards) fans each query out to its shards
+    sharded = await load_sharded_rag(os.getenv("LLM_TYPE"), WORKING_DIR)
+    if sharded:
+        return sharded
+
     rag = get_lightrag_instance(os.getenv("LLM_TYPE"))
     await rag.initialize_storages()
     return rag
 
 def main():
-    if not os.path.exists(WORKING_DIR):
+    if not os.getenv("QUERY_SERVER_URL") and not os.path.exists(WORKING_DIR):
         print(f"Error: {WORKING_DIR} must be present and contains RAG docs.")
         sys.exit(1)
 
-    if not os.getenv("LLM_TYPE") or os.getenv("LLM_TYPE") not in ["openai", "gemini", "ollama"]:
+    if not os.getenv("LLM_TYPE") or os.getenv("LLM_TYPE") not in ["openai", "gemini", "ollama", "fake"]:
         print("Error: LLM_TYPE environment variable not set or invalid.")
-        print("Please create a .env file with LLM_TYPE set to 'openai', 'gemini', or 'ollama'.")
+        print("Please create a .env file with LLM_TYPE set to 'openai', 'gemini', 'ollama', or 'fake' (offline).")
         sys.exit(1)
 
     if not os.getenv("LLM_MODEL"):
@@ -100,16 +259,38 @@ def main():
 
     """Main function to parse arguments and run the RAG agent."""
     parser = argparse.ArgumentParser(description="Run a URL agent with RAG using LightRAG")
-    parser.add_argument("--question", help="The question to answer about URL documentation", required=True)
+    parser.add_argument("--question", help="The question to answer about URL documentation")
+    parser.add_argument("--batch", help="Answer the questions of a JSONL file ('-' for stdin), one {\"id\", \"question\"} object per line")
+    parser.add_argument("--output", help="Write the --batch answers as JSONL to this file (default: stdout)")
+    parser.add_argument("--concurrency", type=int, default=AGENT_BATCH_CONCURRENCY, help="Questions answered at once in --batch mode")
     
     args = parser.parse_args()
+    if not args.question and not args.batch:
+        parser.error("one of --question or --batch is required")
+
+    if args.batch:
+        source = sys.stdin if args.batch == "-" else open(args.batch, "r", encoding="utf-8")
+        sink = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+        try:
+            totals = asyncio.run(run_batch(source, sink, max(1, args.concurrency)))
+        finally:
+            for f in (source, sink):
+                if f not in (sys.stdin, sys.stdout):
+                    f.close()
+        if os.getenv("METRICS_FILE"):
+            metrics.write(os.getenv("METRICS_FILE"))
+        print(f"Answered {totals['questions']} questions ({totals['errors']} errors), "
+              f"p50 {totals['latency_p50_ms']:.0f} ms, p95 {totals['latency_p95_ms']:.0f} ms, "
+              f"{totals['input_tokens']} input / {totals['output_tokens']} output tokens", file=sys.stderr)
+        sys.exit(1 if totals["errors"] else 0)
     
     # Run the agent
     response = asyncio.run(run_rag_agent(args.question))
+    if os.getenv("METRICS_FILE"):
+        metrics.write(os.getenv("METRICS_FILE"))
     
     print("\nResponse:")
     print(response)
 
-
 if __name__ == "__main__":
     main()
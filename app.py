@@ -18,23 +18,13 @@ from pydantic_ai.messages import (
     ModelMessagesTypeAdapter
 )
 
-from common import WORKING_DIR, RAGDeps, get_lightrag_instance
+from common import WORKING_DIR
 
-from agent import doc_agent
+from agent import create_rag_deps, doc_agent
+from service.chat.history import compact_history, compact_tool_returns, render_throttled
 
 load_dotenv()
 
-async def get_agent_deps():
-    """
-    Creates a LightRAG instance
-    And then uses that to create the agent dependencies.
-    """
-    rag = get_lightrag_instance(os.getenv("LLM_TYPE"))
-    await rag.initialize_storages()
-    deps = RAGDeps(lightrag=rag)
-    return deps
-
-
 def display_message_part(part):
     """
     Display a single part of a message in the Streamlit UI.
@@ -51,14 +41,18 @@ def display_message_part(part):
             st.markdown(part.content)             
 
 async def run_agent_with_streaming(user_input):
+    # old tool returns are cut and old turns dropped so each turn sends a bounded history
+    history = compact_history(st.session_state.messages)
     async with doc_agent.run_stream(
-        user_input, deps=st.session_state.agent_deps, message_history=st.session_state.messages
+        user_input, deps=st.session_state.agent_deps, message_history=history
     ) as result:
         async for message in result.stream_text(delta=True):  
             yield message
 
-    # Add the new messages to the chat history (including tool calls and responses)
+    # Add the new messages to the chat history (including tool calls and responses);
+    # old tool returns are never displayed, so they are kept cut down in the session too
     st.session_state.messages.extend(result.new_messages())
+    st.session_state.messages = [m for turn in compact_tool_returns(st.session_state.messages) for m in turn]
 
 
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
@@ -68,7 +62,7 @@ async def run_agent_with_streaming(user_input):
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
 async def main():
-    if not os.path.exists(WORKING_DIR):
+    if not os.getenv("QUERY_SERVER_URL") and not os.path.exists(WORKING_DIR):
         print(f"Error: {WORKING_DIR} must be present and contains RAG docs.")
         sys.exit(1)
 
@@ -78,7 +72,7 @@ async def main():
     if "messages" not in st.session_state:
         st.session_state.messages = []
     if "agent_deps" not in st.session_state:
-        st.session_state.agent_deps = await get_agent_deps()  
+        st.session_state.agent_deps = await create_rag_deps()  
 
     # Display all messages from the conversation so far
     # Each message is either a ModelRequest or ModelResponse.
@@ -100,16 +94,9 @@ async def main():
         with st.chat_message("assistant"):
             # Create a placeholder for the streaming text
             message_placeholder = st.empty()
-            full_response = ""
-            
-            # Properly consume the async generator with async for
-            generator = run_agent_with_streaming(user_input)
-            async for message in generator:
-                full_response += message
-                message_placeholder.markdown(full_response + "▌")
-            
-            # Final response without the cursor
-            message_placeholder.markdown(full_response)
+
+            # Re-render the accumulated markdown on a time slice, not on every delta
+            await render_throttled(run_agent_with_streaming(user_input), message_placeholder.markdown)
 
 
 if __name__ == "__main__":
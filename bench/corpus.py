@@ -0,0 +1,46 @@
+"""Deterministic fixture markdown corpora for the offline benchmarks."""
+import random
+from typing import Dict
+
+# number of documents per corpus size
+CORPUS_SIZES = {"small": 20, "medium": 200, "large": 1000}
+
+_TOPICS = ["Deployment", "Gateway", "Scheduler", "Ingestion", "Storage", "Telemetry", "Billing",
+           "Identity", "Surveillance", "Frontend", "Backend", "Pipeline", "Cache", "Registry"]
+_TERMS = ["Kubernetes", "Postgres", "Redis", "Kafka", "Golang", "Python", "Terraform", "Docker",
+          "Grafana", "Prometheus", "OpenAPI", "GraphQL", "Nginx", "Dapr", "Helm", "Azure"]
+_WORDS = ("the service uses a to and for with each request is configured by default when "
+          "deploy run build test config cluster node queue worker event stream retry timeout "
+          "version release owner team document endpoint handler client server").split()
+
+def _paragraph(rng: random.Random) -> str:
+    words = [rng.choice(_WORDS) for _ in range(rng.randint(40, 90))]
+    for _ in range(rng.randint(2, 5)):
+        words.insert(rng.randrange(len(words)), rng.choice(_TERMS))
+    return " ".join(words).capitalize() + "."
+
+def generate_document(index: int, seed: int = 0) -> str:
+    """Generate one deterministic markdown document."""
+    rng = random.Random(seed * 100003 + index)
+    topic = _TOPICS[index % len(_TOPICS)]
+    sections = [f"# {topic} {index}\n\n{_paragraph(rng)}"]
+    for _ in range(rng.randint(2, 6)):
+        sections.append(f"## {rng.choice(_TERMS)} {rng.choice(['Setup', 'Usage', 'Architecture', 'FAQ'])}\n\n"
+                        + "\n\n".join(_paragraph(rng) for _ in range(rng.randint(1, 3))))
+    if rng.random() < 0.3:
+        sections.append("```bash\nhelm install " + topic.lower() + f" ./charts/{topic.lower()}\n```")
+    return "\n\n".join(sections) + "\n"
+
+def generate_corpus(size: str, seed: int = 0) -> Dict[str, str]:
+    """Generate a corpus as a map of repo-relative path -> markdown."""
+    count = CORPUS_SIZES[size]
+    return {f"docs/{_TOPICS[i % len(_TOPICS)].lower()}/doc-{i:04d}.md": generate_document(i, seed) for i in range(count)}
+
+def generate_questions(count: int, seed: int = 0) -> list[str]:
+    """Generate distinct questions about the corpus topics."""
+    rng = random.Random(seed)
+    templates = ["How do I deploy {t} with {u}?", "Which language is the {t} backend written in?",
+                 "Can you describe the {t} architecture?", "How does {t} use {u}?",
+                 "What is the default timeout of the {t} worker?"]
+    return [rng.choice(templates).format(t=rng.choice(_TOPICS), u=rng.choice(_TERMS)) + f" ({i})"
+            for i in range(count)]
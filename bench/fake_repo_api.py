@@ -0,0 +1,100 @@
+"""Local stand-in for the GitHub and GitLab tree/file APIs used by the repo services.
+
+Serves (per repo `owner/name`):
+    GitHub:  /repos/{o}/{r}, /repos/{o}/{r}/git/trees/HEAD, /raw/{o}/{r}/{ref}/{path}
+    GitLab:  /api/v4/projects/{o}%2F{r}, .../repository/tree (paginated), .../repository/blobs/{sha}/raw
+"""
+import json
+import time
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+from urllib.parse import parse_qs, unquote, urlparse
+
+def blob_sha(content: str) -> str:
+    """Git blob SHA of a file's content."""
+    data = content.encode("utf-8")
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+class FakeRepoApi:
+    """Threaded HTTP server holding `{owner/name: {path: markdown}}` repos.
+
+    Args:
+        repos: The repositories to serve.
+        latency_ms: Artificial latency added to every response.
+    """
+    def __init__(self, repos: Dict[str, Dict[str, str]], latency_ms: float = 0.0):
+        self.repos = repos
+        self.latency_ms = latency_ms
+        self.blobs = {blob_sha(content): content for files in repos.values() for content in files.values()}
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                time.sleep(api.latency_ms / 1000)
+                status, headers, body = api.route(self.path)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def route(self, raw_path: str):
+        parsed = urlparse(raw_path)
+        path, query = parsed.path, parse_qs(parsed.query)
+        parts = path.strip("/").split("/")
+
+        if parts[:1] == ["repos"] and len(parts) >= 3:
+            files = self.repos.get(f"{parts[1]}/{parts[2]}")
+            if files is None:
+                return _json(404, {"message": "Not Found"})
+            if len(parts) == 3:
+                return _json(200, {"default_branch": "main"})
+            tree = [{"path": p, "type": "blob", "sha": blob_sha(c)} for p, c in sorted(files.items())]
+            return _json(200, {"tree": tree, "truncated": False})
+
+        if parts[:1] == ["raw"] and len(parts) >= 5:
+            files = self.repos.get(f"{parts[1]}/{parts[2]}", {})
+            content = files.get(unquote("/".join(parts[4:])))
+            return (200, {"Content-Type": "text/plain"}, content.encode()) if content is not None else _json(404, {})
+
+        if parts[:3] == ["api", "v4", "projects"] and len(parts) >= 4:
+            files = self.repos.get(unquote(parts[3]))
+            if files is None:
+                return _json(404, {"message": "404 Project Not Found"})
+            if len(parts) == 4:
+                return _json(200, {"default_branch": "main"})
+            if parts[4:6] == ["repository", "tree"]:
+                page, per_page = int(query.get("page", ["1"])[0]), int(query.get("per_page", ["20"])[0])
+                items = [{"path": p, "type": "blob", "id": blob_sha(c)} for p, c in sorted(files.items())]
+                total_pages = max(1, -(-len(items) // per_page))
+                headers = {"x-total-pages": str(total_pages)}
+                if page < total_pages:
+                    headers["x-next-page"] = str(page + 1)
+                status, base_headers, body = _json(200, items[(page - 1) * per_page:page * per_page])
+                return status, {**base_headers, **headers}, body
+            if parts[4:6] == ["repository", "blobs"] and len(parts) == 8:
+                content = self.blobs.get(parts[6])
+                return (200, {"Content-Type": "text/plain"}, content.encode()) if content is not None else _json(404, {})
+
+        return _json(404, {"message": "Not Found"})
+
+def _json(status: int, payload) -> tuple:
+    return status, {"Content-Type": "application/json"}, json.dumps(payload).encode("utf-8")
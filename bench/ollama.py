@@ -0,0 +1,198 @@
+"""
+bench/ollama.py
+--------------
+Throughput benchmark of the Ollama provider against a local stub server.
+
+The stub stands in for a CPU-only Ollama box: it serves /api/embed and
+/api/chat with `--server-slots` requests computed at once, each taking
+`--ms-per-token` per estimated token; further requests queue (their latency
+climbs) and beyond `--server-queue` are rejected with 503, as Ollama does
+when OLLAMA_MAX_QUEUE is exceeded. The benchmark embeds the fixture corpus in
+chunks the way LightRAG does (`--call-size` texts per call, `--lightrag-async`
+calls in flight) and runs a few completions concurrently. Reports:
+- embedding throughput (texts/sec) and p95 call latency;
+- completion p95 latency;
+- retries/backoffs and the final concurrency limits.
+
+Usage:
+    python3 -m bench.ollama [--corpus small|medium|large] [--embed-concurrency 2] [--llm-concurrency 2]
+"""
+import os
+import json
+import time
+import hashlib
+import asyncio
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+from bench.corpus import CORPUS_SIZES, generate_corpus
+
+STUB_EMBEDDING_DIM = 64
+
+class StubOllama:
+    """Threaded stand-in for an Ollama server with a fixed number of compute slots.
+
+    Args:
+        slots: Requests computed at once (the CPU's capacity).
+        ms_per_token: Compute time per estimated token.
+        max_queue: Requests waiting beyond this are answered with 503.
+    """
+    def __init__(self, slots: int = 2, ms_per_token: float = 0.05, max_queue: int = 16):
+        self.ms_per_token = ms_per_token
+        self.max_queue = max_queue
+        self.slots = threading.Semaphore(slots)
+        self.waiting = 0
+        self.lock = threading.Lock()
+        self.requests: Dict[str, int] = {"embed": 0, "chat": 0, "rejected": 0}
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", "0"))) or b"{}")
+                status, body = stub.handle(self.path, payload)
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _compute(self, texts: List[str]):
+        with self.lock:
+            if self.waiting >= self.max_queue:
+                self.requests["rejected"] += 1
+                return False
+            self.waiting += 1
+        try:
+            with self.slots:
+                time.sleep(sum(len(text) // 4 + 1 for text in texts) * self.ms_per_token / 1000)
+        finally:
+            with self.lock:
+                self.waiting -= 1
+        return True
+
+    def handle(self, path: str, payload: dict) -> tuple:
+        if path == "/api/embed":
+            texts = payload.get("input") or []
+            texts = [texts] if isinstance(texts, str) else texts
+            if not self._compute(texts):
+                return 503, b'{"error": "server busy"}'
+            self.requests["embed"] += 1
+            embeddings = [_stub_embedding(text) for text in texts]
+            return 200, json.dumps({"model": payload.get("model"), "embeddings": embeddings}).encode()
+
+        if path == "/api/chat":
+            messages = payload.get("messages") or []
+            if not self._compute([m.get("content", "") for m in messages]):
+                return 503, b'{"error": "server busy"}'
+            self.requests["chat"] += 1
+            return 200, json.dumps({"message": {"role": "assistant", "content": "stub answer"}, "done": True}).encode()
+
+        return 404, b'{"error": "not found"}'
+
+def _stub_embedding(text: str) -> List[float]:
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    return [(digest[i % len(digest)] - 128) / 128 for i in range(STUB_EMBEDDING_DIM)]
+
+def _chunks(corpus: Dict[str, str], chunk_chars: int) -> List[str]:
+    chunks = []
+    for content in corpus.values():
+        chunks.extend(content[i:i + chunk_chars] for i in range(0, len(content), chunk_chars))
+    return chunks
+
+def _p95(values: List[float]) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] if ordered else 0.0
+
+async def _run(args) -> Dict[str, float]:
+    # imported after the environment points the provider at the stub
+    from service.llm import ollama
+    from service.telemetry.metrics import metrics
+
+    chunks = _chunks(generate_corpus(args.corpus, seed=args.seed), args.chunk_chars)
+    calls = [chunks[i:i + args.call_size] for i in range(0, len(chunks), args.call_size)]
+    lightrag_slots = asyncio.Semaphore(args.lightrag_async)
+    call_ms: List[float] = []
+
+    async def embed_call(texts: List[str]):
+        async with lightrag_slots:
+            start = time.perf_counter()
+            await ollama.ollama_embedding_func(texts)
+            call_ms.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(embed_call(texts) for texts in calls))
+    embed_seconds = time.perf_counter() - start
+
+    chat_ms: List[float] = []
+
+    async def chat_call(prompt: str):
+        start = time.perf_counter()
+        await ollama.ollama_model_func(prompt, system_prompt="Extract entities.")
+        chat_ms.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(chat_call(chunk) for chunk in chunks[:args.completions]))
+
+    backoffs = sum(value for (name, _), value in metrics.counters.items() if name == "ollama_backoffs_total")
+    return {
+        "texts": len(chunks),
+        "embed_texts_per_sec": len(chunks) / embed_seconds if embed_seconds else 0.0,
+        "embed_call_p95_ms": _p95(call_ms),
+        "embed_requests": metrics.counters.get(("ollama_embed_batches_total", ()), 0),
+        "chat_p95_ms": _p95(chat_ms),
+        "backoffs": backoffs,
+        "final_embed_limit": ollama.get_limiter("embed").limit,
+        "final_llm_limit": ollama.get_limiter("llm").limit,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Ollama provider benchmark against a stub server")
+    parser.add_argument("--corpus", choices=sorted(CORPUS_SIZES), default="small", help="fixture corpus size")
+    parser.add_argument("--seed", type=int, default=0, help="corpus seed")
+    parser.add_argument("--chunk-chars", type=int, default=1200, help="characters per embedded chunk")
+    parser.add_argument("--call-size", type=int, default=10, help="texts per embedding call (LightRAG's embedding_batch_num)")
+    parser.add_argument("--lightrag-async", type=int, default=8, help="embedding calls in flight (LightRAG's embedding_func_max_async)")
+    parser.add_argument("--completions", type=int, default=16, help="completions to run concurrently")
+    parser.add_argument("--embed-concurrency", type=int, default=2, help="OLLAMA_EMBED_CONCURRENCY")
+    parser.add_argument("--llm-concurrency", type=int, default=2, help="OLLAMA_LLM_CONCURRENCY")
+    parser.add_argument("--batch-tokens", type=int, default=8192, help="OLLAMA_EMBED_BATCH_TOKENS")
+    parser.add_argument("--server-slots", type=int, default=2, help="requests the stub computes at once")
+    parser.add_argument("--server-queue", type=int, default=16, help="queued requests before the stub answers 503")
+    parser.add_argument("--ms-per-token", type=float, default=0.05, help="stub compute time per token")
+    args = parser.parse_args()
+
+    with StubOllama(args.server_slots, args.ms_per_token, args.server_queue) as stub:
+        os.environ.update({
+            "LLM_BINDING_HOST": stub.url,
+            "EMBEDDING_BINDING_HOST": stub.url,
+            "OLLAMA_EMBED_CONCURRENCY": str(args.embed_concurrency),
+            "OLLAMA_LLM_CONCURRENCY": str(args.llm_concurrency),
+            "OLLAMA_EMBED_BATCH_TOKENS": str(args.batch_tokens),
+        })
+        results = asyncio.run(_run(args))
+        results["stub_rejected"] = stub.requests["rejected"]
+
+    for metric, value in results.items():
+        print(f"{metric:>20}: {value:.2f}" if isinstance(value, float) else f"{metric:>20}: {value}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+bench/run.py
+--------------
+Offline build and query benchmark.
+
+Serves a fixture corpus from a local stand-in for the GitHub/GitLab APIs
+(or from local directories with `--source local`),
+builds it with the deterministic `fake` provider through the real build
+pipeline, then runs questions through the agent's retrieve path. Reports:
+- listing latency per repo;
+- build throughput (docs/sec);
+- p50/p95 query latency through `agent.retrieve_context`;
+- peak RSS;
+- the per-stage timing table from `service.telemetry.metrics`.
+
+Results can be saved as a JSON baseline and compared against a previous one.
+
+Usage:
+    python3 -m bench.run [--corpus small|medium|large] [--source api|local] [--output baseline.json] [--compare baseline.json]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import resource
+import tempfile
+import statistics
+from typing import Dict, List
+
+from bench.corpus import CORPUS_SIZES, generate_corpus, generate_questions
+from bench.fake_repo_api import FakeRepoApi
+
+# metrics where higher is better; everything else is lower-is-better
+HIGHER_IS_BETTER = {"build_docs_per_sec"}
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def _peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+def _write_repos(repos: Dict[str, Dict[str, str]], root: str):
+    for name, files in repos.items():
+        for path, content in files.items():
+            full_path = os.path.join(root, name.split("/")[-1], path)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with open(full_path, "w", encoding="utf-8") as f:
+                f.write(content)
+
+def _split_repos(corpus: Dict[str, str], repos: int) -> Dict[str, Dict[str, str]]:
+    split: Dict[str, Dict[str, str]] = {f"bench/repo{i}": {} for i in range(repos)}
+    for index, (path, content) in enumerate(sorted(corpus.items())):
+        split[f"bench/repo{index % repos}"][path] = content
+    return split
+
+async def _run(args) -> Dict[str, float]:
+    # imported after the environment points the services at the stand-in API
+    from build import initialize_rag
+    from agent import retrieve_context
+    from common import WORKING_DIR, RAGDeps
+    from service.build.manifest import MANIFEST_FILE, BuildManifest
+    from service.build.pipeline import BuildPipeline
+    from service.query.planner import QueryPlanner
+    from service.repo.http import aclose_http_client
+    from service.repo.typex import get_repo_md_files
+    from service.telemetry.metrics import metrics
+
+    if args.source == "local":
+        repo_urls = [os.path.abspath(os.path.join("repos", f"repo{i}")) for i in range(args.repos)]
+    else:
+        # even repos are served as GitHub, odd repos as GitLab
+        repo_urls = [f"https://{'github.com' if i % 2 == 0 else 'gitlab.com'}/bench/repo{i}" for i in range(args.repos)]
+
+    listing_ms = []
+    files = []
+    for repo_url in repo_urls:
+        start = time.perf_counter()
+        listed = await get_repo_md_files(repo_url)
+        listing_ms.append((time.perf_counter() - start) * 1000)
+        files.extend(listed)
+
+    rag = await initialize_rag()
+    manifest = BuildManifest(os.path.join(WORKING_DIR, MANIFEST_FILE))
+    start = time.perf_counter()
+    stats = await BuildPipeline(rag, manifest, max_concurrent=args.max_concurrent).run(files)
+    build_seconds = time.perf_counter() - start
+    await aclose_http_client()
+
+    # without --planner every query runs in mix mode, as in the recorded baselines
+    planner = QueryPlanner(rag.embedding_func, latency_budget_ms=args.latency_budget_ms) if args.planner else None
+    deps = RAGDeps(lightrag=rag, query_planner=planner)
+    query_ms = []
+    for question in generate_questions(args.queries, seed=args.seed):
+        start = time.perf_counter()
+        await retrieve_context(deps, question)
+        query_ms.append((time.perf_counter() - start) * 1000)
+    await rag.finalize_storages()
+    print(metrics.summary_table())
+    if planner:
+        for mode, mode_stats in planner.summary().items():
+            print(f"planner {mode:>7}: {mode_stats['count']} queries, {mode_stats['mean_ms']:.1f} ms mean")
+
+    return {
+        "docs": stats["inserted"],
+        "listing_ms_mean": statistics.mean(listing_ms),
+        "listing_ms_max": max(listing_ms),
+        "build_seconds": build_seconds,
+        "build_docs_per_sec": stats["inserted"] / build_seconds if build_seconds else 0.0,
+        "query_p50_ms": _percentile(query_ms, 50),
+        "query_p95_ms": _percentile(query_ms, 95),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+def compare(current: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> List[str]:
+    """Return the metrics that regressed by more than `tolerance` (a fraction)."""
+    regressions = []
+    for metric, value in current.items():
+        base = baseline.get(metric)
+        if not base or metric == "docs":
+            continue
+        change = (value - base) / base
+        if metric in HIGHER_IS_BETTER:
+            change = -change
+        if change > tolerance:
+            regressions.append(f"{metric}: {base:.2f} -> {value:.2f} ({change:+.0%})")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline build and query benchmark")
+    parser.add_argument("--corpus", choices=sorted(CORPUS_SIZES), default="small", help="fixture corpus size")
+    parser.add_argument("--repos", type=int, default=4, help="number of repos to split the corpus across")
+    parser.add_argument("--queries", type=int, default=50, help="number of questions to time")
+    parser.add_argument("--max-concurrent", type=int, default=20, help="maximum concurrent fetches")
+    parser.add_argument("--source", choices=["api", "local"], default="api",
+                        help="serve the corpus from the stand-in GitHub/GitLab API or read it from local directories")
+    parser.add_argument("--api-latency-ms", type=float, default=5.0, help="latency added by the stand-in API")
+    parser.add_argument("--planner", action="store_true", help="pick the retrieval mode per question with the query planner")
+    parser.add_argument("--latency-budget-ms", type=float, default=0.0, help="query planner latency budget (0 disables)")
+    parser.add_argument("--seed", type=int, default=0, help="corpus and question seed")
+    parser.add_argument("--output", help="save the results as a JSON baseline")
+    parser.add_argument("--compare", help="compare against a JSON baseline and fail on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression before failing (fraction)")
+    args = parser.parse_args()
+    output = os.path.abspath(args.output) if args.output else None
+    baseline_path = os.path.abspath(args.compare) if args.compare else None
+
+    repos = _split_repos(generate_corpus(args.corpus, seed=args.seed), args.repos)
+    with FakeRepoApi(repos, latency_ms=args.api_latency_ms) as api, tempfile.TemporaryDirectory() as workdir:
+        os.environ.update({
+            "LLM_TYPE": "fake",
+            "LLM_MODEL": "fake",
+            "GITHUB_TOKEN": "bench",
+            "GITLAB_TOKEN": "bench",
+            "GITHUB_API_URL": api.url,
+            "GITHUB_RAW_URL": f"{api.url}/raw",
+            "GITLAB_BASE_URL": api.url,
+            "HTTP_CACHE": "0",
+        })
+        # the working dir is relative, so a scratch cwd keeps ./url-docs untouched
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        _write_repos(repos, os.path.join(workdir, "repos"))
+        try:
+            results = asyncio.run(_run(args))
+        finally:
+            os.chdir(cwd)
+
+    results = {"corpus": args.corpus, "source": args.source, **results}
+    for metric, value in results.items():
+        print(f"{metric:>20}: {value:.2f}" if isinstance(value, float) else f"{metric:>20}: {value}")
+
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if baseline_path:
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if (baseline.get("corpus"), baseline.get("source", "api")) != (args.corpus, args.source):
+            print(f"Warning: baseline was recorded on the {baseline.get('corpus')} corpus from {baseline.get('source', 'api')}")
+        regressions = compare({k: v for k, v in results.items() if k not in ("corpus", "source")}, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+bench/startup.py
+--------------
+Import-time startup budget check.
+
+For every provider, starts a fresh interpreter with `-X importtime`, imports
+the entry-point modules and builds that provider's LightRAG instance, then:
+- fails if a heavy module belonging to another provider was imported;
+- fails if the total import time exceeds the budget.
+
+Usage:
+    python3 -m bench.startup [--budget-ms 3000] [--output startup.json]
+"""
+import os
+import re
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+from typing import Dict, List
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# heavy modules that must only be imported by the provider that needs them
+HEAVY_MODULES: Dict[str, List[str]] = {
+    "openai": ["lightrag.llm.openai"],
+    "gemini": ["google.genai", "sentence_transformers", "torch"],
+    "ollama": ["lightrag.llm.ollama"],
+}
+
+# modules that must never be imported at startup (e.g. only needed to crawl websites)
+ALWAYS_LAZY = ["crawl4ai", "playwright", "sentence_transformers", "torch"]
+
+STARTUP_CODE = """
+import resource, sys
+import common, build
+common.get_lightrag_instance(sys.argv[1])
+# ru_maxrss is reported in bytes on macOS and in KB elsewhere
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // (1024 if sys.platform == "darwin" else 1))
+"""
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+def measure(provider: str) -> Dict[str, object]:
+    """Import the entry points for one provider in a fresh interpreter."""
+    env = {**os.environ, "LLM_TYPE": provider, "LLM_MODEL": os.getenv("LLM_MODEL", "bench"),
+           "PYTHONPATH": REPO_DIR + os.pathsep + os.getenv("PYTHONPATH", "")}
+    env.setdefault("OPENAI_API_KEY", "bench")
+    env.setdefault("GEMINI_API_KEY", "bench")
+    with tempfile.TemporaryDirectory() as cwd:
+        # run from a scratch dir so the instance's working dir is throwaway
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", STARTUP_CODE, provider],
+                              cwd=cwd, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{provider}: startup failed:\n{proc.stderr[-2000:]}")
+
+    modules: Dict[str, int] = {}
+    total_us = 0
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, module = match.groups()
+        modules[module] = int(cumulative_us)
+        if len(indent) == 1:
+            # top-level imports: their cumulative times add up to the total
+            total_us += int(cumulative_us)
+
+    return {
+        "import_ms": total_us / 1000,
+        "max_rss_kb": int(proc.stdout.strip().splitlines()[-1]),
+        "modules": modules,
+    }
+
+def check(provider: str, result: Dict[str, object], budget_ms: float) -> List[str]:
+    """Return the budget violations for one provider."""
+    forbidden = set(ALWAYS_LAZY)
+    for other, heavy in HEAVY_MODULES.items():
+        if other != provider:
+            forbidden.update(heavy)
+    forbidden -= set(HEAVY_MODULES.get(provider, [])) - set(ALWAYS_LAZY)
+
+    violations = [f"{provider}: imported {module} at startup"
+                  for module in sorted(forbidden) if module in result["modules"]]
+    if result["import_ms"] > budget_ms:
+        violations.append(f"{provider}: import time {result['import_ms']:.0f} ms exceeds budget of {budget_ms:.0f} ms")
+    return violations
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the import-time startup budget per provider")
+    parser.add_argument("--providers", default="openai,gemini,ollama", help="comma-delimited providers to check")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("STARTUP_BUDGET_MS", "3000")),
+                        help="maximum total import time per provider")
+    parser.add_argument("--output", help="write the measurements to this JSON file")
+    args = parser.parse_args()
+
+    report, violations = {}, []
+    for provider in args.providers.split(','):
+        result = measure(provider)
+        violations.extend(check(provider, result, args.budget_ms))
+        report[provider] = {"import_ms": result["import_ms"], "max_rss_kb": result["max_rss_kb"]}
+        print(f"{provider:>8}: {result['import_ms']:8.0f} ms imports, {result['max_rss_kb'] / 1024:8.1f} MB max RSS")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    for violation in violations:
+        print(f"FAIL {violation}")
+    sys.exit(1 if violations else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+bench/storage.py
+--------------
+Storage backend benchmark.
+
+For every `STORAGE_BACKEND` preset, builds the fixture corpus (read from
+local directories) with the deterministic `fake` provider, then starts a
+fresh query process on the built index and reports:
+- index size on disk;
+- time to load the index (`initialize_storages`);
+- peak RSS of the query process;
+- p50/p95 query latency through `agent.retrieve_context`.
+
+Presets whose dependencies are missing (e.g. `chroma` without chromadb) are
+skipped.
+
+Usage:
+    python3 -m bench.storage [--corpus small|medium|large] [--backends json,sqlite,chroma] [--output storage.json]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import subprocess
+import importlib.util
+from typing import Dict, List
+
+from bench.corpus import CORPUS_SIZES, generate_corpus, generate_questions
+from bench.run import _peak_rss_mb, _percentile, _split_repos, _write_repos
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# backends that need an optional package
+BACKEND_REQUIREMENTS = {"chroma": "chromadb"}
+
+async def _build(args):
+    from build import initialize_rag
+    from common import WORKING_DIR
+    from service.build.manifest import MANIFEST_FILE, BuildManifest
+    from service.build.pipeline import BuildPipeline
+    from service.repo.typex import get_repo_md_files
+
+    files = []
+    for name in sorted(os.listdir("repos")):
+        files.extend(await get_repo_md_files(os.path.abspath(os.path.join("repos", name))))
+    rag = await initialize_rag()
+    await BuildPipeline(rag, BuildManifest(os.path.join(WORKING_DIR, MANIFEST_FILE))).run(files)
+    await rag.finalize_storages()
+
+async def _query(args) -> Dict[str, float]:
+    from agent import initialize_rag, retrieve_context
+    from common import RAGDeps
+
+    start = time.perf_counter()
+    rag = await initialize_rag()
+    load_ms = (time.perf_counter() - start) * 1000
+
+    deps = RAGDeps(lightrag=rag)
+    query_ms: List[float] = []
+    for question in generate_questions(args.queries, seed=args.seed):
+        start = time.perf_counter()
+        await retrieve_context(deps, question)
+        query_ms.append((time.perf_counter() - start) * 1000)
+    await rag.finalize_storages()
+
+    return {
+        "load_ms": load_ms,
+        "query_p50_ms": _percentile(query_ms, 50),
+        "query_p95_ms": _percentile(query_ms, 95),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+def _dir_size_mb(path: str) -> float:
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(dirpath, f)) for f in filenames)
+    return total / (1024 * 1024)
+
+def _worker(step: str, backend: str, workdir: str, args) -> Dict[str, float]:
+    """Run one step in a fresh interpreter so load time and RSS are not shared between backends."""
+    env = {**os.environ, "STORAGE_BACKEND": backend, "LLM_TYPE": "fake", "LLM_MODEL": "fake",
+           "QUERY_CACHE": "0", "QUERY_PLANNER": "0", "LLM_CACHE": "0", "EMBEDDING_CACHE": "0",
+           "BUILD_STAGING_PATH": os.path.join(workdir, "staging.sqlite"),
+           "PYTHONPATH": REPO_DIR + os.pathsep + os.getenv("PYTHONPATH", "")}
+    cmd = [sys.executable, "-m", "bench.storage", "--step", step, "--queries", str(args.queries), "--seed", str(args.seed)]
+    proc = subprocess.run(cmd, cwd=workdir, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{backend} {step} failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare LightRAG storage backends")
+    parser.add_argument("--corpus", choices=sorted(CORPUS_SIZES), default="small", help="fixture corpus size")
+    parser.add_argument("--repos", type=int, default=4, help="number of repos to split the corpus across")
+    parser.add_argument("--backends", default="json,sqlite,chroma", help="comma-separated STORAGE_BACKEND presets")
+    parser.add_argument("--queries", type=int, default=20, help="number of questions to time")
+    parser.add_argument("--seed", type=int, default=0, help="corpus and question seed")
+    parser.add_argument("--output", help="save the results as JSON")
+    parser.add_argument("--step", choices=["build", "query"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.step:
+        # worker mode: run in the prepared scratch dir and print the result as the last line
+        sys.path.insert(0, REPO_DIR)
+        result = asyncio.run(_build(args) if args.step == "build" else _query(args)) or {}
+        print(json.dumps(result))
+        return
+
+    repos = _split_repos(generate_corpus(args.corpus, seed=args.seed), args.repos)
+    results: Dict[str, Dict[str, float]] = {}
+    for backend in args.backends.split(","):
+        requirement = BACKEND_REQUIREMENTS.get(backend)
+        if requirement and importlib.util.find_spec(requirement) is None:
+            print(f"Skipping {backend}: {requirement} is not installed")
+            continue
+        with tempfile.TemporaryDirectory() as workdir:
+            _write_repos(repos, os.path.join(workdir, "repos"))
+            start = time.perf_counter()
+            _worker("build", backend, workdir, args)
+            build_seconds = time.perf_counter() - start
+            results[backend] = {
+                "build_seconds": build_seconds,
+                "index_mb": _dir_size_mb(os.path.join(workdir, "url-docs")),
+                **_worker("query", backend, workdir, args),
+            }
+
+    metrics = ["build_seconds", "index_mb", "load_ms", "query_p50_ms", "query_p95_ms", "peak_rss_mb"]
+    print(f"{'backend':>10}" + "".join(f"{m:>15}" for m in metrics))
+    for backend, values in results.items():
+        print(f"{backend:>10}" + "".join(f"{values[m]:>15.2f}" for m in metrics))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"corpus": args.corpus, "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,72 @@
 """
 build.py
 --------------
-Command-line utility to crawl URLs using Crawl4AI and insert into LightRAG.
+Command-line utility to fetch repo markdown (or crawl websites using Crawl4AI) and insert into LightRAG.
 
 Usage:
-    python3 build.py <URLs>
+    python3 build.py <URLs> [--incremental] [--resume] [--shards [--prune]] [--source raw|crawl]
 """
 import os
 import sys
 import asyncio
 from urllib.parse import urldefrag
 import argparse
-from typing import List, Dict, Any
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from itertools import zip_longest
+from typing import List, Dict, Any, AsyncIterator
 from dotenv import load_dotenv
+from lightrag.constants import DEFAULT_EMBEDDING_FUNC_MAX_ASYNC, DEFAULT_MAX_ASYNC
 from lightrag.kg.shared_storage import initialize_pipeline_status
-from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode, MemoryAdaptiveDispatcher
 
 from common import WORKING_DIR, get_lightrag_instance
-from service.repo.typex import get_repo_md_urls
+from service.build.clean import DEDUP_THRESHOLD
+from service.build.manifest import BUILD_MARKER_FILE, MANIFEST_FILE, BuildManifest, write_build_marker
+from service.build.model import Document
+from service.build.pipeline import DEFAULT_BATCH_TOKENS, BuildPipeline
+from service.build.staging import StagingStore, staging_path
+from service.llm.completion_cache import LLM_CACHE_ENABLED, get_completion_cache
+from service.repo.budget import parse_host_limits
+from service.repo.http import aclose_http_client
+from service.repo.model import RepoFile
+from service.query.shards import SHARDS_FILE, ShardRegistry, shard_name, shard_profile
+from service.repo.typex import get_repo_md_files, is_hosted_repo_url, is_repo_url
+from service.telemetry.metrics import metrics
 
 load_dotenv()
 
-async def crawl_recursive_internal_links(start_urls, max_depth=3, max_concurrent=10) -> List[Dict[str,Any]]:
-    """Returns list of dicts with url and markdown."""
+# per-process concurrency limits (env var -> default). Shard workers each get an equal
+# share, so all workers together stay within what one build process is allowed.
+WORKER_SPLIT_LIMITS = {
+    "REPO_MAX_IN_FLIGHT": 32,
+    "REPO_MAX_PER_HOST": 8,
+    "GEMINI_MAX_CONCURRENCY": 16,
+    "OLLAMA_LLM_CONCURRENCY": 2,
+    "OLLAMA_EMBED_CONCURRENCY": 2,
+    "MAX_ASYNC_LLM": int(os.getenv("MAX_ASYNC", str(DEFAULT_MAX_ASYNC))),
+    "EMBEDDING_FUNC_MAX_ASYNC": DEFAULT_EMBEDDING_FUNC_MAX_ASYNC,
+}
+# the limits that bind for each provider, besides the repo host limits
+PROVIDER_LIMITS = {
+    "openai": ["MAX_ASYNC_LLM", "EMBEDDING_FUNC_MAX_ASYNC"],
+    "gemini": ["GEMINI_MAX_CONCURRENCY", "EMBEDDING_FUNC_MAX_ASYNC"],
+    "ollama": ["OLLAMA_LLM_CONCURRENCY", "OLLAMA_EMBED_CONCURRENCY"],
+}
+
+def _limit(name: str) -> int:
+    return int(os.getenv(name, str(WORKER_SPLIT_LIMITS[name])))
+
+def _binding_limits() -> Dict[str, int]:
+    names = ["REPO_MAX_IN_FLIGHT", "REPO_MAX_PER_HOST", *PROVIDER_LIMITS.get(os.getenv("LLM_TYPE", ""), [])]
+    return {name: _limit(name) for name in names}
+
+async def crawl_recursive_internal_links(start_urls, max_depth=3, max_concurrent=10) -> AsyncIterator[Dict[str,Any]]:
+    """Yields dicts with url and markdown as pages finish crawling."""
+    # imported lazily so raw fetch builds never start a browser
+    from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode, MemoryAdaptiveDispatcher
+
     browser_config = BrowserConfig(headless=True, verbose=False)
-    run_config = CrawlerRunConfig(cache_mode=CacheMode.BYPASS, stream=False)
+    run_config = CrawlerRunConfig(cache_mode=CacheMode.BYPASS, stream=True)
     dispatcher = MemoryAdaptiveDispatcher(
         memory_threshold_percent=70.0,
         check_interval=1.0,
@@ -37,7 +79,6 @@ async def crawl_recursive_internal_links(start_urls, max_depth=3, max_concurrent
         return urldefrag(url)[0]
 
     current_urls = set([normalize_url(u) for u in start_urls])
-    results_all = []
 
     async with AsyncWebCrawler(config=browser_config) as crawler:
         for depth in range(max_depth):
@@ -45,15 +86,14 @@ async def crawl_recursive_internal_links(start_urls, max_depth=3, max_concurrent
             if not urls_to_crawl:
                 break
 
-            results = await crawler.arun_many(urls=urls_to_crawl, config=run_config, dispatcher=dispatcher)
             next_level_urls = set()
 
-            for result in results:
+            async for result in await crawler.arun_many(urls=urls_to_crawl, config=run_config, dispatcher=dispatcher):
                 norm_url = normalize_url(result.url)
                 visited.add(norm_url)
 
                 if result.success and result.markdown:
-                    results_all.append({'url': result.url, 'markdown': result.markdown})
+                    yield {'url': result.url, 'markdown': result.markdown}
                     for link in result.links.get("internal", []):
                         next_url = normalize_url(link["href"])
                         if next_url not in visited:
@@ -61,19 +101,265 @@ async def crawl_recursive_internal_links(start_urls, max_depth=3, max_concurrent
 
             current_urls = next_level_urls
 
-    return results_all
+async def crawl_documents(start_urls, files_by_url: Dict[str, RepoFile], repo_url="", max_depth=3, max_concurrent=10) -> AsyncIterator[Document]:
+    """Adapts crawler results to pipeline documents."""
+    async for result in crawl_recursive_internal_links(start_urls, max_depth=max_depth, max_concurrent=max_concurrent):
+        file = files_by_url.get(result['url'])
+        yield Document(
+            url=result['url'],
+            markdown=result['markdown'],
+            repo_url=file.repo_url if file else repo_url,
+            sha=file.sha if file else "",
+            crawled=True,
+        )
 
-async def initialize_rag():
-    rag = get_lightrag_instance(os.getenv("LLM_TYPE"))
+async def initialize_rag(workspace: str = ""):
+    rag = get_lightrag_instance(os.getenv("LLM_TYPE"), workspace=workspace)
     await rag.initialize_storages()
     await initialize_pipeline_status()
 
     return rag
 
+async def build_repos(repo_urls: List[str], args: argparse.Namespace, workspace: str = "") -> Dict[str, Any]:
+    """Build (or incrementally update) one index from repo and website URLs.
+
+    Args:
+        repo_urls: Repo URLs, local paths, git URLs or websites to index.
+        args: The parsed command-line options.
+        workspace: The LightRAG workspace (shard) to build, "" for the default index.
+
+    Returns:
+        The pipeline stats, the repos that failed to list or fetch (`errors`) and, for a shard,
+        the embedding of its profile.
+    """
+    index_dir = os.path.join(WORKING_DIR, workspace) if workspace else WORKING_DIR
+
+    # Check if the index dir exists, delete and recreate it (unless building incrementally or resuming)
+    if not (args.incremental or args.resume) and os.path.exists(index_dir):
+        import shutil
+        shutil.rmtree(index_dir)
+    os.makedirs(index_dir, exist_ok=True)
+
+    staging = StagingStore(staging_path(workspace))
+    if args.resume:
+        print(f"Resuming build: {staging.count()} fetched documents staged for insertion")
+    else:
+        staging.clear()
+
+    manifest = BuildManifest(os.path.join(index_dir, MANIFEST_FILE))
+    sources = []
+    deleted_urls = []
+
+    # Only real websites go through the browser crawler
+    website_urls = [repo_url for repo_url in repo_urls if not is_repo_url(repo_url)]
+    repo_urls = [repo_url for repo_url in repo_urls if is_repo_url(repo_url)]
+    for website_url in website_urls:
+        print(f"Crawling website {website_url}...")
+        sources.append(crawl_documents([website_url], {}, repo_url=website_url, max_depth=args.max_depth, max_concurrent=args.max_concurrent))
+
+    # List every repo concurrently; the request budget keeps hosts from being flooded
+    listings = await asyncio.gather(*(get_repo_md_files(repo_url) for repo_url in repo_urls), return_exceptions=True)
+    listed = {f.url: f.sha for files in listings if not isinstance(files, BaseException) for f in files}
+    listed_repos = {repo_url for repo_url, files in zip(repo_urls, listings) if not isinstance(files, BaseException)}
+    gone = {url for url, entry in manifest.entries.items() if entry.get("repo_url") in listed_repos and url not in listed}
+    changed_urls = {url for url, sha in listed.items() if not manifest.is_current(url, sha)}
+    # documents dropped as duplicates are checked again once their original changes or goes away
+    changed_urls |= manifest.duplicates_of(gone | changed_urls) & listed.keys()
+
+    changed_per_repo = []
+    listed_paths = []
+    repo_summary: Dict[str, Dict[str, Any]] = {}
+    for repo_url, files in zip(repo_urls, listings):
+        if isinstance(files, BaseException):
+            print(f"Failed to list {repo_url}: {files}")
+            repo_summary[repo_url] = {"error": str(files)}
+            continue
+
+        listed_paths.extend(f.path for f in files)
+        current_urls = {f.url for f in files}
+        deleted = [url for url in manifest.urls_for_repo(repo_url) if url not in current_urls]
+        deleted_urls.extend(deleted)
+        changed = [f for f in files if f.url in changed_urls]
+        repo_summary[repo_url] = {"listed": len(files), "changed": len(changed), "deleted": len(deleted)}
+        if not files:
+            print(f"No markdown URLs found for {repo_url}")
+            continue
+
+        print(f"{repo_url}: {len(files)} md files, {len(changed)} new or changed")
+        if not changed:
+            continue
+
+        if args.source == "crawl" and is_hosted_repo_url(repo_url):
+            print(f"Crawling the following md URLs {[f.url for f in changed]}...")
+            sources.append(crawl_documents([f.url for f in changed], {f.url: f for f in changed}, max_depth=1, max_concurrent=args.max_concurrent))
+        else:
+            changed_per_repo.append(changed)
+
+    # Interleave repos so per-host limits keep every host busy at once
+    files_to_fetch = [f for group in zip_longest(*changed_per_repo) for f in group if f]
+
+    # Initialize RAG instance and insert docs
+    rag = await initialize_rag(workspace)
+
+    for url in deleted_urls:
+        print(f"Removing deleted document {url} from RAG...")
+        if manifest.get(url)["doc_id"]:
+            await rag.adelete_by_doc_id(manifest.get(url)["doc_id"])
+        manifest.remove(url)
+        manifest.save()
+
+    pipeline = BuildPipeline(rag, manifest, max_concurrent=args.max_concurrent, batch_tokens=args.batch_tokens,
+                             dedup_threshold=args.dedup_threshold, staging=staging, resume=args.resume)
+    try:
+        stats = await pipeline.run(files_to_fetch, sources)
+    finally:
+        await aclose_http_client()
+    # everything staged made it into the index (or was skipped on purpose)
+    staging.clear()
+    staging.close()
+    print(f"Build pipeline finished: {stats}")
+    print("Tokens saved by cleaning: " + ", ".join(f"{reason}={tokens}" for reason, tokens in pipeline.cleaner.tokens_saved.items()))
+
+    print("Per-repo summary:")
+    for repo_url in repo_urls + website_urls:
+        summary = {**repo_summary.get(repo_url, {}), **pipeline.repo_stats.get(repo_url, {})}
+        print(f"  {repo_url}: " + ", ".join(f"{key}={value}" for key, value in summary.items()))
+
+    if LLM_CACHE_ENABLED:
+        cache = get_completion_cache()
+        print(f"LLM completion cache: {cache.stats['hits']} hits, {cache.stats['misses']} misses "
+              f"({cache.hit_rate():.0%} hit rate, {cache.size / 1024 / 1024:.1f} MB)")
+
+    embedding = None
+    if workspace:
+        # the profile embedding lets queries skip irrelevant shards
+        profile = shard_profile(repo_urls + website_urls, listed_paths)
+        embedding = [float(value) for value in (await rag.embedding_func([profile]))[0]]
+    await rag.finalize_storages()
+
+    errors = [f"{repo_url}: listing failed: {summary['error']}" for repo_url, summary in repo_summary.items() if "error" in summary]
+    errors.extend(f"{repo_url}: {summary['failed']} documents failed to fetch"
+                  for repo_url, summary in pipeline.repo_stats.items() if summary.get("failed"))
+    return {"stats": stats, "embedding": embedding, "errors": errors}
+
+def _build_shard(shard: str, repo_url: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """Build one shard in a worker process.
+
+    Workers are reused for several shards, so the metrics of the previous
+    shard are dropped first and every shard runs in a fresh event loop.
+    """
+    metrics.reset()
+    result = asyncio.run(build_repos([repo_url], args, workspace=shard))
+
+    if args.metrics:
+        root, ext = os.path.splitext(args.metrics)
+        metrics.write(f"{root}.{shard}{ext or '.json'}")
+    if args.summary:
+        print(f"[{shard}]\n{metrics.summary_table()}")
+    return result
+
+def worker_limits(workers: int) -> Dict[str, str]:
+    """Split the per-process concurrency limits between `workers` processes.
+
+    Args:
+        workers: The number of shard worker processes.
+
+    Returns:
+        The environment variables to start the workers with.
+    """
+    for name, limit in _binding_limits().items():
+        if limit < workers:
+            print(f"Warning: {name}={limit} is lower than the {workers} shard workers, each worker still gets 1; "
+                  f"lower --shard-workers to stay within it")
+    env = {name: str(max(1, _limit(name) // workers)) for name in WORKER_SPLIT_LIMITS}
+    host_limits = parse_host_limits(os.getenv("REPO_HOST_LIMITS", ""))
+    if host_limits:
+        env["REPO_HOST_LIMITS"] = ",".join(f"{host}={max(1, limit // workers)}" for host, limit in host_limits.items())
+    return env
+
+def has_root_index() -> bool:
+    """Return True if WORKING_DIR holds a single (non-sharded) index."""
+    return os.path.exists(os.path.join(WORKING_DIR, MANIFEST_FILE))
+
+def _remove_root_index(shards: List[str]):
+    """Delete the single index in WORKING_DIR, keeping the shard workspaces."""
+    import shutil
+    keep = {*shards, SHARDS_FILE, BUILD_MARKER_FILE}
+    for name in os.listdir(WORKING_DIR):
+        if name in keep:
+            continue
+        path = os.path.join(WORKING_DIR, name)
+        shutil.rmtree(path) if os.path.isdir(path) else os.remove(path)
+
+def prune_shards(registry: ShardRegistry, keep: List[str]):
+    """Remove the shards not in `keep` from the registry and from disk."""
+    import shutil
+    for shard in [shard for shard in registry.shards if shard not in keep]:
+        print(f"Pruning shard {shard} ({', '.join(registry.shards[shard]['repo_urls'])})...")
+        registry.remove(shard)
+        shutil.rmtree(os.path.join(WORKING_DIR, shard), ignore_errors=True)
+        StagingStore(staging_path(shard)).clear()
+
+async def build_shards(repo_urls: List[str], args: argparse.Namespace) -> List[str]:
+    """Build one LightRAG shard per repo, in parallel worker processes.
+
+    Shards of repos that are not listed are left untouched, or removed with `--prune`.
+
+    Returns:
+        The errors of shards that failed or were built incompletely.
+    """
+    os.makedirs(WORKING_DIR, exist_ok=True)
+    registry = ShardRegistry(WORKING_DIR)
+    shards = {shard_name(repo_url): repo_url for repo_url in repo_urls}
+    if has_root_index():
+        # queries only read the shards once shards.json exists
+        print("Removing the single (non-sharded) index in WORKING_DIR...")
+        _remove_root_index([*registry.shards, *shards])
+    if args.prune:
+        prune_shards(registry, list(shards))
+        registry.save()
+    # by default no more workers than the tightest limit can be split between
+    workers = args.shard_workers or min(len(shards), os.cpu_count() or 1, *_binding_limits().values())
+    print(f"Building {len(shards)} shards with {workers} worker processes...")
+
+    loop = asyncio.get_running_loop()
+    # limits are read at import time, so spawned workers pick up their share from the environment
+    saved_env = {name: os.environ.get(name) for name in [*WORKER_SPLIT_LIMITS, "REPO_HOST_LIMITS"]}
+    os.environ.update(worker_limits(workers))
+    try:
+        # spawn: LightRAG keeps process-global storage state that must not be forked
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            results = await asyncio.gather(
+                *(loop.run_in_executor(pool, _build_shard, shard, repo_url, args) for shard, repo_url in shards.items()),
+                return_exceptions=True,
+            )
+    finally:
+        for name, value in saved_env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+    errors = []
+    for (shard, repo_url), result in zip(shards.items(), results):
+        if isinstance(result, BaseException):
+            print(f"Failed to build shard {shard} ({repo_url}): {result}")
+            errors.append(f"{shard}: {result}")
+            continue
+        print(f"  {shard} ({repo_url}): {result['stats']}")
+        if result["errors"]:
+            # queries keep the previous version of the shard (if any) until it builds cleanly
+            print(f"Not registering shard {shard} ({repo_url}): built incompletely")
+            errors.extend(f"{shard}: {error}" for error in result["errors"])
+            continue
+        registry.record(shard, [repo_url], result["embedding"])
+    registry.save()
+    return errors
+
 async def main():
-    if not os.getenv("LLM_TYPE") or os.getenv("LLM_TYPE") not in ["openai", "gemini", "ollama"]:
+    if not os.getenv("LLM_TYPE") or os.getenv("LLM_TYPE") not in ["openai", "gemini", "ollama", "fake"]:
         print("Error: LLM_TYPE environment variable not set or invalid.")
-        print("Please create a .env file with LLM_TYPE set to 'openai', 'gemini', or 'ollama'.")
+        print("Please create a .env file with LLM_TYPE set to 'openai', 'gemini', 'ollama', or 'fake' (offline).")
         sys.exit(1)
 
     if not os.getenv("LLM_MODEL"):
@@ -93,39 +379,62 @@ async def main():
         print("Please create a .env file with your Gemini API key or set it in your environment.")
         sys.exit(1)
 
-    # Check if WORKING_DIR exists, delete and recreate it
-    if os.path.exists(WORKING_DIR):
-        import shutil
-        shutil.rmtree(WORKING_DIR)
-    os.mkdir(WORKING_DIR)
-    
-    crawl_results = []
-
     parser = argparse.ArgumentParser(description="Insert crawled docs into LightRAG")
-    parser.add_argument("repo_urls", help="comma-delimited repo URLs to iterate through looking for .md URLs")
+    parser.add_argument("repo_urls", help="comma-delimited repo URLs, local paths, file:// or git URLs to iterate through looking for .md URLs")
+    parser.add_argument("--incremental", action="store_true",
+                        help="keep the existing WORKING_DIR and only insert new/changed docs and remove deleted ones")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue an interrupted build: keep WORKING_DIR, skip inserted docs and reuse staged fetches")
+    parser.add_argument("--source", choices=["raw", "crawl"], default="raw",
+                        help="'raw' downloads repo markdown over HTTP, 'crawl' renders blob pages in a headless browser (local and git repos are always read from disk)")
+    parser.add_argument("--max-concurrent", type=int, default=20, help="maximum concurrent fetches")
+    parser.add_argument("--max-depth", type=int, default=3, help="crawl depth for website (non-repo) URLs")
+    parser.add_argument("--dedup-threshold", type=float, default=DEDUP_THRESHOLD,
+                        help="MinHash similarity above which documents/sections are dropped as near duplicates (1 = exact only)")
+    parser.add_argument("--metrics", default=os.getenv("METRICS_FILE"),
+                        help="write spans/counters/histograms to this JSON file (plus a .prom Prometheus text file)")
+    parser.add_argument("--summary", action="store_true", help="print a per-stage timing summary at the end")
+    parser.add_argument("--shards", action="store_true",
+                        help="build one LightRAG shard per repo in parallel worker processes; queries fan out to the shards")
+    parser.add_argument("--prune", action="store_true",
+                        help="with --shards, remove the shards of repos that are not listed")
+    parser.add_argument("--shard-workers", type=int, default=0, help="worker processes for --shards (default: one per repo, up to the CPU count and the LLM concurrency limit)")
+    parser.add_argument("--batch-tokens", type=int, default=DEFAULT_BATCH_TOKENS,
+                        help="approximate token budget of each batched ainsert call")
     args = parser.parse_args()
 
-    repo_urls = args.repo_urls.split(',')
+    repo_urls = [repo_url.strip() for repo_url in args.repo_urls.split(',')]
     print(f"Received the following repo URLs: {repo_urls}")
-    for repo_url in repo_urls:
-        urls = await get_repo_md_urls(repo_url.strip())
-        if not urls:
-            print(f"No markdown URLs found for {repo_url.strip()}")
-            continue
 
-        print(f"Crawling the following md URLs {urls}...")
-        crawl_results.extend(await crawl_recursive_internal_links(urls, max_depth=1, max_concurrent=10))
+    # a sharded and a single index must not share WORKING_DIR: queries would only read one of them
+    if args.shards and (args.incremental or args.resume) and has_root_index():
+        print("Error: WORKING_DIR holds a single (non-sharded) index; run a full build with --shards to replace it.")
+        sys.exit(1)
+    if not args.shards and (args.incremental or args.resume) and ShardRegistry(WORKING_DIR).shards:
+        print("Error: WORKING_DIR holds a sharded index; pass --shards, or run a full build to replace it.")
+        sys.exit(1)
+    if args.prune and not args.shards:
+        print("Error: --prune only applies to --shards builds.")
+        sys.exit(1)
+
+    if args.shards:
+        errors = await build_shards(repo_urls, args)
+    else:
+        errors = (await build_repos(repo_urls, args))["errors"]
+        if args.metrics:
+            metrics.write(args.metrics)
+        if args.summary:
+            print(metrics.summary_table())
 
-    # Initialize RAG instance and insert docs
-    rag = await initialize_rag()
-    for doc in crawl_results:
-        url = doc['url']
-        md = doc['markdown']
-        if not md:
-            print(f"Skipping {url} - no markdown content found")
-            continue
-        print(f"Inserting document from {url} into RAG...")
-        await rag.ainsert(md)
+    if errors:
+        # an incomplete index must not be announced as a finished build
+        print("Build incomplete, not marking the index as built:")
+        for error in errors:
+            print(f"  {error}")
+        sys.exit(1)
+
+    # signals query servers and caches that a new index is ready
+    write_build_marker(WORKING_DIR)
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -10,6 +10,7 @@ import asyncio
 import argparse
 from dotenv import load_dotenv
 
+from service.repo.http import aclose_http_client
 from service.repo.typex import get_repo_md_urls
 
 load_dotenv()
@@ -29,6 +30,8 @@ async def main():
 
         print(f"Will be crawling the following md URLs {urls}...")
 
+    await aclose_http_client()
+
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -1,113 +1,129 @@
 import os
 from dataclasses import dataclass
-from typing import Callable
-
-import numpy as np
-from google import genai
-from google.genai import types
-from sentence_transformers import SentenceTransformer
+from typing import Callable, Optional
 
 from lightrag import LightRAG
-from lightrag.llm.openai import openai_complete, gpt_4o_mini_complete, openai_embed
-from lightrag.llm.ollama import ollama_model_complete, ollama_embed
 from lightrag.utils import EmbeddingFunc
 
+from service.llm.completion_cache import cache_llm_func
+from service.llm.embedding_cache import cache_embedding_func
+from service.query.cache import QueryCache
+from service.query.client import QueryServerClient
+from service.query.planner import QueryPlanner
+from service.storage.backends import storage_kwargs
+from service.telemetry.metrics import instrument_embedding_func, instrument_llm_func
+
 WORKING_DIR = "./url-docs"
 
 @dataclass
 class RAGDeps:
-    """Dependencies for the RAG agent."""
-    lightrag: LightRAG
-
-def get_lightrag_instance(llm_type: str) -> LightRAG:
-    """Get the function based on the LLM type."""
+    """Dependencies for the RAG agent.
+
+    Either `lightrag` is loaded in-process (a single index, or a
+    `ShardedRAG` fanning out to per-repo shards), or it is None and
+    retrieval goes through `query_server`. Without a `query_planner`
+    every query runs in LightRAG's `mix` mode.
+    """
+    lightrag: Optional[LightRAG]
+    query_cache: Optional[QueryCache] = None
+    query_server: Optional[QueryServerClient] = None
+    query_planner: Optional[QueryPlanner] = None
+
+def _provider_llm_func(func: Callable, provider: str, model: str) -> Callable:
+    """Instrument a provider's completion function and put the persistent completion cache in front of it."""
+    return cache_llm_func(instrument_llm_func(func, provider), provider, model)
+
+def _provider_embedding_func(embedding_func: EmbeddingFunc, provider: str, model: str) -> EmbeddingFunc:
+    """Instrument a provider's embedding function and put the persistent embedding cache in front of it."""
+    return cache_embedding_func(instrument_embedding_func(embedding_func, provider), model)
+
+def get_lightrag_instance(llm_type: str, workspace: str = "") -> LightRAG:
+    """Get the function based on the LLM type.
+
+    Args:
+        llm_type: The LLM provider.
+        workspace: The LightRAG workspace (a shard of a sharded index), "" for the default index.
+    """
     if llm_type not in llm_lightrag_istances:
         raise ValueError(f"Unsupported LLM type: {llm_type}")
-    return llm_lightrag_istances[llm_type]() 
+    return llm_lightrag_istances[llm_type](workspace)
 
 # from source code: lightrag -> examples -> lightrag_openai_demo.py
-def get_openai_lightrag_instance() -> LightRAG:
+def get_openai_lightrag_instance(workspace: str = "") -> LightRAG:
     """Get an instance of LightRAG."""
+    # provider dependencies are imported lazily so unused providers cost nothing at startup
+    from lightrag.llm.openai import openai_complete, openai_embed
+
     return LightRAG(
         working_dir=WORKING_DIR,
-        embedding_func=openai_embed,
-        llm_model_func=openai_complete, # gpt_4o_mini_complete
+        workspace=workspace,
+        **storage_kwargs(),
+        embedding_func=_provider_embedding_func(
+            openai_embed, "openai", getattr(openai_embed, "model_name", None) or "text-embedding-3-small"
+        ),
+        llm_model_func=_provider_llm_func(openai_complete, "openai", os.getenv("LLM_MODEL", "gpt-4o-mini")), # gpt_4o_mini_complete
         llm_model_name=os.getenv("LLM_MODEL"),
     )
 
 # from source code: lightrag -> examples -> lightrag_ollama_demo.py
-def get_ollama_lightrag_instance() -> LightRAG:
+def get_ollama_lightrag_instance(workspace: str = "") -> LightRAG:
     """Get an instance of LightRAG."""
+    from service.llm.ollama import (
+        OLLAMA_EMBED_CONCURRENCY, OLLAMA_EMBED_MODEL, OLLAMA_LLM_CONCURRENCY,
+        ollama_embedding_func, ollama_model_func,
+    )
+
     return LightRAG(
         working_dir=WORKING_DIR,
-        llm_model_func=ollama_model_complete,
+        workspace=workspace,
+        **storage_kwargs(),
+        llm_model_func=_provider_llm_func(ollama_model_func, "ollama", os.getenv("LLM_MODEL", "qwen2.5-coder:7b")),
         llm_model_name=os.getenv("LLM_MODEL", "qwen2.5-coder:7b"),
-        llm_model_max_token_size=8192,
-        llm_model_kwargs={
-            "host": os.getenv("LLM_BINDING_HOST", "http://localhost:11434"),
-            "options": {"num_ctx": 8192},
-            "timeout": int(os.getenv("TIMEOUT", "300")),
-        },
-        embedding_func=EmbeddingFunc(
+        # the provider's adaptive limiters do the real throttling; this only keeps LightRAG from queueing ahead
+        llm_model_max_async=OLLAMA_LLM_CONCURRENCY,
+        embedding_func_max_async=OLLAMA_EMBED_CONCURRENCY,
+        embedding_func=_provider_embedding_func(EmbeddingFunc(
             embedding_dim=int(os.getenv("EMBEDDING_DIM", "1024")),
             max_token_size=int(os.getenv("MAX_EMBED_TOKENS", "8192")),
-            func=lambda texts: ollama_embed(
-                texts,
-                embed_model=os.getenv("EMBEDDING_MODEL", "bge-m3:latest"),
-                host=os.getenv("EMBEDDING_BINDING_HOST", "http://localhost:11434"),
-            ),
-        ),
-    )
-
-# from source code: lightrag -> examples -> lightrag_gemini_demo.py
-async def gemini_model_func(
-    prompt, system_prompt=None, history_messages=[], keyword_extraction=False, **kwargs
-) -> str:
-    # 1. Initialize the GenAI Client with your Gemini API Key
-    client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
-
-    # 2. Combine prompts: system prompt, history, and user prompt
-    if history_messages is None:
-        history_messages = []
-
-    combined_prompt = ""
-    if system_prompt:
-        combined_prompt += f"{system_prompt}\n"
-
-    for msg in history_messages:
-        # Each msg is expected to be a dict: {"role": "...", "content": "..."}
-        combined_prompt += f"{msg['role']}: {msg['content']}\n"
-
-    # Finally, add the new user prompt
-    combined_prompt += f"user: {prompt}"
-
-    # 3. Call the Gemini model
-    response = client.models.generate_content(
-        model=os.getenv("LLM_MODEL", "gemini-1.5-flash"),
-        contents=[combined_prompt],
-        config=types.GenerateContentConfig(max_output_tokens=500, temperature=0.1),
+            func=ollama_embedding_func,
+        ), "ollama", OLLAMA_EMBED_MODEL),
     )
 
-    # 4. Return the response text
-    return response.text
-
-
-async def gemini_embedding_func(texts: list[str]) -> np.ndarray:
-    model = SentenceTransformer(os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2"))
-    embeddings = model.encode(texts, convert_to_numpy=True)
-    return embeddings
-
 # from source code: lightrag -> examples -> lightrag_gemini_demo.py
-def get_gemini_lightrag_instance() -> LightRAG:
+def get_gemini_lightrag_instance(workspace: str = "") -> LightRAG:
     """Get an instance of LightRAG."""
+    from service.llm.gemini import GEMINI_MAX_CONCURRENCY, gemini_model_func, gemini_embedding_func
+
     return  LightRAG(
         working_dir=WORKING_DIR,
-        llm_model_func=gemini_model_func,
-        embedding_func=EmbeddingFunc(
+        workspace=workspace,
+        **storage_kwargs(),
+        llm_model_func=_provider_llm_func(gemini_model_func, "gemini", os.getenv("LLM_MODEL", "gemini-1.5-flash")),
+        llm_model_max_async=GEMINI_MAX_CONCURRENCY,
+        embedding_func=_provider_embedding_func(EmbeddingFunc(
             embedding_dim=384,
             max_token_size=8192,
             func=gemini_embedding_func,
-        ),
+        ), "gemini", os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")),
+    )
+
+def get_fake_lightrag_instance(workspace: str = "") -> LightRAG:
+    """Get an instance of LightRAG backed by the deterministic offline provider (benchmarks only)."""
+    from lightrag.utils import Tokenizer
+    from service.llm.fake import FAKE_EMBEDDING_DIM, FakeTokenizer, fake_model_func, fake_embedding_func
+
+    return LightRAG(
+        working_dir=WORKING_DIR,
+        workspace=workspace,
+        **storage_kwargs(),
+        tokenizer=Tokenizer("fake", FakeTokenizer()),
+        llm_model_func=_provider_llm_func(fake_model_func, "fake", "fake"),
+        llm_model_name="fake",
+        embedding_func=_provider_embedding_func(EmbeddingFunc(
+            embedding_dim=FAKE_EMBEDDING_DIM,
+            max_token_size=8192,
+            func=fake_embedding_func,
+        ), "fake", "fake"),
     )
 
 # dictionary to map llm types to a callable function that returns a LightRAG instance
@@ -115,6 +131,7 @@ LLM_LIGHTRAG = dict[str, Callable[..., LightRAG]]
 llm_lightrag_istances: LLM_LIGHTRAG = {
     "openai": get_openai_lightrag_instance,
     "gemini": get_gemini_lightrag_instance,
-    "ollama": get_ollama_lightrag_instance
+    "ollama": get_ollama_lightrag_instance,
+    "fake": get_fake_lightrag_instance
 }
 
@@ -0,0 +1,34 @@
+import os
+import argparse
+
+import pytest
+
+# Tests run offline against the deterministic fake provider. Module-level
+# settings are read at import time, so they are set before anything is imported.
+os.environ.update({
+    "LLM_TYPE": "fake",
+    "LLM_MODEL": "fake",
+    "LLM_CACHE": "0",
+    "EMBEDDING_CACHE": "0",
+    "QUERY_CACHE": "0",
+    "FAKE_LLM_LATENCY_MS": "0",
+    "FAKE_LLM_MS_PER_1K_TOKENS": "0",
+    "FAKE_EMBED_LATENCY_MS": "0",
+})
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run the test from an empty directory, so the index and caches land in it."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+@pytest.fixture
+def build_args():
+    """Return the build.py options of a plain raw-markdown build."""
+    def make(**overrides) -> argparse.Namespace:
+        options = dict(incremental=False, resume=False, source="raw", max_concurrent=2, max_depth=1,
+                       dedup_threshold=0.85, metrics=None, summary=False, batch_tokens=100000,
+                       shard_workers=1, prune=False, shards=False)
+        options.update(overrides)
+        return argparse.Namespace(**options)
+    return make
@@ -0,0 +1,195 @@
+"""
+server.py
+--------------
+Resident query server: loads the LightRAG storages once and serves
+concurrent questions over a local HTTP port or unix socket.
+
+Endpoints:
+    POST /query     {"question": "..."} -> {"answer": "..."}
+    POST /retrieve  {"query": "..."}    -> {"context": "..."}
+    GET  /health                         -> {"status": "ok", ...}
+    GET  /metrics                        -> counters and latency histograms
+
+When a build completes (url-docs/build_complete.json is rewritten) the server
+drains in-flight requests and re-executes itself on the same listening
+socket, so clients queue in the socket backlog instead of being refused. A
+build in progress (marker deleted by a full rebuild) is not a reload.
+
+Usage:
+    python3 server.py [--host 127.0.0.1] [--port 8765] [--socket /tmp/doc-agent.sock]
+
+Then point agent.py / app.py at it with QUERY_SERVER_URL=http://127.0.0.1:8765
+(or QUERY_SERVER_URL=unix:///tmp/doc-agent.sock).
+"""
+import os
+import sys
+import json
+import socket
+import asyncio
+import argparse
+from typing import Any, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from common import WORKING_DIR, RAGDeps
+from agent import doc_agent, initialize_rag, retrieve_context
+from service.build.manifest import build_version, newer_build
+from service.query.cache import get_query_cache
+from service.query.planner import get_query_planner
+from service.telemetry.metrics import metrics
+
+load_dotenv()
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error"}
+
+class QueryServer:
+    """Serves /query and /retrieve from one warm LightRAG instance."""
+    def __init__(self, sock: socket.socket, reload_interval: float = 5.0):
+        self.sock = sock
+        self.reload_interval = reload_interval
+        self.deps: Optional[RAGDeps] = None
+        self.version = build_version(WORKING_DIR)
+        self.in_flight = 0
+        self.idle = asyncio.Event()
+        self.idle.set()
+
+    async def start(self):
+        rag = await initialize_rag()
+        self.deps = RAGDeps(lightrag=rag,
+                            query_cache=get_query_cache(rag.embedding_func, WORKING_DIR),
+                            query_planner=get_query_planner(rag.embedding_func))
+
+        if self.sock.family == getattr(socket, "AF_UNIX", None):
+            server = await asyncio.start_unix_server(self._handle, sock=self.sock)
+        else:
+            server = await asyncio.start_server(self._handle, sock=self.sock)
+        print(f"Query server listening on {self.sock.getsockname()}")
+
+        async with server:
+            await self._watch_builds()
+            # a new index is ready: keep the listening socket open across the re-exec
+            listen_fd = os.dup(self.sock.fileno())
+            os.set_inheritable(listen_fd, True)
+            server.close()
+            await self.idle.wait()
+
+        await self.deps.lightrag.finalize_storages()
+        print("Index rebuilt, reloading query server...")
+        _reexec(listen_fd)
+
+    async def _watch_builds(self):
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            if newer_build(WORKING_DIR, self.version) is not None:
+                return
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.in_flight += 1
+        self.idle.clear()
+        try:
+            try:
+                method, path, body = await _read_request(reader)
+                status, payload = await self._dispatch(method, path, body)
+            except ValueError as e:
+                status, payload = 400, {"error": str(e)}
+            except Exception as e:
+                status, payload = 500, {"error": str(e)}
+
+            data = json.dumps(payload).encode("utf-8")
+            writer.write(
+                f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(data)}\r\n"
+                f"Connection: close\r\n\r\n".encode("ascii") + data
+            )
+            await writer.drain()
+            writer.close()
+        finally:
+            self.in_flight -= 1
+            if self.in_flight == 0:
+                self.idle.set()
+
+    async def _dispatch(self, method: str, path: str, body: bytes) -> Tuple[int, Dict[str, Any]]:
+        if method == "GET" and path == "/health":
+            return 200, {"status": "ok", "working_dir": WORKING_DIR, "build_version": self.version}
+
+        if method == "GET" and path == "/metrics":
+            snapshot = metrics.snapshot()
+            snapshot.pop("spans")
+            return 200, snapshot
+
+        if method != "POST" or path not in ("/query", "/retrieve"):
+            return 404, {"error": f"No route for {method} {path}"}
+
+        request = json.loads(body or b"{}")
+        if path == "/retrieve":
+            if not request.get("query"):
+                raise ValueError("'query' is required")
+            return 200, {"context": await retrieve_context(self.deps, request["query"])}
+
+        if not request.get("question"):
+            raise ValueError("'question' is required")
+        result = await doc_agent.run(request["question"], deps=self.deps)
+        return 200, {"answer": result.output}
+
+async def _read_request(reader: asyncio.StreamReader) -> Tuple[str, str, bytes]:
+    request_line = (await reader.readline()).decode("latin-1").strip()
+    parts = request_line.split(" ")
+    if len(parts) != 3:
+        raise ValueError(f"Malformed request line: {request_line!r}")
+
+    headers = {}
+    while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    body = await reader.readexactly(int(headers.get("content-length", "0")))
+    return parts[0], parts[1].split("?", 1)[0], body
+
+def _make_listener(host: str, port: int, socket_path: Optional[str], listen_fd: Optional[int]) -> socket.socket:
+    if listen_fd is not None:
+        # inherited from the previous server process
+        return socket.socket(fileno=listen_fd)
+
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(socket_path)
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, port))
+    sock.listen(128)
+    return sock
+
+def _reexec(listen_fd: int):
+    args = sys.orig_argv[1:]
+    if "--listen-fd" in args:
+        index = args.index("--listen-fd")
+        del args[index:index + 2]
+    os.execv(sys.executable, [sys.executable, *args, "--listen-fd", str(listen_fd)])
+
+def main():
+    if not os.path.exists(WORKING_DIR):
+        print(f"Error: {WORKING_DIR} must be present and contains RAG docs.")
+        sys.exit(1)
+
+    if not os.getenv("LLM_TYPE") or os.getenv("LLM_TYPE") not in ["openai", "gemini", "ollama", "fake"]:
+        print("Error: LLM_TYPE environment variable not set or invalid.")
+        print("Please create a .env file with LLM_TYPE set to 'openai', 'gemini', 'ollama', or 'fake' (offline).")
+        sys.exit(1)
+
+    parser = argparse.ArgumentParser(description="Serve LightRAG queries from a warm, resident process")
+    parser.add_argument("--host", default="127.0.0.1", help="TCP host to listen on")
+    parser.add_argument("--port", type=int, default=8765, help="TCP port to listen on")
+    parser.add_argument("--socket", help="unix socket path to listen on instead of TCP")
+    parser.add_argument("--reload-interval", type=float, default=5.0, help="seconds between checks for a finished build")
+    parser.add_argument("--listen-fd", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    sock = _make_listener(args.host, args.port, args.socket, args.listen_fd)
+    asyncio.run(QueryServer(sock, reload_interval=args.reload_interval).start())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+import os
+import re
+import base64
+import hashlib
+import unicodedata
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from service.telemetry.metrics import estimate_tokens
+
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.85"))
+# sections shorter than this are kept even when repeated (titles, one-line notes)
+DEDUP_MIN_SECTION_TOKENS = int(os.getenv("DEDUP_MIN_SECTION_TOKENS", "64"))
+
+# lines rendered from GitHub/GitLab page chrome by the browser crawler. Single words
+# ("Security", "Code", "Raw") only count as chrome when they link back to the host,
+# the way the crawler renders tab bars, file toolbars and footers.
+_HOST_LINK = r"\]\(https?://([\w-]+\.)*(github|gitlab)\.com(/[^)]*)?\)"
+CHROME_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in (
+    r"^\[?skip to (main )?content\]?(\(.*\))?$",
+    r"^(navigation menu|toggle navigation|search or jump to\.{0,3}|search code, repositories, users, issues, pull requests\.{0,3})$",
+    r"^\[(sign in|sign up|log in|register)" + _HOST_LINK + "$",
+    r"^you signed (in|out) (with|in) another tab or window\..*$",
+    r"^you switched accounts on another tab or window\..*$",
+    r"^reload to refresh your session\.?$",
+    r"^dismiss alert$",
+    r"^\[(notifications|fork|star|watch|code|issues|pull requests|merge requests|actions|projects|wiki|security|insights)( \d+[kKmM]?)?" + _HOST_LINK + "$",
+    r"^\[(raw|blame|history|permalink|preview|code|top|go to file)" + _HOST_LINK + "$",
+    r"^(copy path|copy raw file|download raw file|edit this file|open in web ide|file metadata and controls)$",
+    r"^\d+ lines? \(\d+ loc\) · [\d.]+ [kmg]?b$",
+    r"^© \d{4} (github|gitlab),? inc\.?.*$",
+    r"^\[(terms|privacy|security|status|docs|contact|manage cookies|do not share my personal information)" + _HOST_LINK + "$",
+)]
+
+# a line made only of markdown links/images (navigation bars, badge rows)
+LINK_ONLY = re.compile(r"^\s*([*+-]\s*)?((!?\[[^\]]*\]\([^)]*\)|\|)\s*)+$")
+# a run of at least this many link-only lines at the top or bottom is treated as navigation
+MIN_NAV_LINES = 3
+
+SHINGLE_WORDS = 5
+NUM_PERM = 128
+BANDS = 16
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+def encode_signature(signature: np.ndarray) -> str:
+    """Serialize a MinHash signature for the build manifest."""
+    # values are masked to 32 bits, so uint32 is lossless
+    return base64.b64encode(signature.astype("<u4").tobytes()).decode("ascii")
+
+def decode_signature(encoded: str) -> Optional[np.ndarray]:
+    """Inverse of `encode_signature`; None for a missing or malformed value."""
+    try:
+        return np.frombuffer(base64.b64decode(encoded), dtype="<u4").astype(np.uint64) if encoded else None
+    except ValueError:
+        return None
+
+def _is_chrome(line: str) -> bool:
+    stripped = line.strip()
+    return any(pattern.match(stripped) for pattern in CHROME_PATTERNS)
+
+def _trim_navigation(lines: List[str]) -> List[str]:
+    def nav_run(ordered: List[str]) -> int:
+        run = links = 0
+        for line in ordered:
+            if line.strip() and not LINK_ONLY.match(line):
+                break
+            run += 1
+            links += bool(line.strip())
+        return run if links >= MIN_NAV_LINES else 0
+
+    head = nav_run(lines)
+    lines = lines[head:]
+    tail = nav_run(lines[::-1])
+    return lines[:len(lines) - tail]
+
+def strip_chrome(markdown: str) -> str:
+    """Remove page chrome (navigation, file headers, footers) rendered into crawled markdown.
+
+    Only meant for pages rendered by the browser crawler: raw and local
+    markdown has no chrome, and its trailing link lists are real content.
+
+    Args:
+        markdown: The document markdown.
+
+    Returns:
+        The markdown without chrome lines; fenced code blocks are left untouched.
+    """
+    lines = []
+    in_code = False
+    for line in markdown.split("\n"):
+        if line.lstrip().startswith(("```", "~~~")):
+            in_code = not in_code
+        if in_code or not _is_chrome(line):
+            lines.append(line)
+    return "\n".join(_trim_navigation(lines))
+
+def normalize_markdown(markdown: str) -> str:
+    """Normalize markdown so that equivalent documents hash and shingle the same.
+
+    Unifies line endings and unicode, drops HTML comments and trailing
+    whitespace, and collapses runs of blank lines outside code blocks.
+    """
+    markdown = unicodedata.normalize("NFC", markdown.replace("\r\n", "\n").replace("\r", "\n"))
+    markdown = re.sub(r"<!--.*?-->", "", markdown, flags=re.DOTALL)
+
+    lines = []
+    in_code = False
+    for line in markdown.split("\n"):
+        if line.lstrip().startswith(("```", "~~~")):
+            in_code = not in_code
+        line = line.rstrip()
+        if not in_code and not line and lines and not lines[-1]:
+            continue
+        lines.append(line)
+    return "\n".join(lines).strip() + "\n"
+
+def split_sections(markdown: str) -> List[str]:
+    """Split markdown into sections at ATX headings outside code blocks."""
+    sections: List[List[str]] = [[]]
+    in_code = False
+    for line in markdown.split("\n"):
+        if line.lstrip().startswith(("```", "~~~")):
+            in_code = not in_code
+        if not in_code and re.match(r"^#{1,6} ", line) and sections[-1]:
+            sections.append([])
+        sections[-1].append(line)
+    return ["\n".join(section) for section in sections if any(line.strip() for line in section)]
+
+class Deduplicator:
+    """Exact and near-duplicate detection over documents and sections.
+
+    Exact duplicates are caught by content hash. Near duplicates are found
+    with MinHash signatures over word shingles and banded LSH; candidates
+    are confirmed when their estimated Jaccard similarity reaches `threshold`.
+    """
+    def __init__(self, threshold: float = DEDUP_THRESHOLD, num_perm: int = NUM_PERM, bands: int = BANDS, seed: int = 1):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        generator = np.random.RandomState(seed)
+        self.a = generator.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self.b = generator.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+        self.hashes: Dict[str, str] = {}
+        self.digests: Dict[str, str] = {}
+        self.signatures: Dict[str, np.ndarray] = {}
+        self.buckets: Dict[Tuple[int, bytes], List[str]] = defaultdict(list)
+
+    def signature(self, text: str) -> np.ndarray:
+        words = re.findall(r"\w+", text.lower())
+        shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(max(1, len(words) - SHINGLE_WORDS + 1))}
+        values = np.array(
+            [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") for s in shingles],
+            dtype=np.uint64,
+        )
+        permuted = (np.outer(values, self.a) + self.b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0)
+
+    def _bands(self, signature: np.ndarray):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def find(self, text: str, exclude: Optional[str] = None) -> Tuple[Optional[str], Optional[np.ndarray]]:
+        """Return the key of an exact or near duplicate of `text` (or None) and its signature.
+
+        Args:
+            text: The text to look up.
+            exclude: A key never reported as the duplicate (the text's own previous version).
+        """
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        if self.hashes.get(digest, exclude) != exclude:
+            return self.hashes[digest], None
+        if self.threshold >= 1:
+            return None, None
+
+        signature = self.signature(text)
+        for band in self._bands(signature):
+            for key in self.buckets.get(band, []):
+                if key == exclude or key not in self.signatures:
+                    continue
+                if np.mean(self.signatures[key] == signature) >= self.threshold:
+                    return key, signature
+        return None, signature
+
+    def add(self, key: str, text: str, signature: Optional[np.ndarray] = None):
+        """Index `text` under `key`."""
+        if self.threshold < 1 and signature is None:
+            signature = self.signature(text)
+        self.index(key, hashlib.sha256(text.encode("utf-8")).hexdigest(), signature)
+
+    def index(self, key: str, digest: str, signature: Optional[np.ndarray] = None):
+        """Index a text by its sha256 digest and signature, replacing what `key` held before."""
+        previous = self.digests.pop(key, None)
+        if previous is not None and self.hashes.get(previous) == key:
+            del self.hashes[previous]
+        self.hashes[digest] = key
+        self.digests[key] = digest
+        if self.threshold >= 1 or signature is None:
+            return
+        # buckets of a replaced signature stay, but candidates are checked against the current one
+        self.signatures[key] = signature
+        for band in self._bands(signature):
+            self.buckets[band].append(key)
+
+    def remove(self, key: str):
+        """Forget the text indexed under `key`."""
+        digest = self.digests.pop(key, None)
+        if digest is not None and self.hashes.get(digest) == key:
+            del self.hashes[digest]
+        self.signatures.pop(key, None)
+
+class MarkdownCleaner:
+    """Strips crawled page chrome, normalizes markdown and drops duplicate documents and sections.
+
+    Keeps running counts of the estimated tokens saved per reason.
+    """
+    def __init__(self, threshold: float = DEDUP_THRESHOLD, min_section_tokens: int = DEDUP_MIN_SECTION_TOKENS):
+        self.documents = Deduplicator(threshold)
+        self.sections = Deduplicator(threshold)
+        self.min_section_tokens = min_section_tokens
+        self.tokens_saved: Dict[str, int] = defaultdict(int)
+
+    def clean(self, markdown: str, crawled: bool = False) -> str:
+        """Normalize one document, stripping page chrome if it was rendered by the crawler.
+
+        Args:
+            markdown: The document markdown.
+            crawled: The document is a crawled page rather than raw or local markdown.
+
+        Returns:
+            The cleaned markdown.
+        """
+        if not crawled:
+            return normalize_markdown(markdown)
+        stripped = strip_chrome(markdown)
+        self.tokens_saved["chrome"] += max(0, estimate_tokens(markdown) - estimate_tokens(stripped))
+        return normalize_markdown(stripped)
+
+    def seed(self, url: str, md_hash: str, signature: Optional[np.ndarray] = None):
+        """Index a document already in the index, so documents of this build are checked against it."""
+        self.documents.index(url, md_hash, signature)
+
+    def forget(self, url: str):
+        """Stop deduplicating against a document that left the index."""
+        self.documents.remove(url)
+
+    def duplicate_of(self, url: str, markdown: str) -> Tuple[Optional[str], Optional[np.ndarray]]:
+        """Check a document against every document seen or seeded so far.
+
+        Returns:
+            The URL of a duplicate (None if there is none, in which case the
+            document is indexed) and the document's MinHash signature.
+        """
+        duplicate, signature = self.documents.find(markdown, exclude=url)
+        if duplicate is not None:
+            self.tokens_saved["duplicate_documents"] += estimate_tokens(markdown)
+            return duplicate, signature
+        if signature is None and self.documents.threshold < 1:
+            signature = self.documents.signature(markdown)
+        self.documents.add(url, markdown, signature)
+        return None, signature
+
+    def drop_duplicate_sections(self, url: str, markdown: str) -> Tuple[str, List[str]]:
+        """Remove sections that repeat a long-enough section of another document.
+
+        Returns:
+            The remaining markdown and the URLs of the documents whose sections
+            were repeated, so the caller can re-insert the document when they change.
+        """
+        kept = []
+        sources = set()
+        for index, section in enumerate(split_sections(markdown)):
+            tokens = estimate_tokens(section)
+            if tokens < self.min_section_tokens:
+                kept.append(section)
+                continue
+            duplicate, signature = self.sections.find(section)
+            if duplicate is not None and not duplicate.startswith(f"{url}#"):
+                self.tokens_saved["duplicate_sections"] += tokens
+                sources.add(duplicate.rsplit("#", 1)[0])
+                continue
+            self.sections.add(f"{url}#{index}", section, signature)
+            kept.append(section)
+        return "\n".join(kept).strip() + "\n", sorted(sources)
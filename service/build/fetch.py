@@ -0,0 +1,27 @@
+from typing import Optional
+
+from service.repo.model import RepoFile
+from service.repo.typex import get_file_content
+from service.telemetry.metrics import metrics
+
+from .model import Document
+
+async def fetch_document(file: RepoFile) -> Optional[Document]:
+    """Download the raw markdown of a repository file over HTTP.
+
+    Args:
+        file: The file to download.
+
+    Returns:
+        The fetched document, or None if the download failed.
+    """
+    try:
+        with metrics.span("fetch"):
+            markdown = await get_file_content(file)
+    except Exception as e:
+        print(f"Failed to fetch {file.url}: {e}")
+        return None
+
+    metrics.inc("fetch_bytes_total", len(markdown.encode("utf-8")))
+
+    return Document(url=file.url, markdown=markdown, repo_url=file.repo_url, sha=file.sha)
@@ -0,0 +1,100 @@
+import os
+import json
+import time
+import hashlib
+from typing import Dict, List, Optional, Set
+
+MANIFEST_FILE = "build_manifest.json"
+BUILD_MARKER_FILE = "build_complete.json"
+
+def write_build_marker(working_dir: str):
+    """Mark the index in `working_dir` as completely built."""
+    path = os.path.join(working_dir, BUILD_MARKER_FILE)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump({"finished_at": time.time()}, f)
+    os.replace(f"{path}.tmp", path)
+
+def build_version(working_dir: str) -> Optional[float]:
+    """Return a value that changes every time a build of `working_dir` completes."""
+    path = os.path.join(working_dir, BUILD_MARKER_FILE)
+    return os.path.getmtime(path) if os.path.exists(path) else None
+
+def newer_build(working_dir: str, version: Optional[float]) -> Optional[float]:
+    """Return the version of a build of `working_dir` completed after `version`, or None.
+
+    A full build deletes the working dir, marker included, before it starts
+    inserting; a missing marker means a build is in progress, never that a
+    new index is ready.
+    """
+    current = build_version(working_dir)
+    if current is None or (version is not None and current <= version):
+        return None
+    return current
+
+def doc_id_for(url: str) -> str:
+    """Return the stable LightRAG document id for a source URL.
+
+    Args:
+        url: The document source URL.
+
+    Returns:
+        The document id (same `doc-<md5>` shape LightRAG uses by default).
+    """
+    return "doc-" + hashlib.md5(url.encode("utf-8")).hexdigest()
+
+def content_hash(text: str) -> str:
+    """Return the content hash recorded for a document."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class BuildManifest:
+    """Persistent map of source URL -> blob SHA / content hash / doc id.
+
+    The manifest lives next to the LightRAG storages so that it always
+    describes what is actually in the working directory. Documents that
+    were fetched but not inserted (empty or duplicates) are recorded with
+    an empty doc id, so incremental builds do not fetch them again.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, Dict] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f).get("documents", {})
+
+    def get(self, url: str) -> Optional[Dict]:
+        return self.entries.get(url)
+
+    def is_current(self, url: str, sha: str) -> bool:
+        """Return True if the URL was processed from the same blob SHA."""
+        entry = self.entries.get(url)
+        return bool(entry and sha and entry.get("sha") == sha)
+
+    def urls_for_repo(self, repo_url: str) -> List[str]:
+        return [url for url, entry in self.entries.items() if entry.get("repo_url") == repo_url]
+
+    def duplicates_of(self, urls: Set[str]) -> Set[str]:
+        """Return the URLs dropped, in whole or in sections, as duplicates of any of `urls`."""
+        return {url for url, entry in self.entries.items()
+                if entry.get("duplicate_of") in urls or urls.intersection(entry.get("section_sources", []))}
+
+    def record(self, url: str, repo_url: str, sha: str, md_hash: str, doc_id: str,
+               signature: str = "", duplicate_of: str = "", section_sources: Optional[List[str]] = None):
+        self.entries[url] = {"repo_url": repo_url, "sha": sha, "hash": md_hash, "doc_id": doc_id}
+        if signature:
+            # MinHash signature of the document, to dedup later builds against it
+            self.entries[url]["signature"] = signature
+        if duplicate_of:
+            self.entries[url]["duplicate_of"] = duplicate_of
+        if section_sources:
+            # documents whose sections were dropped from this one
+            self.entries[url]["section_sources"] = list(section_sources)
+
+    def remove(self, url: str):
+        self.entries.pop(url, None)
+
+    def save(self):
+        """Atomically write the manifest to disk."""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"documents": self.entries}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,29 @@
+from dataclasses import dataclass, field
+from typing import List
+
+@dataclass
+class Document:
+    """A fetched document travelling through the build pipeline.
+
+    Attributes:
+        url: The document source URL.
+        markdown: The markdown content.
+        repo_url: The repository (or website) the document belongs to.
+        sha: The git blob SHA, if the document came from a repository tree.
+        md_hash: Content hash of the cleaned markdown before section dedup,
+            recorded in the manifest to detect unchanged documents.
+        signature: Encoded MinHash signature of the cleaned markdown, recorded
+            in the manifest so later builds dedup against this document.
+        section_sources: URLs of the documents whose sections were dropped
+            from this one as duplicates.
+        crawled: The markdown was rendered from a web page by the browser
+            crawler, so it may carry page chrome.
+    """
+    url: str
+    markdown: str
+    repo_url: str = ""
+    sha: str = ""
+    md_hash: str = ""
+    signature: str = ""
+    section_sources: List[str] = field(default_factory=list)
+    crawled: bool = False
@@ -0,0 +1,227 @@
+import os
+import asyncio
+from collections import defaultdict
+from typing import AsyncIterable, Dict, List, Optional
+
+from lightrag import LightRAG
+
+from service.repo.model import RepoFile
+from service.telemetry.metrics import estimate_tokens, metrics
+
+from .clean import DEDUP_THRESHOLD, MarkdownCleaner, decode_signature, encode_signature
+from .fetch import fetch_document
+from .manifest import BuildManifest, content_hash, doc_id_for
+from .model import Document
+from .staging import StagingStore
+
+DEFAULT_QUEUE_SIZE = int(os.getenv("BUILD_QUEUE_SIZE", "64"))
+DEFAULT_BATCH_TOKENS = int(os.getenv("INSERT_BATCH_TOKENS", "32000"))
+DEFAULT_BATCH_DOCS = int(os.getenv("INSERT_BATCH_DOCS", "20"))
+DEFAULT_FLUSH_SECONDS = float(os.getenv("INSERT_FLUSH_SECONDS", "5"))
+
+class BuildPipeline:
+    """Streams documents through fetch -> clean -> insert stages.
+
+    Stages are joined by bounded asyncio queues so fetching overlaps with
+    LightRAG extraction and memory stays proportional to the queue sizes
+    rather than the corpus size. Fetched documents are written to the
+    staging store so an interrupted build can resume without fetching
+    them again. The clean stage strips page chrome from crawled pages,
+    normalizes the markdown and drops exact and near-duplicate documents
+    and sections before they cost any extraction tokens. The insert stage groups documents into
+    list-form `ainsert` calls sized by token count so LightRAG can extract
+    chunks of several documents in parallel.
+    """
+    def __init__(self,
+                 rag: LightRAG,
+                 manifest: BuildManifest,
+                 max_concurrent: int = 20,
+                 queue_size: int = DEFAULT_QUEUE_SIZE,
+                 batch_tokens: int = DEFAULT_BATCH_TOKENS,
+                 batch_docs: int = DEFAULT_BATCH_DOCS,
+                 flush_seconds: float = DEFAULT_FLUSH_SECONDS,
+                 dedup_threshold: float = DEDUP_THRESHOLD,
+                 staging: Optional[StagingStore] = None,
+                 resume: bool = False):
+        self.rag = rag
+        self.manifest = manifest
+        self.max_concurrent = max_concurrent
+        self.queue_size = queue_size
+        self.batch_tokens = batch_tokens
+        self.batch_docs = batch_docs
+        self.flush_seconds = flush_seconds
+        self.cleaner = MarkdownCleaner(threshold=dedup_threshold)
+        self.staging = staging
+        self.resume = resume
+        self.stats: Dict[str, int] = {"fetched": 0, "staged": 0, "unchanged": 0, "skipped": 0, "duplicates": 0,
+                                      "inserted": 0, "batches": 0, "tokens_saved": 0}
+        self.repo_stats: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    async def run(self, files: List[RepoFile], sources: Optional[List[AsyncIterable[Document]]] = None) -> Dict[str, int]:
+        """Run the pipeline to completion.
+
+        Args:
+            files: Repository files to download over HTTP.
+            sources: Additional document producers (e.g. the browser crawler).
+
+        Returns:
+            Pipeline counters.
+        """
+        # dedup against what is already indexed, not only against this build's documents
+        refetched = {file.url for file in files}
+        for url, entry in self.manifest.entries.items():
+            if entry.get("doc_id") and url not in refetched:
+                self.cleaner.seed(url, entry["hash"], decode_signature(entry.get("signature", "")))
+
+        files_queue: asyncio.Queue = asyncio.Queue()
+        for file in files:
+            files_queue.put_nowait(file)
+        fetched: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        cleaned: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+
+        async def producers():
+            async with asyncio.TaskGroup() as tg:
+                for _ in range(min(self.max_concurrent, len(files))):
+                    tg.create_task(self._fetch_stage(files_queue, fetched))
+                for source in sources or []:
+                    tg.create_task(self._source_stage(source, fetched))
+            await fetched.put(None)
+
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(producers())
+            tg.create_task(self._clean_stage(fetched, cleaned))
+            tg.create_task(self._insert_stage(cleaned))
+
+        return self.stats
+
+    async def _fetch_stage(self, files_queue: asyncio.Queue, fetched: asyncio.Queue):
+        while not files_queue.empty():
+            file = files_queue.get_nowait()
+            doc = self.staging.get(file.url, file.sha) if self.staging else None
+            if doc:
+                self.stats["staged"] += 1
+            else:
+                doc = await fetch_document(file)
+                if doc and self.staging:
+                    self.staging.put(doc)
+            if doc:
+                await fetched.put(doc)
+            else:
+                self.repo_stats[file.repo_url]["failed"] += 1
+
+    async def _source_stage(self, source: AsyncIterable[Document], fetched: asyncio.Queue):
+        async for doc in source:
+            metrics.inc("crawled_docs_total")
+            await fetched.put(doc)
+
+    async def _clean_stage(self, fetched: asyncio.Queue, cleaned: asyncio.Queue):
+        seen = set()
+        while (doc := await fetched.get()) is not None:
+            self.stats["fetched"] += 1
+            self.repo_stats[doc.repo_url]["fetched"] += 1
+            doc.markdown = self.cleaner.clean(doc.markdown, crawled=doc.crawled) if doc.markdown else ""
+            if doc.url in seen:
+                print(f"Skipping {doc.url} - duplicate URL")
+                self.stats["skipped"] += 1
+                self.repo_stats[doc.repo_url]["skipped"] += 1
+                continue
+            seen.add(doc.url)
+            if not doc.markdown.strip():
+                print(f"Skipping {doc.url} - no markdown content found")
+                self.stats["skipped"] += 1
+                self.repo_stats[doc.repo_url]["skipped"] += 1
+                await self._drop(doc)
+                continue
+
+            duplicate, signature = self.cleaner.duplicate_of(doc.url, doc.markdown)
+            if duplicate:
+                print(f"Skipping {doc.url} - duplicate of {duplicate}")
+                self.stats["duplicates"] += 1
+                self.repo_stats[doc.repo_url]["duplicates"] += 1
+                await self._drop(doc, duplicate_of=duplicate)
+                continue
+
+            doc.md_hash = content_hash(doc.markdown)
+            doc.signature = encode_signature(signature) if signature is not None else ""
+            entry = self.manifest.get(doc.url)
+            if entry and entry.get("doc_id") and entry.get("hash") == doc.md_hash and not entry.get("section_sources"):
+                # blob changed but the content did not: nothing to re-extract. Documents that
+                # lost sections to others are re-inserted, since those others may have changed
+                self.manifest.record(doc.url, doc.repo_url, doc.sha, entry["hash"], entry["doc_id"], doc.signature)
+                self.stats["unchanged"] += 1
+                self.repo_stats[doc.repo_url]["unchanged"] += 1
+                continue
+
+            doc.markdown, doc.section_sources = self.cleaner.drop_duplicate_sections(doc.url, doc.markdown)
+            await cleaned.put(doc)
+
+        for reason, tokens in self.cleaner.tokens_saved.items():
+            metrics.inc("clean_tokens_saved_total", tokens, reason=reason)
+        self.stats["tokens_saved"] = sum(self.cleaner.tokens_saved.values())
+        await cleaned.put(None)
+
+    async def _drop(self, doc: Document, duplicate_of: str = ""):
+        """Record a document that will not be inserted, removing its previous version from the index."""
+        entry = self.manifest.get(doc.url)
+        if entry and entry.get("doc_id"):
+            print(f"Removing previous version of {doc.url} from RAG...")
+            await self.rag.adelete_by_doc_id(entry["doc_id"])
+            self.cleaner.forget(doc.url)
+        # an empty doc id keeps --incremental from fetching the same blob again
+        self.manifest.record(doc.url, doc.repo_url, doc.sha, content_hash(doc.markdown), "", duplicate_of=duplicate_of)
+        if entry:
+            self.manifest.save()
+
+    async def _insert_stage(self, cleaned: asyncio.Queue):
+        batch: List[Document] = []
+        tokens = 0
+        while True:
+            try:
+                doc = await asyncio.wait_for(cleaned.get(), timeout=self.flush_seconds if batch else None)
+            except asyncio.TimeoutError:
+                # upstream is slow: do not keep a partial batch idle
+                await self._insert_batch(batch)
+                batch, tokens = [], 0
+                continue
+
+            if doc is None:
+                break
+
+            batch.append(doc)
+            tokens += estimate_tokens(doc.markdown)
+            if tokens >= self.batch_tokens or len(batch) >= self.batch_docs:
+                await self._insert_batch(batch)
+                batch, tokens = [], 0
+
+        if batch:
+            await self._insert_batch(batch)
+        self.manifest.save()
+
+    async def _insert_batch(self, batch: List[Document]):
+        for doc in batch:
+            entry = self.manifest.get(doc.url)
+            if entry and entry.get("doc_id"):
+                print(f"Removing previous version of {doc.url} from RAG...")
+                await self.rag.adelete_by_doc_id(entry["doc_id"])
+                self.manifest.remove(doc.url)
+            elif self.resume and await self.rag.doc_status.get_by_id(doc_id_for(doc.url)):
+                # the interrupted run partially inserted this document
+                await self.rag.adelete_by_doc_id(doc_id_for(doc.url))
+
+        print(f"Inserting {len(batch)} documents into RAG...")
+        ids = [doc_id_for(doc.url) for doc in batch]
+        with metrics.span("insert_batch"):
+            await self.rag.ainsert([doc.markdown for doc in batch], ids=ids)
+        metrics.inc("inserted_docs_total", len(batch))
+        metrics.inc("inserted_tokens_total", sum(estimate_tokens(doc.markdown) for doc in batch))
+
+        for doc, doc_id in zip(batch, ids):
+            self.manifest.record(doc.url, doc.repo_url, doc.sha, doc.md_hash or content_hash(doc.markdown), doc_id,
+                                 doc.signature, section_sources=doc.section_sources)
+            self.repo_stats[doc.repo_url]["inserted"] += 1
+        # the saved manifest is the checkpoint of what is inserted
+        self.manifest.save()
+        if self.staging:
+            self.staging.remove(doc.url for doc in batch)
+        self.stats["inserted"] += len(batch)
+        self.stats["batches"] += 1
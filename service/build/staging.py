@@ -0,0 +1,65 @@
+import os
+import zlib
+import sqlite3
+from typing import Iterable, Optional
+
+from .model import Document
+
+# lives outside WORKING_DIR so a full build can wipe the index without losing fetched documents
+STAGING_PATH = os.getenv("BUILD_STAGING_PATH", "./.build-staging/staging.sqlite")
+
+def staging_path(workspace: str = "") -> str:
+    """Return the staging store path of an index (each shard gets its own store)."""
+    if not workspace:
+        return STAGING_PATH
+    root, ext = os.path.splitext(STAGING_PATH)
+    return f"{root}-{workspace}{ext}"
+
+class StagingStore:
+    """On-disk staging area for fetched documents awaiting insertion.
+
+    Documents are stored zlib-compressed in SQLite, keyed by URL along with
+    their blob SHA. A resumed build reads documents back from here instead
+    of fetching them again; rows are removed once the manifest records the
+    document as inserted, so the store only holds in-flight work.
+    """
+    def __init__(self, path: str = STAGING_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            " url TEXT PRIMARY KEY, repo_url TEXT, sha TEXT, markdown BLOB)"
+        )
+
+    def put(self, doc: Document):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?)",
+            (doc.url, doc.repo_url, doc.sha, zlib.compress(doc.markdown.encode("utf-8"))),
+        )
+
+    def get(self, url: str, sha: str) -> Optional[Document]:
+        """Return the staged document for `url` if it was fetched from the same blob SHA."""
+        if not sha:
+            return None
+        row = self.conn.execute(
+            "SELECT repo_url, markdown FROM documents WHERE url = ? AND sha = ?", (url, sha)
+        ).fetchone()
+        if row is None:
+            return None
+        return Document(url=url, markdown=zlib.decompress(row[1]).decode("utf-8"), repo_url=row[0], sha=sha)
+
+    def remove(self, urls: Iterable[str]):
+        self.conn.executemany("DELETE FROM documents WHERE url = ?", [(url,) for url in urls])
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def clear(self):
+        """Drop every staged document."""
+        self.conn.execute("DELETE FROM documents")
+        self.conn.execute("VACUUM")
+
+    def close(self):
+        self.conn.close()
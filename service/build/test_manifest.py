@@ -0,0 +1,42 @@
+from service.build.manifest import BuildManifest
+
+REPO = "file:///repo"
+
+def test_round_trips_entries(tmp_path):
+    path = str(tmp_path / "manifest.json")
+    manifest = BuildManifest(path)
+    manifest.record(f"{REPO}/a.md", REPO, "sha-a", "hash-a", "doc-a", signature="sig")
+    manifest.record(f"{REPO}/b.md", REPO, "sha-b", "hash-b", "", duplicate_of=f"{REPO}/a.md")
+    manifest.record(f"{REPO}/c.md", REPO, "sha-c", "hash-c", "doc-c", section_sources=[f"{REPO}/a.md"])
+    manifest.save()
+
+    loaded = BuildManifest(path)
+    assert loaded.entries == manifest.entries
+    assert loaded.get(f"{REPO}/a.md")["signature"] == "sig"
+    assert "section_sources" not in loaded.get(f"{REPO}/a.md")
+
+def test_is_current_compares_blob_shas(tmp_path):
+    manifest = BuildManifest(str(tmp_path / "manifest.json"))
+    manifest.record(f"{REPO}/a.md", REPO, "sha-a", "hash-a", "doc-a")
+
+    assert manifest.is_current(f"{REPO}/a.md", "sha-a")
+    assert not manifest.is_current(f"{REPO}/a.md", "sha-a2")
+    assert not manifest.is_current(f"{REPO}/a.md", "")
+    assert not manifest.is_current(f"{REPO}/new.md", "sha-a")
+
+def test_urls_for_repo(tmp_path):
+    manifest = BuildManifest(str(tmp_path / "manifest.json"))
+    manifest.record(f"{REPO}/a.md", REPO, "sha-a", "hash-a", "doc-a")
+    manifest.record("file:///other/a.md", "file:///other", "sha-o", "hash-o", "doc-o")
+
+    assert manifest.urls_for_repo(REPO) == [f"{REPO}/a.md"]
+
+def test_duplicates_of_covers_documents_and_sections(tmp_path):
+    manifest = BuildManifest(str(tmp_path / "manifest.json"))
+    manifest.record(f"{REPO}/a.md", REPO, "sha-a", "hash-a", "doc-a")
+    manifest.record(f"{REPO}/b.md", REPO, "sha-b", "hash-b", "", duplicate_of=f"{REPO}/a.md")
+    manifest.record(f"{REPO}/c.md", REPO, "sha-c", "hash-c", "doc-c", section_sources=[f"{REPO}/a.md"])
+    manifest.record(f"{REPO}/d.md", REPO, "sha-d", "hash-d", "doc-d")
+
+    assert manifest.duplicates_of({f"{REPO}/a.md"}) == {f"{REPO}/b.md", f"{REPO}/c.md"}
+    assert manifest.duplicates_of({f"{REPO}/d.md"}) == set()
@@ -0,0 +1,134 @@
+import os
+import time
+import dataclasses
+from typing import AsyncIterator, Callable, List
+
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelRequest,
+    SystemPromptPart,
+    ToolReturnPart,
+    UserPromptPart,
+)
+
+from service.telemetry.metrics import estimate_tokens, metrics
+
+# token budget of the message history sent with each turn
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "4000"))
+# most recent turns kept verbatim, tool returns included
+HISTORY_KEEP_TURNS = int(os.getenv("HISTORY_KEEP_TURNS", "2"))
+# older tool returns are cut to this many characters
+HISTORY_TOOL_RETURN_CHARS = int(os.getenv("HISTORY_TOOL_RETURN_CHARS", "300"))
+# minimum time between re-renders of a streamed answer
+STREAM_RENDER_INTERVAL_MS = float(os.getenv("STREAM_RENDER_INTERVAL_MS", "100"))
+
+def _part_tokens(part) -> int:
+    content = getattr(part, "content", None)
+    if content is None:
+        content = getattr(part, "args", None)
+    return estimate_tokens(content if isinstance(content, str) else str(content or ""))
+
+def message_tokens(message: ModelMessage) -> int:
+    """Estimated tokens of a request or response."""
+    return sum(_part_tokens(part) for part in message.parts)
+
+def split_turns(messages: List[ModelMessage]) -> List[List[ModelMessage]]:
+    """Group messages into turns, each starting at a request holding a user prompt."""
+    turns: List[List[ModelMessage]] = []
+    for message in messages:
+        starts_turn = isinstance(message, ModelRequest) and any(isinstance(p, UserPromptPart) for p in message.parts)
+        if starts_turn or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+def _summarize_tool_return(part: ToolReturnPart, max_chars: int) -> ToolReturnPart:
+    content = part.content if isinstance(part.content, str) else str(part.content)
+    if len(content) <= max_chars:
+        return part
+    omitted = estimate_tokens(content[max_chars:])
+    return dataclasses.replace(part, content=f"{content[:max_chars]}\n[... {omitted} tokens of earlier retrieved context omitted]")
+
+def _compact_turn(turn: List[ModelMessage], max_chars: int) -> List[ModelMessage]:
+    compacted = []
+    for message in turn:
+        if isinstance(message, ModelRequest) and any(isinstance(p, ToolReturnPart) for p in message.parts):
+            parts = [_summarize_tool_return(p, max_chars) if isinstance(p, ToolReturnPart) else p for p in message.parts]
+            message = dataclasses.replace(message, parts=parts)
+        compacted.append(message)
+    return compacted
+
+def compact_tool_returns(messages: List[ModelMessage],
+                         keep_turns: int = HISTORY_KEEP_TURNS,
+                         tool_return_chars: int = HISTORY_TOOL_RETURN_CHARS) -> List[List[ModelMessage]]:
+    """Cut the tool returns of all but the last `keep_turns` turns; returns the turns."""
+    turns = split_turns(messages)
+    older = len(turns) - keep_turns
+    return [_compact_turn(turn, tool_return_chars) if i < older else turn for i, turn in enumerate(turns)]
+
+def compact_history(messages: List[ModelMessage],
+                    token_budget: int = HISTORY_TOKEN_BUDGET,
+                    keep_turns: int = HISTORY_KEEP_TURNS,
+                    tool_return_chars: int = HISTORY_TOOL_RETURN_CHARS) -> List[ModelMessage]:
+    """Fit a conversation's message history into a token budget.
+
+    Tool returns (retrieved contexts) of all but the last `keep_turns`
+    turns are cut to their first `tool_return_chars` characters; if the
+    history is still over budget, the oldest turns are dropped whole so
+    tool calls stay paired with their returns. The system prompt of the
+    first request is kept. The input list is not modified.
+
+    Args:
+        messages: The full message history.
+        token_budget: Token budget of the returned history.
+        keep_turns: Number of recent turns kept verbatim.
+        tool_return_chars: Characters kept of older tool returns.
+
+    Returns:
+        The compacted message history.
+    """
+    if not messages:
+        return []
+
+    turns = compact_tool_returns(messages, keep_turns, tool_return_chars)
+    sizes = [sum(message_tokens(m) for m in turn) for turn in turns]
+    dropped = 0
+    while len(turns) - dropped > 1 and sum(sizes[dropped:]) > token_budget:
+        dropped += 1
+
+    system_parts = [p for p in messages[0].parts if isinstance(p, SystemPromptPart)] if isinstance(messages[0], ModelRequest) else []
+    compacted = [message for turn in turns[dropped:] for message in turn]
+    if dropped and system_parts and isinstance(compacted[0], ModelRequest):
+        compacted[0] = dataclasses.replace(compacted[0], parts=system_parts + list(compacted[0].parts))
+
+    metrics.inc("history_turns_dropped_total", dropped)
+    metrics.observe("history_tokens", sum(sizes[dropped:]))
+    return compacted
+
+async def render_throttled(deltas: AsyncIterator[str], render: Callable[[str], None],
+                           interval_ms: float = STREAM_RENDER_INTERVAL_MS) -> str:
+    """Render a stream of text deltas at most once per `interval_ms`.
+
+    Deltas are buffered and the accumulated text is rendered on a time
+    slice instead of on every delta, so long answers do not re-render
+    their full markdown for each token.
+
+    Args:
+        deltas: Streamed text deltas.
+        render: Called with the accumulated text (the final call has all of it).
+        interval_ms: Minimum time between renders.
+
+    Returns:
+        The full text.
+    """
+    chunks: List[str] = []
+    last_render = 0.0
+    async for delta in deltas:
+        chunks.append(delta)
+        now = time.perf_counter()
+        if (now - last_render) * 1000 >= interval_ms:
+            render("".join(chunks) + "▌")
+            last_render = now
+    text = "".join(chunks)
+    render(text)
+    return text
@@ -0,0 +1,70 @@
+import asyncio
+
+from pydantic_ai.messages import (
+    ModelRequest,
+    ModelResponse,
+    SystemPromptPart,
+    TextPart,
+    ToolCallPart,
+    ToolReturnPart,
+    UserPromptPart,
+)
+
+from service.chat.history import compact_history, render_throttled, split_turns
+
+def turn(question: str, context: str, answer: str, system: str = ""):
+    """One agent turn: the question, a retrieve tool call and its return, the answer."""
+    parts = ([SystemPromptPart(content=system)] if system else []) + [UserPromptPart(content=question)]
+    return [
+        ModelRequest(parts=parts),
+        ModelResponse(parts=[ToolCallPart(tool_name="retrieve", args={"search_query": question}, tool_call_id=question)]),
+        ModelRequest(parts=[ToolReturnPart(tool_name="retrieve", content=context, tool_call_id=question)]),
+        ModelResponse(parts=[TextPart(content=answer)]),
+    ]
+
+def tool_returns(messages):
+    return [p.content for m in messages if isinstance(m, ModelRequest) for p in m.parts if isinstance(p, ToolReturnPart)]
+
+def test_split_turns_starts_at_user_prompts():
+    messages = turn("q1", "c1", "a1") + turn("q2", "c2", "a2")
+
+    assert split_turns(messages) == [messages[:4], messages[4:]]
+
+def test_cuts_older_tool_returns_only():
+    messages = turn("q1", "x" * 1000, "a1") + turn("q2", "y" * 1000, "a2")
+
+    compacted = compact_history(messages, token_budget=10000, keep_turns=1, tool_return_chars=100)
+
+    old, recent = tool_returns(compacted)
+    assert old.startswith("x" * 100 + "\n[... ") and "omitted]" in old
+    assert recent == "y" * 1000
+    # the input is left untouched
+    assert tool_returns(messages) == ["x" * 1000, "y" * 1000]
+
+def test_drops_oldest_turns_over_budget_and_keeps_system_prompt():
+    messages = (turn("q1", "x" * 2000, "a1", system="be brief") + turn("q2", "y" * 2000, "a2")
+                + turn("q3", "z" * 2000, "a3"))
+
+    compacted = compact_history(messages, token_budget=600, keep_turns=3, tool_return_chars=100)
+
+    # whole turns go, so every tool call keeps its return
+    assert tool_returns(compacted) == ["z" * 2000]
+    assert [type(p) for p in compacted[0].parts] == [SystemPromptPart, UserPromptPart]
+    assert compacted[0].parts[0].content == "be brief"
+
+def test_keeps_the_latest_turn_even_over_budget():
+    messages = turn("q1", "x" * 4000, "a1")
+
+    assert compact_history(messages, token_budget=10) == messages
+    assert compact_history([]) == []
+
+def test_render_throttled_renders_full_text_last():
+    async def deltas():
+        for word in ["a", "b", "c"]:
+            yield word
+
+    rendered = []
+    text = asyncio.run(render_throttled(deltas(), rendered.append, interval_ms=60000))
+
+    assert text == "abc"
+    assert rendered == ["a▌", "abc"]
@@ -0,0 +1,126 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import functools
+from typing import Any, Callable, Dict, Optional
+
+from service.telemetry.metrics import metrics
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "1") != "0"
+# lives outside WORKING_DIR so completions survive full rebuilds
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "./.llm-cache/completions.sqlite")
+LLM_CACHE_MAX_MB = float(os.getenv("LLM_CACHE_MAX_MB", "512"))
+
+# evict down to this fraction of the cap so eviction does not run on every insert
+EVICT_TARGET = 0.9
+
+def _cache_params(kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    # LightRAG passes storage objects (hashing_kv) and trackers alongside the real
+    # generation params; only plain values take part in the key
+    return {k: v for k, v in kwargs.items() if isinstance(v, (str, int, float, bool, type(None), list, dict))}
+
+class CompletionCache:
+    """Persistent SQLite cache of LLM completions.
+
+    Keyed on (provider, model, system prompt, history, prompt, params).
+    Entries are evicted least recently used once the stored responses
+    exceed `max_bytes`.
+    """
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS completions ("
+            " key TEXT PRIMARY KEY, provider TEXT, model TEXT, response TEXT,"
+            " size INTEGER, created_at REAL, last_used REAL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS completions_last_used ON completions(last_used)")
+        self.size = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+
+    def key(self, provider: str, model: str, prompt: str, system_prompt: Optional[str],
+            history_messages: Optional[list], params: Dict[str, Any]) -> str:
+        raw = json.dumps([provider, model, system_prompt or "", history_messages or [], prompt, params],
+                         sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT response FROM completions WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        self.conn.execute("UPDATE completions SET last_used = ? WHERE key = ?", (time.time(), key))
+        return row[0]
+
+    def put(self, key: str, provider: str, model: str, response: str):
+        size = len(response.encode("utf-8"))
+        now = time.time()
+        previous = self.conn.execute("SELECT size FROM completions WHERE key = ?", (key,)).fetchone()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO completions VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, provider, model, response, size, now, now),
+        )
+        self.size += size - (previous[0] if previous else 0)
+        if self.size > self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        target = self.max_bytes * EVICT_TARGET
+        evicted = 0
+        for key, size in self.conn.execute("SELECT key, size FROM completions ORDER BY last_used").fetchall():
+            if self.size <= target:
+                break
+            self.conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+            self.size -= size
+            evicted += 1
+        metrics.inc("llm_cache_evictions_total", evicted)
+
+    def hit_rate(self) -> float:
+        total = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / total if total else 0.0
+
+@functools.lru_cache(maxsize=None)
+def get_completion_cache() -> CompletionCache:
+    """Process-wide completion cache at LLM_CACHE_PATH."""
+    return CompletionCache(LLM_CACHE_PATH, int(LLM_CACHE_MAX_MB * 1024 * 1024))
+
+def cache_llm_func(func: Callable, provider: str, model: str) -> Callable:
+    """Wrap a LightRAG `llm_model_func` with the persistent completion cache.
+
+    Args:
+        func: The provider's llm_model_func.
+        provider: The provider name, part of the cache key.
+        model: The completion model name, part of the cache key.
+
+    Returns:
+        An llm_model_func that only calls the provider on cache misses.
+    """
+    if not LLM_CACHE_ENABLED:
+        return func
+
+    @functools.wraps(func)
+    async def wrapper(prompt, system_prompt=None, history_messages=None, **kwargs):
+        if kwargs.get("stream"):
+            return await func(prompt, system_prompt=system_prompt, history_messages=history_messages or [], **kwargs)
+
+        cache = get_completion_cache()
+        key = cache.key(provider, model, prompt, system_prompt, history_messages, _cache_params(kwargs))
+        response = cache.get(key)
+        if response is not None:
+            metrics.inc("llm_cache_hits_total", provider=provider)
+            return response
+
+        metrics.inc("llm_cache_misses_total", provider=provider)
+        response = await func(prompt, system_prompt=system_prompt, history_messages=history_messages or [], **kwargs)
+        if isinstance(response, str) and response:
+            cache.put(key, provider, model, response)
+        return response
+
+    return wrapper
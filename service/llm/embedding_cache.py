@@ -0,0 +1,233 @@
+import os
+import re
+import json
+import hashlib
+import functools
+import dataclasses
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from service.telemetry.metrics import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory file locks, the store is then single-process
+    fcntl = None
+
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE", "1") != "0"
+# lives outside WORKING_DIR so vectors survive full rebuilds
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "./.embedding-cache")
+EMBEDDING_CACHE_MAX_MB = float(os.getenv("EMBEDDING_CACHE_MAX_MB", "1024"))
+
+KEY_BYTES = 16
+INITIAL_CAPACITY = 1024
+# fraction of the store freed when the size cap is hit
+EVICT_FRACTION = 0.1
+
+def embedding_key(model: str, text: str, context: str = "") -> bytes:
+    """Content address of one embedding: (model, context, text) hashed to 16 bytes."""
+    return hashlib.sha256(f"{model}\0{context}\0{text}".encode("utf-8")).digest()[:KEY_BYTES]
+
+class EmbeddingStore:
+    """Persistent, memory-mapped float32 embedding store for one (model, dim).
+
+    Vectors live in a `(capacity, dim)` float32 memmap. A parallel memmap of
+    16-byte keys and a last-used tick per slot form the index, which is
+    loaded into a dict on open. When the vectors exceed `max_bytes` the
+    least recently used slots are freed and reused.
+
+    The build, the query server, app.py and agent.py share one store.
+    Writes take an exclusive `fcntl` lock on the store and reload the index
+    first when another process wrote since (tracked by a generation
+    counter in meta.json), so two processes never claim the same slot.
+    Reads are lock-free: a slot's key is checked before and after its vector
+    is read, so a slot reused by another process reads as a miss.
+    """
+    def __init__(self, path: str, dim: int, max_bytes: int):
+        self.path = path
+        self.dim = dim
+        self.max_slots = max(1, int(max_bytes // (dim * 4)))
+        self.index: Dict[bytes, int] = {}
+        self.free: List[int] = []
+        self.tick = 0
+        self.generation = 0
+        os.makedirs(path, exist_ok=True)
+        with self._locked():
+            self._open(self._load_meta().get("capacity", 0) or min(INITIAL_CAPACITY, self.max_slots))
+
+    @contextmanager
+    def _locked(self):
+        """Hold the store's exclusive inter-process write lock."""
+        with open(os.path.join(self.path, "lock"), "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _meta_path(self) -> str:
+        return os.path.join(self.path, "meta.json")
+
+    def _load_meta(self) -> dict:
+        try:
+            with open(self._meta_path(), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if meta.get("dim") != self.dim:
+            return {}
+        self.tick = max(self.tick, meta.get("tick", 0))
+        self.generation = meta.get("generation", 0)
+        return meta
+
+    def _refresh(self):
+        """Reload the index if another process wrote to the store (call under the lock)."""
+        generation = self.generation
+        meta = self._load_meta()
+        if meta and self.generation != generation:
+            self._open(max(meta.get("capacity", 0), self.capacity))
+
+    def _memmap(self, name: str, dtype, shape) -> np.memmap:
+        path = os.path.join(self.path, name)
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        with open(path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        return np.memmap(path, dtype=dtype, mode="r+", shape=shape)
+
+    def _open(self, capacity: int):
+        self.capacity = capacity
+        self.keys = self._memmap("keys.bin", np.uint8, (capacity, KEY_BYTES))
+        self.ticks = self._memmap("ticks.bin", np.int64, (capacity,))
+        self.vectors = self._memmap("vectors.f32", np.float32, (capacity, self.dim))
+
+        self.index.clear()
+        self.free.clear()
+        for slot, key in enumerate(self.keys):
+            if key.any():
+                self.index[key.tobytes()] = slot
+            else:
+                self.free.append(slot)
+        # pop() hands out low slots first
+        self.free.reverse()
+
+    def _grow(self):
+        capacity = min(self.capacity * 2, self.max_slots)
+        if capacity <= self.capacity:
+            self._evict()
+            return
+        self._flush()
+        self._open(capacity)
+
+    def _evict(self):
+        count = max(1, int(len(self.index) * EVICT_FRACTION))
+        slots = sorted(self.index.values(), key=lambda slot: self.ticks[slot])[:count]
+        for slot in slots:
+            del self.index[self.keys[slot].tobytes()]
+            self.keys[slot] = 0
+            self.free.append(slot)
+        metrics.inc("embedding_cache_evictions_total", count)
+
+    def get(self, key: bytes) -> Optional[np.ndarray]:
+        slot = self.index.get(key)
+        if slot is None:
+            return None
+        if self.keys[slot].tobytes() != key:
+            # evicted and reused by another process since our index was loaded
+            del self.index[key]
+            return None
+        vector = np.array(self.vectors[slot])
+        if self.keys[slot].tobytes() != key:
+            return None
+        self.tick += 1
+        self.ticks[slot] = self.tick
+        return vector
+
+    def _put(self, key: bytes, vector: np.ndarray):
+        slot = self.index.get(key)
+        if slot is None:
+            if len(self.index) >= self.max_slots:
+                self._evict()
+            if not self.free:
+                self._grow()
+            slot = self.free.pop()
+            self.index[key] = slot
+        # the key is published after the vector, so a reader never pairs it with a stale vector
+        self.keys[slot] = 0
+        self.vectors[slot] = vector
+        self.keys[slot] = np.frombuffer(key, dtype=np.uint8)
+        self.tick += 1
+        self.ticks[slot] = self.tick
+
+    def put_many(self, items: List[Tuple[bytes, np.ndarray]]):
+        """Store vectors by key and flush them, under the inter-process write lock."""
+        with self._locked():
+            self._refresh()
+            for key, vector in items:
+                self._put(key, vector)
+            self._flush()
+
+    def put(self, key: bytes, vector: np.ndarray):
+        self.put_many([(key, vector)])
+
+    def _flush(self):
+        for array in (self.keys, self.ticks, self.vectors):
+            array.flush()
+        self.generation += 1
+        tmp_path = self._meta_path() + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "capacity": self.capacity, "tick": self.tick,
+                       "generation": self.generation}, f)
+        os.replace(tmp_path, self._meta_path())
+
+    def flush(self):
+        """Flush the memmaps and write the metadata atomically."""
+        with self._locked():
+            self._refresh()
+            self._flush()
+
+@functools.lru_cache(maxsize=None)
+def get_embedding_store(model: str, dim: int) -> EmbeddingStore:
+    """One store per (model, dim) under EMBEDDING_CACHE_DIR."""
+    name = re.sub(r"[^A-Za-z0-9_.-]+", "_", model)
+    return EmbeddingStore(os.path.join(EMBEDDING_CACHE_DIR, f"{name}-{dim}"), dim,
+                          int(EMBEDDING_CACHE_MAX_MB * 1024 * 1024))
+
+def cache_embedding_func(embedding_func, model: str):
+    """Wrap a LightRAG `EmbeddingFunc` so that only cache misses reach the provider.
+
+    Args:
+        embedding_func: The provider's EmbeddingFunc.
+        model: The embedding model name, part of the cache key.
+
+    Returns:
+        An EmbeddingFunc with the same attributes backed by the persistent cache.
+    """
+    if not EMBEDDING_CACHE_ENABLED:
+        return embedding_func
+
+    func = embedding_func.func
+    store = get_embedding_store(model, embedding_func.embedding_dim)
+
+    @functools.wraps(func)
+    async def wrapper(texts, *args, **kwargs):
+        context = str(kwargs.get("context") or "")
+        keys = [embedding_key(model, text, context) for text in texts]
+        vectors = [store.get(key) for key in keys]
+        misses = [i for i, vector in enumerate(vectors) if vector is None]
+        metrics.inc("embedding_cache_hits_total", len(texts) - len(misses))
+        metrics.inc("embedding_cache_misses_total", len(misses))
+
+        if misses:
+            computed = np.asarray(await func([texts[i] for i in misses], *args, **kwargs), dtype=np.float32)
+            for i, vector in zip(misses, computed):
+                vectors[i] = vector
+            store.put_many([(keys[i], vectors[i]) for i in misses])
+
+        return np.stack(vectors) if vectors else np.empty((0, store.dim), dtype=np.float32)
+
+    return dataclasses.replace(embedding_func, func=wrapper)
@@ -0,0 +1,88 @@
+"""Deterministic offline provider for benchmarks: no network, configurable latency."""
+import os
+import re
+import json
+import asyncio
+import hashlib
+
+import numpy as np
+from lightrag.prompt import PROMPTS
+
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "50"))
+FAKE_LLM_MS_PER_1K_TOKENS = float(os.getenv("FAKE_LLM_MS_PER_1K_TOKENS", "20"))
+FAKE_EMBED_LATENCY_MS = float(os.getenv("FAKE_EMBED_LATENCY_MS", "5"))
+FAKE_EMBEDDING_DIM = int(os.getenv("FAKE_EMBEDDING_DIM", "384"))
+
+# LightRAG's extraction delimiters (older releases use `("entity"<|>...)##` records,
+# newer ones one `entity<|#|>...` record per line)
+TUPLE_DELIMITER = PROMPTS.get("DEFAULT_TUPLE_DELIMITER", "<|>")
+RECORD_DELIMITER = PROMPTS.get("DEFAULT_RECORD_DELIMITER", "\n")
+COMPLETION_DELIMITER = PROMPTS.get("DEFAULT_COMPLETION_DELIMITER", "<|COMPLETE|>")
+
+def _tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+async def _simulate_latency(base_ms: float, tokens: int):
+    await asyncio.sleep((base_ms + FAKE_LLM_MS_PER_1K_TOKENS * tokens / 1000) / 1000)
+
+def _entities(text: str, limit: int = 6) -> list[str]:
+    # capitalized words near the end of the prompt, where the input text lives
+    seen = []
+    for word in re.findall(r"\b[A-Z][a-zA-Z0-9]{3,}\b", text[-4000:]):
+        if word.upper() not in seen:
+            seen.append(word.upper())
+        if len(seen) == limit:
+            break
+    return seen
+
+async def fake_model_func(
+    prompt, system_prompt=None, history_messages=[], keyword_extraction=False, **kwargs
+) -> str:
+    """Deterministic completion shaped like what LightRAG expects for each call type."""
+    text = (system_prompt or "") + "\n".join(m["content"] for m in history_messages or []) + prompt
+    entities = _entities(prompt)
+
+    if keyword_extraction or "high_level_keywords" in text:
+        response = json.dumps({"high_level_keywords": entities[:2], "low_level_keywords": entities[2:]})
+    elif "YES" in prompt and "NO" in prompt and "answer" in prompt.lower() and len(prompt) < 2000:
+        # gleaning loop check: never ask for another pass
+        response = "NO"
+    elif "entity" in text.lower() and TUPLE_DELIMITER in text:
+        response = _extraction(entities)
+    else:
+        response = "Fake answer about " + ", ".join(entities or ["the documentation"]) + "."
+
+    await _simulate_latency(FAKE_LLM_LATENCY_MS, _tokens(text) + _tokens(response))
+    return response
+
+class FakeTokenizer:
+    """Offline byte-level tokenizer (tiktoken would download its BPE files)."""
+    def encode(self, content: str) -> list[int]:
+        return list(content.encode("utf-8"))
+
+    def decode(self, tokens: list[int]) -> str:
+        return bytes(tokens).decode("utf-8", errors="ignore")
+
+def _extraction(entities: list[str]) -> str:
+    d = TUPLE_DELIMITER
+    if "DEFAULT_RECORD_DELIMITER" in PROMPTS:
+        records = [f'("entity"{d}{name}{d}CONCEPT{d}{name} as described in the document.)' for name in entities]
+        records += [f'("relationship"{d}{a}{d}{b}{d}{a} relates to {b}.{d}related{d}1.0)'
+                    for a, b in zip(entities, entities[1:])]
+    else:
+        records = [f"entity{d}{name}{d}concept{d}{name} as described in the document." for name in entities]
+        records += [f"relation{d}{a}{d}{b}{d}related{d}{a} relates to {b}." for a, b in zip(entities, entities[1:])]
+    return RECORD_DELIMITER.join(records) + RECORD_DELIMITER + COMPLETION_DELIMITER
+
+def _embed(text: str) -> np.ndarray:
+    # feature hashing: texts sharing words get similar vectors
+    vector = np.zeros(FAKE_EMBEDDING_DIM, dtype=np.float32)
+    for word in re.findall(r"\w+", text.lower()):
+        digest = hashlib.md5(word.encode("utf-8")).digest()
+        vector[int.from_bytes(digest[:4], "little") % FAKE_EMBEDDING_DIM] += 1.0 if digest[4] & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+async def fake_embedding_func(texts: list[str]) -> np.ndarray:
+    await asyncio.sleep(FAKE_EMBED_LATENCY_MS / 1000)
+    return np.stack([_embed(text) for text in texts])
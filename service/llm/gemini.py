@@ -0,0 +1,117 @@
+import os
+import atexit
+import random
+import asyncio
+import weakref
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
+import numpy as np
+from google import genai
+from google.genai import types
+from google.genai import errors as genai_errors
+
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "16"))
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "5"))
+GEMINI_RETRYABLE_CODES = (429, 500, 503)
+
+# clients and semaphores are per event loop: LightRAG and Streamlit may drive calls from different
+# loops, and the client's async connection pool must not be shared between them
+_genai_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, genai.Client]]" = weakref.WeakKeyDictionary()
+
+def _get_genai_client(api_key: str) -> genai.Client:
+    """Return the GenAI client of the running loop, so its connection pool is reused within the loop."""
+    clients = _genai_clients.setdefault(asyncio.get_running_loop(), {})
+    if api_key not in clients:
+        clients[api_key] = genai.Client(api_key=api_key)
+    return clients[api_key]
+
+_gemini_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+def _get_gemini_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    if loop not in _gemini_semaphores:
+        _gemini_semaphores[loop] = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+    return _gemini_semaphores[loop]
+
+# from source code: lightrag -> examples -> lightrag_gemini_demo.py
+async def gemini_model_func(
+    prompt, system_prompt=None, history_messages=[], keyword_extraction=False, **kwargs
+) -> str:
+    # 1. Reuse the shared GenAI Client with your Gemini API Key
+    client = _get_genai_client(os.getenv("GEMINI_API_KEY"))
+
+    # 2. Combine prompts: system prompt, history, and user prompt
+    if history_messages is None:
+        history_messages = []
+
+    combined_prompt = ""
+    if system_prompt:
+        combined_prompt += f"{system_prompt}\n"
+
+    for msg in history_messages:
+        # Each msg is expected to be a dict: {"role": "...", "content": "..."}
+        combined_prompt += f"{msg['role']}: {msg['content']}\n"
+
+    # Finally, add the new user prompt
+    combined_prompt += f"user: {prompt}"
+
+    # 3. Call the Gemini model through the async API, backing off on rate limits
+    for attempt in range(GEMINI_MAX_RETRIES + 1):
+        try:
+            async with _get_gemini_semaphore():
+                response = await client.aio.models.generate_content(
+                    model=os.getenv("LLM_MODEL", "gemini-1.5-flash"),
+                    contents=[combined_prompt],
+                    config=types.GenerateContentConfig(max_output_tokens=500, temperature=0.1),
+                )
+            break
+        except genai_errors.APIError as e:
+            if e.code not in GEMINI_RETRYABLE_CODES or attempt == GEMINI_MAX_RETRIES:
+                raise
+            delay = min(2 ** attempt, 60) * (0.5 + random.random() / 2)
+            print(f"Gemini call failed with {e.code}, retrying in {delay:.1f}s...")
+            await asyncio.sleep(delay)
+
+    # 4. Return the response text
+    return response.text
+
+
+# torch already parallelizes inside encode, so a small dedicated pool keeps
+# encoding off the event loop without oversubscribing the CPU
+_embedding_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("EMBEDDING_THREADS", "1")), thread_name_prefix="embedding"
+)
+
+@functools.lru_cache(maxsize=None)
+def _get_sentence_transformer(model_name: str):
+    """Load a SentenceTransformer model once per process."""
+    # torch is only imported once embeddings are actually needed
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
+@functools.lru_cache(maxsize=None)
+def _get_sentence_transformer_pool(model_name: str) -> dict:
+    """Start a multi-process CPU encoding pool once per process."""
+    model = _get_sentence_transformer(model_name)
+    pool = model.start_multi_process_pool(
+        target_devices=["cpu"] * int(os.getenv("EMBEDDING_POOL_WORKERS", str(os.cpu_count() or 1)))
+    )
+    atexit.register(model.stop_multi_process_pool, pool)
+    return pool
+
+def _encode(model_name: str, texts: list[str]) -> np.ndarray:
+    model = _get_sentence_transformer(model_name)
+    batch_size = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+    pool_min_texts = int(os.getenv("EMBEDDING_POOL_MIN_TEXTS", "0"))
+    if pool_min_texts and len(texts) >= pool_min_texts:
+        # spread large batches over CPU worker processes
+        return model.encode_multi_process(texts, _get_sentence_transformer_pool(model_name), batch_size=batch_size)
+    return model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+
+async def gemini_embedding_func(texts: list[str]) -> np.ndarray:
+    # encode off the event loop so queries and extraction keep running
+    return await asyncio.get_running_loop().run_in_executor(
+        _embedding_executor, _encode, os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2"), texts
+    )
@@ -0,0 +1,194 @@
+import os
+import time
+import random
+import asyncio
+import weakref
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+import httpx
+import numpy as np
+
+from service.telemetry.metrics import estimate_tokens, metrics
+
+OLLAMA_LLM_HOST = os.getenv("LLM_BINDING_HOST", "http://localhost:11434")
+OLLAMA_EMBED_HOST = os.getenv("EMBEDDING_BINDING_HOST", "http://localhost:11434")
+OLLAMA_EMBED_MODEL = os.getenv("EMBEDDING_MODEL", "bge-m3:latest")
+OLLAMA_NUM_CTX = int(os.getenv("OLLAMA_NUM_CTX", "8192"))
+OLLAMA_TIMEOUT = float(os.getenv("TIMEOUT", "300"))
+# how long Ollama keeps a model loaded after the last request
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+# a single local server serves few requests well at once; embedding and completion are limited separately
+OLLAMA_LLM_CONCURRENCY = int(os.getenv("OLLAMA_LLM_CONCURRENCY", "2"))
+OLLAMA_EMBED_CONCURRENCY = int(os.getenv("OLLAMA_EMBED_CONCURRENCY", "2"))
+# token budget of one /api/embed request (defaults to the model's input size)
+OLLAMA_EMBED_BATCH_TOKENS = int(os.getenv("OLLAMA_EMBED_BATCH_TOKENS", os.getenv("MAX_EMBED_TOKENS", "8192")))
+OLLAMA_EMBED_BATCH_SIZE = int(os.getenv("OLLAMA_EMBED_BATCH_SIZE", "64"))
+# halve the concurrency once latency exceeds this multiple of the best observed latency
+OLLAMA_BACKOFF_FACTOR = float(os.getenv("OLLAMA_BACKOFF_FACTOR", "2.0"))
+OLLAMA_MAX_RETRIES = int(os.getenv("OLLAMA_MAX_RETRIES", "5"))
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+# EWMA smoothing of request latencies
+LATENCY_ALPHA = 0.3
+
+class AdaptiveLimiter:
+    """Concurrency limit that backs off when a server slows down.
+
+    Starts at `max_limit` in-flight requests. Latency is tracked per token
+    processed (so large and small requests compare) as a moving average; when
+    it climbs above `backoff_factor` times the best average seen, the limit is
+    halved, and it grows back by one after each request at normal latency
+    (additive increase, multiplicative decrease).
+    """
+    def __init__(self, name: str, max_limit: int, backoff_factor: float = OLLAMA_BACKOFF_FACTOR):
+        self.name = name
+        self.max_limit = max(1, max_limit)
+        self.limit = self.max_limit
+        self.backoff_factor = backoff_factor
+        self.in_flight = 0
+        self.latency: Optional[float] = None
+        self.best_latency: Optional[float] = None
+        self._condition = asyncio.Condition()
+
+    def _observe(self, seconds_per_token: float):
+        self.latency = seconds_per_token if self.latency is None else (
+            (1 - LATENCY_ALPHA) * self.latency + LATENCY_ALPHA * seconds_per_token
+        )
+        self.best_latency = self.latency if self.best_latency is None else min(self.best_latency, self.latency)
+        if self.latency > self.best_latency * self.backoff_factor:
+            if self.limit > 1:
+                self.limit = max(1, self.limit // 2)
+                metrics.inc("ollama_backoffs_total", role=self.name)
+                # start over from the slower level so the limit is not halved on every request
+                self.best_latency = self.latency
+        elif self.limit < self.max_limit:
+            self.limit += 1
+        metrics.observe("ollama_concurrency", self.limit, role=self.name)
+
+    def backoff(self):
+        """Halve the limit after an overload error (429/503, timeout)."""
+        self.limit = max(1, self.limit // 2)
+        metrics.inc("ollama_backoffs_total", role=self.name)
+
+    @asynccontextmanager
+    async def acquire(self, tokens: int = 1):
+        """Hold a slot for one request of about `tokens` tokens."""
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+        start = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            if ok:
+                self._observe((time.perf_counter() - start) / max(1, tokens))
+            async with self._condition:
+                self.in_flight -= 1
+                self._condition.notify_all()
+
+# clients and limiters are per event loop: LightRAG and Streamlit may drive calls from different loops
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, httpx.AsyncClient]]" = weakref.WeakKeyDictionary()
+_limiters: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, AdaptiveLimiter]]" = weakref.WeakKeyDictionary()
+
+def _get_client(host: str) -> httpx.AsyncClient:
+    """Return the pooled keep-alive client of an Ollama host."""
+    clients = _clients.setdefault(asyncio.get_running_loop(), {})
+    if host not in clients or clients[host].is_closed:
+        limit = OLLAMA_LLM_CONCURRENCY + OLLAMA_EMBED_CONCURRENCY
+        clients[host] = httpx.AsyncClient(
+            base_url=host,
+            limits=httpx.Limits(max_connections=limit, max_keepalive_connections=limit, keepalive_expiry=300),
+            timeout=httpx.Timeout(OLLAMA_TIMEOUT, connect=10),
+        )
+    return clients[host]
+
+def get_limiter(role: str) -> AdaptiveLimiter:
+    """Return the adaptive limiter of `role` ("llm" or "embed") for the running loop."""
+    limiters = _limiters.setdefault(asyncio.get_running_loop(), {})
+    if role not in limiters:
+        limiters[role] = AdaptiveLimiter(role, OLLAMA_LLM_CONCURRENCY if role == "llm" else OLLAMA_EMBED_CONCURRENCY)
+    return limiters[role]
+
+async def _post(host: str, path: str, payload: dict, role: str, tokens: int) -> dict:
+    limiter = get_limiter(role)
+    for attempt in range(OLLAMA_MAX_RETRIES + 1):
+        try:
+            async with limiter.acquire(tokens):
+                response = await _get_client(host).post(path, json=payload)
+                response.raise_for_status()
+            return response.json()
+        except (httpx.HTTPStatusError, httpx.TransportError) as e:
+            retryable = isinstance(e, httpx.TransportError) or e.response.status_code in RETRYABLE_STATUS_CODES
+            if not retryable or attempt == OLLAMA_MAX_RETRIES:
+                raise
+            limiter.backoff()
+            delay = min(2 ** attempt, 60) * (0.5 + random.random() / 2)
+            print(f"Ollama {path} failed ({e!r}), retrying in {delay:.1f}s...")
+            await asyncio.sleep(delay)
+
+def embedding_batches(texts: List[str], max_tokens: int = OLLAMA_EMBED_BATCH_TOKENS,
+                      max_size: int = OLLAMA_EMBED_BATCH_SIZE) -> List[List[int]]:
+    """Group text indexes into batches of at most `max_tokens` estimated tokens and `max_size` texts."""
+    batches: List[List[int]] = []
+    tokens = 0
+    for index, text in enumerate(texts):
+        size = estimate_tokens(text)
+        if not batches or len(batches[-1]) >= max_size or (tokens + size > max_tokens and batches[-1]):
+            batches.append([])
+            tokens = 0
+        batches[-1].append(index)
+        tokens += size
+    return batches
+
+async def ollama_embedding_func(texts: List[str], model: str = OLLAMA_EMBED_MODEL,
+                                host: str = OLLAMA_EMBED_HOST) -> np.ndarray:
+    """Embed texts with Ollama's /api/embed in token-bounded batches sent concurrently.
+
+    Args:
+        texts: The texts to embed.
+        model: The embedding model.
+        host: The Ollama server.
+
+    Returns:
+        The embeddings, one row per text.
+    """
+    async def embed(batch: List[int]) -> List[List[float]]:
+        payload = {"model": model, "input": [texts[i] for i in batch], "truncate": True, "keep_alive": OLLAMA_KEEP_ALIVE}
+        tokens = sum(estimate_tokens(texts[i]) for i in batch)
+        return (await _post(host, "/api/embed", payload, "embed", tokens))["embeddings"]
+
+    batches = embedding_batches(texts)
+    metrics.inc("ollama_embed_batches_total", len(batches))
+    results = await asyncio.gather(*(embed(batch) for batch in batches))
+    vectors: List[Optional[List[float]]] = [None] * len(texts)
+    for batch, embeddings in zip(batches, results):
+        for index, embedding in zip(batch, embeddings):
+            vectors[index] = embedding
+    return np.array(vectors, dtype=np.float32)
+
+async def ollama_model_func(
+    prompt, system_prompt=None, history_messages=[], keyword_extraction=False, **kwargs
+) -> str:
+    """LightRAG completion function for Ollama's /api/chat (non-streaming)."""
+    messages = []
+    if system_prompt:
+        messages.append({"role": "system", "content": system_prompt})
+    messages.extend(history_messages or [])
+    messages.append({"role": "user", "content": prompt})
+
+    payload = {
+        "model": os.getenv("LLM_MODEL", "qwen2.5-coder:7b"),
+        "messages": messages,
+        "stream": False,
+        "keep_alive": OLLAMA_KEEP_ALIVE,
+        "options": {"num_ctx": OLLAMA_NUM_CTX},
+    }
+    if keyword_extraction or kwargs.get("response_format"):
+        payload["format"] = "json"
+
+    tokens = sum(estimate_tokens(m["content"]) for m in messages)
+    response = await _post(OLLAMA_LLM_HOST, "/api/chat", payload, "llm", tokens)
+    return response["message"]["content"]
@@ -0,0 +1,138 @@
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+import numpy as np
+
+from service.build.manifest import build_version, newer_build
+
+QUERY_CACHE_ENABLED = os.getenv("QUERY_CACHE", "1") != "0"
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "256"))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "3600"))
+# cosine similarity above which a cached context is reused; >= 1 disables the semantic layer
+QUERY_CACHE_THRESHOLD = float(os.getenv("QUERY_CACHE_THRESHOLD", "0.95"))
+
+def normalize_query(query: str) -> str:
+    """Normalize a query for exact-match lookups."""
+    query = re.sub(r"\s+", " ", query.strip().lower())
+    return query.rstrip("?!. ")
+
+@dataclass
+class _Entry:
+    context: str
+    embedding: Optional[np.ndarray]
+    created_at: float
+
+class QueryCache:
+    """Two-layer cache of retrieved contexts in front of `LightRAG.aquery`.
+
+    The exact layer is keyed on the normalized query. The semantic layer
+    reuses a cached context when the query embedding is within a cosine
+    similarity threshold of a cached query. Entries are evicted LRU and by
+    TTL, and the whole cache is dropped when the index on disk changes.
+    """
+    def __init__(self,
+                 embedding_func: Optional[Callable[[list[str]], Awaitable[np.ndarray]]] = None,
+                 max_entries: int = QUERY_CACHE_SIZE,
+                 ttl_seconds: float = QUERY_CACHE_TTL,
+                 similarity_threshold: float = QUERY_CACHE_THRESHOLD,
+                 working_dir: Optional[str] = None):
+        self.embedding_func = embedding_func
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.working_dir = working_dir
+        self.entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0}
+        self._version = self._index_version()
+
+    def _index_version(self) -> Optional[float]:
+        return build_version(self.working_dir) if self.working_dir else None
+
+    def invalidate(self):
+        """Drop every cached context."""
+        self.entries.clear()
+
+    def _check_version(self):
+        if not self.working_dir:
+            return
+        version = newer_build(self.working_dir, self._version)
+        if version is not None:
+            # the index was rebuilt since these contexts were retrieved
+            self.invalidate()
+            self._version = version
+
+    def _evict_expired(self):
+        now = time.monotonic()
+        for key in [key for key, entry in self.entries.items() if now - entry.created_at > self.ttl_seconds]:
+            del self.entries[key]
+
+    async def _embed(self, query: str) -> Optional[np.ndarray]:
+        if self.embedding_func is None or self.similarity_threshold >= 1:
+            return None
+        embedding = np.asarray((await self.embedding_func([query]))[0], dtype=np.float32)
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm else embedding
+
+    def _semantic_lookup(self, embedding: np.ndarray) -> Optional[str]:
+        keys = [key for key, entry in self.entries.items() if entry.embedding is not None]
+        if not keys:
+            return None
+        similarities = np.stack([self.entries[key].embedding for key in keys]) @ embedding
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.similarity_threshold:
+            return None
+        self.entries.move_to_end(keys[best])
+        return self.entries[keys[best]].context
+
+    async def get_or_compute(self, query: str, compute: Callable[[], Awaitable[str]]) -> str:
+        """Return the cached context for a query, computing and caching it on a miss.
+
+        Args:
+            query: The search query.
+            compute: Coroutine factory that retrieves the context on a miss.
+
+        Returns:
+            The retrieved context.
+        """
+        self._check_version()
+        self._evict_expired()
+
+        key = normalize_query(query)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.stats["exact_hits"] += 1
+            return self.entries[key].context
+
+        embedding = await self._embed(query)
+        if embedding is not None:
+            context = self._semantic_lookup(embedding)
+            if context is not None:
+                self.stats["semantic_hits"] += 1
+                return context
+
+        self.stats["misses"] += 1
+        context = await compute()
+        self.entries[key] = _Entry(context=context, embedding=embedding, created_at=time.monotonic())
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return context
+
+_default_cache: Optional[QueryCache] = None
+
+def get_query_cache(embedding_func, working_dir: str) -> Optional[QueryCache]:
+    """Return the process-wide query cache (None when disabled).
+
+    Args:
+        embedding_func: The LightRAG embedding function used for the semantic layer.
+        working_dir: The LightRAG working dir; its build marker signals index rebuilds.
+    """
+    global _default_cache
+    if not QUERY_CACHE_ENABLED:
+        return None
+    if _default_cache is None:
+        _default_cache = QueryCache(embedding_func, working_dir=working_dir)
+    return _default_cache
@@ -0,0 +1,38 @@
+import os
+
+import httpx
+
+QUERY_SERVER_TIMEOUT = float(os.getenv("QUERY_SERVER_TIMEOUT", "300"))
+
+class QueryServerClient:
+    """Thin client for the resident query server (see server.py).
+
+    Args:
+        url: `http://host:port` or `unix:///path/to/socket`.
+    """
+    def __init__(self, url: str):
+        self.url = url
+
+    def _client(self) -> httpx.AsyncClient:
+        # a client per call: Streamlit runs every rerun on a fresh event loop
+        if self.url.startswith("unix://"):
+            return httpx.AsyncClient(
+                base_url="http://localhost",
+                transport=httpx.AsyncHTTPTransport(uds=self.url[len("unix://"):]),
+                timeout=QUERY_SERVER_TIMEOUT,
+            )
+        return httpx.AsyncClient(base_url=self.url, timeout=QUERY_SERVER_TIMEOUT)
+
+    async def _post(self, path: str, payload: dict) -> dict:
+        async with self._client() as client:
+            response = await client.post(path, json=payload)
+            response.raise_for_status()
+            return response.json()
+
+    async def retrieve(self, search_query: str) -> str:
+        """Retrieve the raw LightRAG context for a search query."""
+        return (await self._post("/retrieve", {"query": search_query}))["context"]
+
+    async def query(self, question: str) -> str:
+        """Answer a question with the server-side agent."""
+        return (await self._post("/query", {"question": question}))["answer"]
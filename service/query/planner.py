@@ -0,0 +1,225 @@
+import os
+import re
+import time
+import asyncio
+import dataclasses
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+from lightrag import QueryParam
+from lightrag.prompt import PROMPTS
+
+from service.telemetry.metrics import metrics
+
+QUERY_PLANNER_ENABLED = os.getenv("QUERY_PLANNER", "1") != "0"
+# target retrieval latency; 0 disables budget-driven downgrades
+QUERY_LATENCY_BUDGET_MS = float(os.getenv("QUERY_LATENCY_BUDGET_MS", "0"))
+# run the cheap mode alongside mix and keep the first good-enough answer
+QUERY_RACE = os.getenv("QUERY_RACE", "0") == "1"
+# a raced cheap answer shorter than this is not good enough
+QUERY_RACE_MIN_CHARS = int(os.getenv("QUERY_RACE_MIN_CHARS", "200"))
+
+# cheapest to most expensive
+MODES = ["naive", "local", "global", "hybrid", "mix"]
+# fields of QueryParam scaled down when a mode is predicted to exceed the budget
+TUNABLE_FIELDS = ["top_k", "chunk_top_k", "max_entity_tokens", "max_relation_tokens", "max_total_tokens"]
+# weight of the embedding similarity relative to the keyword heuristics
+EMBEDDING_WEIGHT = 2.0
+# EWMA smoothing of observed per-mode latencies
+LATENCY_ALPHA = 0.2
+
+# heuristic signals per mode: (pattern, weight)
+SIGNALS: Dict[str, List[tuple]] = {
+    "naive": [
+        (r"`[^`]+`", 1.0),                                    # inline code
+        (r"\b[\w-]+\.(md|py|go|ts|js|ya?ml|json|toml)\b", 1.0),  # file names
+        (r"\b[A-Z][A-Z0-9]*_[A-Z0-9_]+\b", 1.0),              # ENV_VARS
+        (r"\b[a-z]+_[a-z_]+\b", 0.5),                         # snake_case identifiers
+        (r"^(what is the|where is|which (file|command|port|flag|version)|how (do|can) i (install|run|start|configure))\b", 1.0),
+        (r"\b(command|flag|option|port|default|version|install|env(ironment)? variable)\b", 0.5),
+    ],
+    "local": [
+        (r"^(who|which (component|service|module|team))\b", 1.0),
+        (r"\b(depend(s|encies)? on|calls|uses|owned by|responsible for)\b", 1.0),
+    ],
+    "global": [
+        (r"\b(overview|summari[sz]e|summary|high[- ]level|themes?|overall|in general|big picture)\b", 1.5),
+        (r"\b(architecture|design)\b", 1.0),
+    ],
+    "hybrid": [
+        (r"\b(compare|comparison|difference|differ|versus|vs\.?|relationship|interact)\b", 1.5),
+        (r"\bhow does .+ work\b", 1.0),
+        (r"\bwhy\b", 0.5),
+    ],
+    "mix": [],
+}
+
+# example queries per mode; their embedding centroids give the semantic signal
+PROTOTYPES: Dict[str, List[str]] = {
+    "naive": ["What is the default port?", "Which command installs the CLI?", "Where is the config file?",
+              "What does the FOO_BAR environment variable do?"],
+    "local": ["Which service calls the billing API?", "Who owns the ingestion component?",
+              "What does the video backend depend on?"],
+    "global": ["Give me an overview of the system.", "Summarize the main themes of the documentation.",
+               "Describe the overall architecture."],
+    "hybrid": ["Compare the streaming and batch pipelines.", "How does authentication work across services?",
+               "What is the relationship between the gateway and the workers?"],
+    "mix": ["Explain how a request flows through the platform and which components are involved.",
+            "What should I know before changing the storage layer?"],
+}
+
+@dataclasses.dataclass
+class Plan:
+    """A planned retrieval: the mode and the QueryParam to run it with."""
+    mode: str
+    param: QueryParam
+    scores: Dict[str, float]
+
+def _score_heuristics(query: str) -> Dict[str, float]:
+    text = query.strip().lower() if query else ""
+    scores = {mode: 0.0 for mode in MODES}
+    for mode, signals in SIGNALS.items():
+        for pattern, weight in signals:
+            # identifier patterns are case sensitive, the rest match the lowered text
+            target = query if pattern.startswith(r"\b[A-Z]") else text
+            if re.search(pattern, target):
+                scores[mode] += weight
+    words = len(text.split())
+    if words <= 6:
+        scores["naive"] += 0.5
+    elif words >= 20:
+        scores["mix"] += 0.5
+    return scores
+
+def is_good_enough(answer: Optional[str], min_chars: int = QUERY_RACE_MIN_CHARS) -> bool:
+    """Return True if a retrieval answer is usable (not LightRAG's canned failure, not too short)."""
+    return bool(answer) and answer != PROMPTS["fail_response"] and len(answer) >= min_chars
+
+class QueryPlanner:
+    """Picks a LightRAG retrieval mode and parameters per query, without an LLM call.
+
+    Each query is scored with keyword heuristics and, when an embedding
+    function is available, by similarity to example queries of every mode.
+    With a latency budget the planned mode is downgraded to a cheaper one and
+    `top_k`/context token limits are scaled down until the observed latency of
+    that mode fits. Optionally races the cheap mode against `mix`.
+    """
+    def __init__(self,
+                 embedding_func: Optional[Callable[[list[str]], Awaitable[np.ndarray]]] = None,
+                 latency_budget_ms: float = QUERY_LATENCY_BUDGET_MS,
+                 race: bool = QUERY_RACE):
+        self.embedding_func = embedding_func
+        self.latency_budget_ms = latency_budget_ms
+        self.race = race
+        self.centroids: Optional[Dict[str, np.ndarray]] = None
+        self.latency_ms: Dict[str, float] = {}
+        self.stats: Dict[str, Dict[str, float]] = defaultdict(lambda: {"count": 0, "total_ms": 0.0, "race_wins": 0})
+
+    async def _embedding_scores(self, query: str) -> Dict[str, float]:
+        if self.embedding_func is None:
+            return {}
+        if self.centroids is None:
+            texts = [text for mode in MODES for text in PROTOTYPES[mode]]
+            vectors = _normalize(np.asarray(await self.embedding_func(texts), dtype=np.float32))
+            self.centroids, offset = {}, 0
+            for mode in MODES:
+                count = len(PROTOTYPES[mode])
+                self.centroids[mode] = _normalize(vectors[offset:offset + count].mean(axis=0))
+                offset += count
+
+        embedding = _normalize(np.asarray((await self.embedding_func([query]))[0], dtype=np.float32))
+        return {mode: float(embedding @ centroid) for mode, centroid in self.centroids.items()}
+
+    def _fit_budget(self, mode: str) -> tuple:
+        # downgrade while the observed latency of the mode exceeds the budget
+        scale = 1.0
+        if not self.latency_budget_ms:
+            return mode, scale
+        while mode != MODES[0] and self.latency_ms.get(mode, 0) > self.latency_budget_ms:
+            # decay the skipped mode's estimate so it is retried once the index gets faster
+            self.latency_ms[mode] *= 1 - LATENCY_ALPHA
+            mode = MODES[MODES.index(mode) - 1]
+        observed = self.latency_ms.get(mode)
+        if observed and observed > self.latency_budget_ms:
+            scale = max(0.25, self.latency_budget_ms / observed)
+        return mode, scale
+
+    async def plan(self, query: str) -> Plan:
+        """Choose the retrieval mode and QueryParam for `query`."""
+        scores = _score_heuristics(query)
+        for mode, similarity in (await self._embedding_scores(query)).items():
+            scores[mode] += EMBEDDING_WEIGHT * similarity
+        # ties go to the more thorough mode
+        mode = max(reversed(MODES), key=lambda m: scores[m])
+        mode, scale = self._fit_budget(mode)
+
+        param = QueryParam(mode=mode)
+        for field in TUNABLE_FIELDS:
+            if scale < 1 and hasattr(param, field):
+                setattr(param, field, max(1, int(getattr(param, field) * scale)))
+        return Plan(mode=mode, param=param, scores=scores)
+
+    def _record(self, mode: str, elapsed_ms: float):
+        previous = self.latency_ms.get(mode)
+        self.latency_ms[mode] = elapsed_ms if previous is None else (1 - LATENCY_ALPHA) * previous + LATENCY_ALPHA * elapsed_ms
+        self.stats[mode]["count"] += 1
+        self.stats[mode]["total_ms"] += elapsed_ms
+        metrics.inc("planner_queries_total", mode=mode)
+
+    async def _run(self, rag, query: str, param: QueryParam) -> str:
+        start = time.perf_counter()
+        with metrics.span("aquery", mode=param.mode):
+            answer = await rag.aquery(query, param=param)
+        self._record(param.mode, (time.perf_counter() - start) * 1000)
+        return answer
+
+    async def aquery(self, rag, query: str) -> str:
+        """Plan and run `query` against `rag` (a LightRAG or ShardedRAG)."""
+        plan = await self.plan(query)
+        if not self.race:
+            return await self._run(rag, query, plan.param)
+
+        # race the planned (or, when mix was planned, the cheapest) mode against mix;
+        # the cheap answer wins only if it arrives first and is good enough
+        cheap_param = plan.param if plan.mode != MODES[-1] else QueryParam(mode=MODES[0])
+        cheap = asyncio.create_task(self._run(rag, query, cheap_param))
+        thorough = asyncio.create_task(self._run(rag, query, QueryParam(mode=MODES[-1])))
+        try:
+            done, _ = await asyncio.wait([cheap, thorough], return_when=asyncio.FIRST_COMPLETED)
+            if cheap in done and not cheap.exception() and is_good_enough(cheap.result()):
+                self.stats[cheap_param.mode]["race_wins"] += 1
+                metrics.inc("planner_race_wins_total", mode=cheap_param.mode)
+                return cheap.result()
+            try:
+                return await thorough
+            except Exception:
+                # mix failed: any cheap answer beats none, only raise when both failed
+                await asyncio.wait([cheap])
+                if cheap.cancelled() or cheap.exception():
+                    raise
+                metrics.inc("planner_race_fallbacks_total", mode=cheap_param.mode)
+                return cheap.result()
+        finally:
+            for task in (cheap, thorough):
+                task.cancel()
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Per-mode query counts, mean latency and race wins."""
+        return {mode: {"count": s["count"], "mean_ms": s["total_ms"] / s["count"] if s["count"] else 0.0,
+                       "race_wins": s["race_wins"]} for mode, s in self.stats.items()}
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+_query_planner: Optional[QueryPlanner] = None
+
+def get_query_planner(embedding_func=None) -> Optional[QueryPlanner]:
+    """Return the process-wide query planner, or None when QUERY_PLANNER=0."""
+    global _query_planner
+    if not QUERY_PLANNER_ENABLED:
+        return None
+    if _query_planner is None:
+        _query_planner = QueryPlanner(embedding_func)
+    return _query_planner
@@ -0,0 +1,173 @@
+import os
+import re
+import json
+import asyncio
+import hashlib
+import dataclasses
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from lightrag import LightRAG, QueryParam
+from lightrag.prompt import PROMPTS
+
+from service.telemetry.metrics import estimate_tokens, metrics
+
+SHARDS_FILE = "shards.json"
+# total token budget of the merged context returned to the agent
+SHARD_CONTEXT_TOKENS = int(os.getenv("SHARD_CONTEXT_TOKENS", "12000"))
+# query only the N shards whose profile is closest to the query; 0 queries every shard
+SHARD_ROUTE_TOP_K = int(os.getenv("SHARD_ROUTE_TOP_K", "0"))
+PROFILE_CHARS = 4000
+
+def shard_name(repo_url: str) -> str:
+    """Return the LightRAG workspace name of the shard holding `repo_url`."""
+    name = re.sub(r"[^A-Za-z0-9_]+", "_", repo_url.rstrip("/").removesuffix(".git").split("/")[-1])
+    return f"{name}_{hashlib.md5(repo_url.encode('utf-8')).hexdigest()[:8]}"
+
+def shard_profile(repo_urls: List[str], paths: List[str]) -> str:
+    """Short text describing a shard (its sources and file paths), embedded for routing."""
+    return "\n".join(repo_urls + paths)[:PROFILE_CHARS]
+
+class ShardRegistry:
+    """The shards of a sharded index: `WORKING_DIR/shards.json`.
+
+    Each shard is a LightRAG workspace under the working dir, built from
+    one repo. The registry keeps the repo URLs of each shard and an
+    embedding of its profile used to route queries.
+    """
+    def __init__(self, working_dir: str):
+        self.path = os.path.join(working_dir, SHARDS_FILE)
+        self.shards: Dict[str, Dict] = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.shards = json.load(f).get("shards", {})
+
+    def record(self, shard: str, repo_urls: List[str], embedding: Optional[List[float]] = None):
+        self.shards[shard] = {"repo_urls": repo_urls, "embedding": embedding}
+
+    def remove(self, shard: str):
+        self.shards.pop(shard, None)
+
+    def save(self):
+        """Atomically write the registry to disk."""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"shards": self.shards}, f)
+        os.replace(tmp_path, self.path)
+
+def merge_contexts(contexts: List[Tuple[str, str]], token_budget: int) -> str:
+    """Merge per-shard contexts, sharing `token_budget` fairly between them.
+
+    Shorter contexts are kept whole and their unused share goes to the
+    longer ones; contexts over their share are truncated.
+
+    Args:
+        contexts: (label, context) pairs in priority order.
+        token_budget: Total token budget of the merged context.
+
+    Returns:
+        The merged context.
+    """
+    contexts = [(label, context) for label, context in contexts if context and context.strip()]
+    shares: Dict[str, int] = {}
+    remaining = token_budget
+    by_size = sorted(contexts, key=lambda item: estimate_tokens(item[1]))
+    for index, (label, context) in enumerate(by_size):
+        share = min(estimate_tokens(context), remaining // (len(by_size) - index))
+        shares[label] = share
+        remaining -= share
+
+    parts = []
+    for label, context in contexts:
+        # ~4 characters per token, matching estimate_tokens
+        parts.append(f"### Source: {label}\n{context[:shares[label] * 4]}")
+    return "\n\n".join(parts)
+
+class ShardedRAG:
+    """Fans a query out to per-repo LightRAG shards and merges their contexts.
+
+    Exposes the parts of the LightRAG interface the agent, app and query
+    server use (`aquery`, `embedding_func`, `initialize_storages`,
+    `finalize_storages`), so it can stand in for a single instance.
+    """
+    def __init__(self, rags: Dict[str, LightRAG], registry: ShardRegistry,
+                 token_budget: int = SHARD_CONTEXT_TOKENS, route_top_k: int = SHARD_ROUTE_TOP_K):
+        self.rags = rags
+        self.registry = registry
+        self.token_budget = token_budget
+        self.route_top_k = route_top_k
+        self.embedding_func = next(iter(rags.values())).embedding_func
+
+    async def initialize_storages(self):
+        for rag in self.rags.values():
+            await rag.initialize_storages()
+
+    async def finalize_storages(self):
+        for rag in self.rags.values():
+            await rag.finalize_storages()
+
+    async def route(self, query: str) -> List[str]:
+        """Return the shards to query, most relevant first."""
+        shards = list(self.rags)
+        embeddings = {shard: self.registry.shards.get(shard, {}).get("embedding") for shard in shards}
+        if not self.route_top_k or self.route_top_k >= len(shards) or not all(embeddings.values()):
+            return shards
+
+        query_embedding = np.asarray((await self.embedding_func([query]))[0], dtype=np.float32)
+        matrix = np.asarray([embeddings[shard] for shard in shards], dtype=np.float32)
+        scores = matrix @ query_embedding / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query_embedding) + 1e-9)
+        ranked = [shards[i] for i in np.argsort(-scores)]
+        metrics.inc("shard_routing_skipped_total", len(shards) - self.route_top_k)
+        return ranked[:self.route_top_k]
+
+    async def aquery(self, query: str, param: Optional[QueryParam] = None) -> str:
+        """Query the routed shards concurrently and merge their contexts under the token budget.
+
+        Like `LightRAG.aquery`, returns the merged context when
+        `param.only_need_context` is set and otherwise one answer generated
+        over it (by the most relevant shard's LLM).
+        """
+        param = param or QueryParam(mode="mix")
+        shards = await self.route(query)
+
+        async def query_shard(shard: str) -> str:
+            shard_param = dataclasses.replace(param, only_need_context=True)
+            with metrics.span("shard_query", mode=param.mode):
+                try:
+                    context = await self.rags[shard].aquery(query, param=shard_param) or ""
+                except Exception as e:
+                    print(f"Shard {shard} failed to answer: {e}")
+                    return ""
+            # shards without matches return LightRAG's canned failure answer
+            return "" if context == PROMPTS["fail_response"] else context
+
+        contexts = await asyncio.gather(*(query_shard(shard) for shard in shards))
+        if not any(contexts):
+            return PROMPTS["fail_response"]
+        labels = [", ".join(self.registry.shards.get(shard, {}).get("repo_urls") or [shard]) for shard in shards]
+        context = merge_contexts(list(zip(labels, contexts)), self.token_budget)
+        if param.only_need_context:
+            return context
+
+        # bypass mode sends the prompt straight to the shard's query LLM, with LightRAG's answer prompt
+        system_prompt = PROMPTS["rag_response"].format(
+            response_type=param.response_type or "Multiple Paragraphs",
+            user_prompt=f"\n\n{param.user_prompt}" if param.user_prompt else "n/a",
+            context_data=context,
+        )
+        with metrics.span("shard_answer", mode=param.mode):
+            return await self.rags[shards[0]].aquery(query, param=dataclasses.replace(param, mode="bypass"),
+                                                     system_prompt=system_prompt)
+
+async def load_sharded_rag(llm_type: str, working_dir: str) -> Optional[ShardedRAG]:
+    """Load every shard listed in the registry, or return None if the index is not sharded."""
+    # imported here: common imports this package for the query cache
+    from common import get_lightrag_instance
+
+    registry = ShardRegistry(working_dir)
+    if not registry.shards:
+        return None
+
+    sharded = ShardedRAG({shard: get_lightrag_instance(llm_type, workspace=shard) for shard in registry.shards}, registry)
+    await sharded.initialize_storages()
+    return sharded
@@ -0,0 +1,67 @@
+import asyncio
+
+from lightrag import QueryParam
+from lightrag.prompt import PROMPTS
+
+from service.query.shards import ShardedRAG, ShardRegistry, merge_contexts
+from service.telemetry.metrics import estimate_tokens
+
+def test_merge_contexts_keeps_short_contexts_whole():
+    merged = merge_contexts([("a", "x" * 40), ("b", "y" * 400)], token_budget=100)
+
+    assert merged.startswith("### Source: a\n" + "x" * 40 + "\n\n### Source: b\n")
+    # what `a` leaves of its half goes to `b` (~4 characters per token)
+    assert merged.count("y") == (100 - estimate_tokens("x" * 40)) * 4
+
+def test_merge_contexts_shares_budget_fairly():
+    merged = merge_contexts([("a", "x" * 4000), ("b", "y" * 4000)], token_budget=100)
+
+    assert merged.count("x") == merged.count("y") == 50 * 4
+
+def test_merge_contexts_skips_empty_contexts():
+    assert merge_contexts([("a", ""), ("b", "  \n"), ("c", "text")], token_budget=100) == "### Source: c\ntext"
+    assert merge_contexts([], token_budget=100) == ""
+
+class StubShard:
+    """Answers with a fixed context, or echoes the answer prompt in bypass mode."""
+    embedding_func = None
+
+    def __init__(self, context: str):
+        self.context = context
+        self.params = []
+
+    async def aquery(self, query, param, system_prompt=None):
+        self.params.append(param)
+        return system_prompt if param.mode == "bypass" else self.context
+
+def sharded(contexts):
+    rags = {shard: StubShard(context) for shard, context in contexts.items()}
+    registry = ShardRegistry("/nonexistent")
+    for shard in rags:
+        registry.record(shard, [f"https://github.com/org/{shard}"])
+    return ShardedRAG(rags, registry, token_budget=1000, route_top_k=0), rags
+
+def test_sharded_aquery_returns_context_when_asked():
+    rag, rags = sharded({"one": "context one", "two": PROMPTS["fail_response"]})
+
+    context = asyncio.run(rag.aquery("question", QueryParam(mode="local", only_need_context=True)))
+
+    assert context == "### Source: https://github.com/org/one\ncontext one"
+    assert [param.mode for param in rags["one"].params] == ["local"]
+    assert rags["one"].params[0].only_need_context
+
+def test_sharded_aquery_answers_over_merged_context():
+    rag, rags = sharded({"one": "context one", "two": "context two"})
+
+    answer = asyncio.run(rag.aquery("question", QueryParam(mode="mix")))
+
+    # one completion over both contexts, by the first routed shard
+    assert "context one" in answer and "context two" in answer
+    assert [param.mode for param in rags["one"].params] == ["mix", "bypass"]
+    assert [param.mode for param in rags["two"].params] == ["mix"]
+
+def test_sharded_aquery_without_matches_fails_like_lightrag():
+    rag, rags = sharded({"one": PROMPTS["fail_response"]})
+
+    assert asyncio.run(rag.aquery("question")) == PROMPTS["fail_response"]
+    assert len(rags["one"].params) == 1
@@ -0,0 +1,57 @@
+import os
+import asyncio
+import weakref
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+REPO_MAX_IN_FLIGHT = int(os.getenv("REPO_MAX_IN_FLIGHT", "32"))
+REPO_MAX_PER_HOST = int(os.getenv("REPO_MAX_PER_HOST", "8"))
+REPO_HOST_LIMITS = os.getenv("REPO_HOST_LIMITS", "")
+
+def parse_host_limits(value: str) -> Dict[str, int]:
+    """Parse `host=limit,host=limit` into a dict."""
+    limits = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        host, _, limit = item.partition('=')
+        limits[host.strip()] = int(limit)
+    return limits
+
+class RequestBudget:
+    """Global concurrency budget shared by every repo service request.
+
+    Caps the total number of in-flight requests across all repos as well as
+    the number of in-flight requests per host (e.g. api.github.com or the
+    GitLab host), so many repos can be listed and fetched concurrently
+    without one host being flooded.
+    """
+    def __init__(self, max_in_flight: int, max_per_host: int, host_limits: Optional[Dict[str, int]] = None):
+        self.max_per_host = max_per_host
+        self.host_limits = host_limits or {}
+        self._global = asyncio.Semaphore(max_in_flight)
+        self._hosts: Dict[str, asyncio.Semaphore] = {}
+
+    def _host_semaphore(self, host: str) -> asyncio.Semaphore:
+        if host not in self._hosts:
+            self._hosts[host] = asyncio.Semaphore(self.host_limits.get(host, self.max_per_host))
+        return self._hosts[host]
+
+    @asynccontextmanager
+    async def acquire(self, url: str):
+        """Hold one global slot and one slot for the URL's host."""
+        async with self._host_semaphore(urlparse(url).hostname or ""):
+            async with self._global:
+                yield
+
+_budgets: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, RequestBudget]" = weakref.WeakKeyDictionary()
+
+def get_request_budget() -> RequestBudget:
+    """Return the request budget of the running loop (semaphores are bound to the loop that uses them)."""
+    loop = asyncio.get_running_loop()
+    if loop not in _budgets:
+        _budgets[loop] = RequestBudget(
+            max_in_flight=REPO_MAX_IN_FLIGHT,
+            max_per_host=REPO_MAX_PER_HOST,
+            host_limits=parse_host_limits(REPO_HOST_LIMITS),
+        )
+    return _budgets[loop]
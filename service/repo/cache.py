@@ -0,0 +1,159 @@
+import os
+import json
+import hashlib
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+from . import http
+from service.telemetry.metrics import metrics
+
+HTTP_CACHE_MAX_MB = float(os.getenv("HTTP_CACHE_MAX_MB", "1024"))
+
+# headers that describe the transfer rather than the cached body
+_DROPPED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection'}
+# evict down to this fraction of the cap so eviction does not run on every store
+EVICT_TARGET = 0.9
+
+class HttpCache:
+    """Persistent on-disk HTTP cache keyed by request URL, params and credentials.
+
+    Each entry is a small JSON metadata file (status, headers, validators)
+    plus the raw body. Entries live outside the LightRAG working dir so they
+    survive full rebuilds. The metadata file's mtime records the last use,
+    and entries are evicted least recently used once the cache exceeds
+    `max_bytes`.
+    """
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        # measured on the first store; other processes' writes are caught by the next sweep
+        self.size: Optional[int] = None
+
+    def key(self, url: str, params: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None) -> str:
+        # credentials are part of the key so responses never leak across tokens
+        auth = (headers or {}).get('Authorization', '')
+        raw = json.dumps([url, sorted((params or {}).items()), hashlib.sha256(auth.encode()).hexdigest()], default=str)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        base = os.path.join(self.cache_dir, key[:2], key)
+        return f"{base}.json", f"{base}.body"
+
+    def load(self, key: str) -> Optional[Tuple[Dict[str, Any], bytes]]:
+        meta_path, body_path = self._paths(key)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                body = f.read()
+            os.utime(meta_path)
+            return meta, body
+        except (OSError, ValueError):
+            return None
+
+    def _entries(self):
+        """Yield (last used, size, meta path, body path) of every cached entry."""
+        for dirpath, _, filenames in os.walk(self.cache_dir):
+            for name in filenames:
+                if not name.endswith(".json"):
+                    continue
+                meta_path = os.path.join(dirpath, name)
+                body_path = meta_path[:-len(".json")] + ".body"
+                try:
+                    stat = os.stat(meta_path)
+                    size = stat.st_size + (os.path.getsize(body_path) if os.path.exists(body_path) else 0)
+                except OSError:
+                    continue
+                yield stat.st_mtime, size, meta_path, body_path
+
+    def sweep(self):
+        """Evict least recently used entries until the cache is under `max_bytes`."""
+        entries = sorted(self._entries())
+        self.size = sum(size for _, size, _, _ in entries)
+        if self.size <= self.max_bytes:
+            return
+        target = self.max_bytes * EVICT_TARGET
+        evicted = 0
+        for _, size, meta_path, body_path in entries:
+            if self.size <= target:
+                break
+            for path in (meta_path, body_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self.size -= size
+            evicted += 1
+        metrics.inc("http_cache_evictions_total", evicted)
+
+    def store(self, key: str, response: httpx.Response):
+        meta_path, body_path = self._paths(key)
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        meta = {
+            "url": str(response.request.url),
+            "status_code": response.status_code,
+            "headers": {k: v for k, v in response.headers.items() if k.lower() not in _DROPPED_HEADERS},
+        }
+        # write the body first so a metadata file never points at a missing body
+        with open(f"{body_path}.tmp", "wb") as f:
+            f.write(response.content)
+        os.replace(f"{body_path}.tmp", body_path)
+        with open(f"{meta_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(f"{meta_path}.tmp", meta_path)
+
+        if self.size is None:
+            self.sweep()
+        else:
+            self.size += len(response.content) + os.path.getsize(meta_path)
+            if self.size > self.max_bytes:
+                self.sweep()
+
+http_cache: Optional[HttpCache] = (
+    HttpCache(os.getenv("HTTP_CACHE_DIR", "./.http-cache"), int(HTTP_CACHE_MAX_MB * 1024 * 1024))
+    if os.getenv("HTTP_CACHE", "1") != "0" else None
+)
+
+def _cached_response(meta: Dict[str, Any], body: bytes, request: httpx.Request) -> httpx.Response:
+    return httpx.Response(meta["status_code"], headers=meta["headers"], content=body, request=request)
+
+async def cached_get(url: str, headers: Optional[Dict[str, str]] = None,
+                     params: Optional[Dict[str, Any]] = None, immutable: bool = False) -> httpx.Response:
+    """Issue a GET request through the on-disk HTTP cache.
+
+    Cached entries are revalidated with If-None-Match / If-Modified-Since and a
+    304 is answered from disk. Only 200 responses are cached.
+
+    Args:
+        url: The request URL.
+        headers: Request headers.
+        params: Query parameters.
+        immutable: The URL is content-addressed (e.g. by blob SHA), so a cached
+            entry is served without revalidation.
+
+    Returns:
+        The (possibly cached) response.
+    """
+    if http_cache is None:
+        return await http.get(url, headers=headers, params=params)
+
+    key = http_cache.key(url, params, headers)
+    cached = http_cache.load(key)
+    request_headers = dict(headers or {})
+    if cached:
+        meta, body = cached
+        if immutable:
+            return _cached_response(meta, body, httpx.Request("GET", url, headers=headers, params=params))
+        validators = {k.lower(): v for k, v in meta["headers"].items()}
+        if 'etag' in validators:
+            request_headers['If-None-Match'] = validators['etag']
+        if 'last-modified' in validators:
+            request_headers['If-Modified-Since'] = validators['last-modified']
+
+    response = await http.get(url, headers=request_headers, params=params)
+    if response.status_code == 304 and cached:
+        return _cached_response(cached[0], cached[1], response.request)
+    if response.status_code == 200:
+        http_cache.store(key, response)
+    return response
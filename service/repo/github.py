@@ -1,62 +1,106 @@
 import re
 import os
-import httpx
+import asyncio
 from typing import List
+from urllib.parse import quote
+
+from .cache import cached_get
+from .model import RepoFile, RepoServiceError
 
 # this is not nice. Maybe I should send the token as an arg
 from dotenv import load_dotenv
 load_dotenv()
 
-http_client = httpx.AsyncClient()
 repo_token = os.getenv('GITHUB_TOKEN')
 repo_slug = os.getenv('GITHUB_SLUG')
+github_api_url = os.getenv('GITHUB_API_URL', 'https://api.github.com')
+github_raw_url = os.getenv('GITHUB_RAW_URL', 'https://raw.githubusercontent.com')
 
 # compliant with RepoService protocol
 class GithubService:
     async def get_repo_md_urls(self, repo_url: str) -> List[str]:
         """
-        Get the directory structure of a GitLab repository. 
+        Get the directory structure of a GitHub repository. 
         and return .md files only
 
         Args:
-            repo_url: The GitLab repository URL.
+            repo_url: The GitHub repository URL.
 
         Returns:
             Directory of files.
         """
-        if not repo_token or not repo_slug:
-            raise ValueError("GITHUB_TOKEN and GITHUB_SLUG environment variables must be set")
+        return [f.url for f in await self.get_repo_md_files(repo_url)]
 
-        match = re.search(r'github\.com[:/]([^/]+)/([^/]+?)(?:\.git)?$', repo_url)
-        if not match:
-            raise ValueError("Invalid GitHub URL format")
-        
-        owner, repo = match.groups()
+    async def get_repo_md_files(self, repo_url: str) -> List[RepoFile]:
+        """
+        Get the .md files of a GitHub repository along with their blob SHAs.
+
+        Args:
+            repo_url: The GitHub repository URL.
+
+        Returns:
+            List of markdown files.
+        """
+        if not repo_token:
+            raise ValueError("GITHUB_TOKEN environment variable must be set")
+
+        owner, repo = _parse_repo_url(repo_url)
         headers = {'Authorization': f'token {repo_token}'}
         
-        response = await http_client.get(
-            f'https://api.github.com/repos/{owner}/{repo}/git/trees/main?recursive=1',
-            headers=headers
+        # HEAD resolves to the default branch, so the tree does not wait on the
+        # repo metadata call that tells us the branch name
+        repo_response, tree_response = await asyncio.gather(
+            cached_get(f'{github_api_url}/repos/{owner}/{repo}', headers=headers),
+            cached_get(f'{github_api_url}/repos/{owner}/{repo}/git/trees/HEAD?recursive=1', headers=headers),
         )
-        
-        if response.status_code != 200:
-            # Try with master branch if main fails
-            response = await http_client.get(
-                f'https://api.github.com/repos/{owner}/{repo}/git/trees/master?recursive=1',
-                headers=headers
-            )
+        for response in (repo_response, tree_response):
             if response.status_code != 200:
-                return f"Failed to get repository structure: {response.text}"
-        
-        data = response.json()
+                raise RepoServiceError(repo_url, f"Failed to get repository structure: {response.text}", response.status_code)
+
+        ref = repo_response.json()['default_branch']
+        slug = repo_slug or f"blob/{ref}"
+        data = tree_response.json()
+        if data.get('truncated'):
+            print(f"Warning: GitHub truncated the tree listing of {repo_url}")
         tree = data['tree']
         
         # Build directory structure
         structure = []
         for item in tree:
-            if not any(excluded in item['path'] for excluded in ['.git/', 'node_modules/', '__pycache__/']):
+            if item.get('type') == 'blob' and not any(excluded in item['path'] for excluded in ['.git/', 'node_modules/', '__pycache__/']):
                 # structure.append(f"{'📁 ' if item['type'] == 'tree' else '📄 '}{item['path']}")
                 if item['path'].endswith('.md'):
-                    structure.append(f"{repo_url}/{repo_slug}/{item['path']}")
+                    structure.append(RepoFile(
+                        repo_url=repo_url,
+                        path=item['path'],
+                        url=f"{repo_url}/{slug}/{item['path']}",
+                        sha=item.get('sha', ''),
+                        ref=ref,
+                    ))
         
         return structure
+
+    async def get_file_content(self, file: RepoFile) -> str:
+        """
+        Download the raw content of a repository file.
+
+        Args:
+            file: A file returned by `get_repo_md_files`.
+
+        Returns:
+            The raw markdown text.
+        """
+        owner, repo = _parse_repo_url(file.repo_url)
+        response = await cached_get(
+            f'{github_raw_url}/{owner}/{repo}/{file.ref or "HEAD"}/{quote(file.path)}',
+            headers={'Authorization': f'token {repo_token}'} if repo_token else {}
+        )
+        if response.status_code != 200:
+            raise RepoServiceError(file.repo_url, f"Failed to fetch {file.path}: {response.status_code}", response.status_code)
+        return response.text
+
+def _parse_repo_url(repo_url: str) -> tuple[str, str]:
+    match = re.search(r'github\.com[:/]([^/]+)/([^/]+?)(?:\.git)?$', repo_url)
+    if not match:
+        raise RepoServiceError(repo_url, "Invalid GitHub URL format")
+    return match.groups()
@@ -1,16 +1,20 @@
 import re
 import os
+import asyncio
 import httpx
 from typing import List
 
+from .cache import cached_get
+from .model import RepoFile, RepoServiceError
+
 # this is not nice. Maybe I should send the token as an arg
 from dotenv import load_dotenv
 load_dotenv()
 
-http_client = httpx.AsyncClient()
 repo_token = os.getenv('GITLAB_TOKEN')
 repo_slug = os.getenv('GITLAB_SLUG')
 gitlab_base_url = os.getenv('GITLAB_BASE_URL', 'https://gitlab.com')
+per_page = 100
 
 # compliant with RepoService protocol
 class GitlabService:
@@ -25,43 +29,93 @@ class GitlabService:
         Returns:
             Directory of files.
         """
-        if not repo_token or not repo_slug:
-            raise ValueError("GITLAB_TOKEN and GITLAB_SLUG environment variables must be set")
+        return [f.url for f in await self.get_repo_md_files(repo_url)]
 
-        match = re.search(r'gitlab\.[^/]+/([^/]+)/([^/]+?)(?:\.git)?$', repo_url)
-        if not match:
-            raise ValueError("Invalid GitLab URL format")
-        
-        owner, repo = match.groups()
+    async def get_repo_md_files(self, repo_url: str) -> List[RepoFile]:
+        """
+        Get the .md files of a GitLab repository along with their blob SHAs.
+
+        Args:
+            repo_url: The GitLab repository URL.
+
+        Returns:
+            List of markdown files.
+        """
+        if not repo_token:
+            raise ValueError("GITLAB_TOKEN environment variable must be set")
+
+        owner, repo = _parse_repo_url(repo_url)
         headers = {'Authorization': f'Bearer {repo_token}'}
+        project_url = f'{gitlab_base_url}/api/v4/projects/{owner}%2F{repo}'
         
-        structure = []
-        page = 1
-        per_page = 100
-
-        while True:
+        async def get_page(page: int) -> httpx.Response:
+            # without a ref the tree API lists the default branch
             params = {"recursive": "true", "page": page, "per_page": per_page}
-            response = await http_client.get(
-                f'{gitlab_base_url}/api/v4/projects/{owner}%2F{repo}/repository/tree',
-                headers=headers,
-                params=params
-            )
+            response = await cached_get(f'{project_url}/repository/tree', headers=headers, params=params)
+            if response.status_code != 200:
+                raise RepoServiceError(repo_url, f"Failed to get repository structure: {response.text}", response.status_code)
+            return response
 
-            response.raise_for_status()
-        
-            data = response.json()
-            if not data:
-                break
+        # the project call (default branch) and the first tree page go out together
+        project_response, first_page = await asyncio.gather(
+            cached_get(project_url, headers=headers),
+            get_page(1),
+        )
+        if project_response.status_code != 200:
+            raise RepoServiceError(repo_url, f"Failed to get project: {project_response.text}", project_response.status_code)
 
-            for item in data:
+        ref = project_response.json().get('default_branch', '')
+        slug = repo_slug or f"blob/{ref}"
+
+        pages = [first_page]
+        total_pages = first_page.headers.get('x-total-pages')
+        if total_pages:
+            pages.extend(await asyncio.gather(*(get_page(page) for page in range(2, int(total_pages) + 1))))
+        else:
+            # GitLab omits the totals for very large listings: fall back to walking x-next-page
+            next_page_header = first_page.headers.get('x-next-page')
+            while next_page_header:
+                pages.append(await get_page(int(next_page_header)))
+                next_page_header = pages[-1].headers.get('x-next-page')
+
+        structure = []
+        for response in pages:
+            for item in response.json():
                 if item.get('type') == 'blob' and not any(excluded in item['path'] for excluded in ['.git/', 'node_modules/', '__pycache__/']):
                     if item['path'].endswith('.md'):
-                        structure.append(f"{repo_url}/{repo_slug}/{item['path']}")
-
-            next_page_header = response.headers.get('x-next-page')
-            if next_page_header:
-                page = int(next_page_header)
-            else:
-                break
+                        structure.append(RepoFile(
+                            repo_url=repo_url,
+                            path=item['path'],
+                            url=f"{repo_url}/{slug}/{item['path']}",
+                            sha=item.get('id', ''),
+                            ref=ref,
+                        ))
         
         return structure
+
+    async def get_file_content(self, file: RepoFile) -> str:
+        """
+        Download the raw content of a repository file using the blob API.
+
+        Args:
+            file: A file returned by `get_repo_md_files`.
+
+        Returns:
+            The raw markdown text.
+        """
+        owner, repo = _parse_repo_url(file.repo_url)
+        response = await cached_get(
+            f'{gitlab_base_url}/api/v4/projects/{owner}%2F{repo}/repository/blobs/{file.sha}/raw',
+            headers={'Authorization': f'Bearer {repo_token}'},
+            # blobs are addressed by SHA, so a cached copy never goes stale
+            immutable=True
+        )
+        if response.status_code != 200:
+            raise RepoServiceError(file.repo_url, f"Failed to fetch {file.path}: {response.status_code}", response.status_code)
+        return response.text
+
+def _parse_repo_url(repo_url: str) -> tuple[str, str]:
+    match = re.search(r'gitlab\.[^/]+/([^/]+)/([^/]+?)(?:\.git)?$', repo_url)
+    if not match:
+        raise RepoServiceError(repo_url, "Invalid GitLab URL format")
+    return match.groups()
@@ -0,0 +1,110 @@
+import os
+import time
+import random
+import asyncio
+import importlib.util
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+import httpx
+
+from .budget import get_request_budget
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "30"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "5"))
+HTTP_MAX_BACKOFF = float(os.getenv("HTTP_MAX_BACKOFF", "300"))
+# HTTP/2 needs the `h2` package (installed with httpx[http2])
+HTTP2_REQUESTED = os.getenv("HTTP2", "1") != "0"
+HTTP2 = HTTP2_REQUESTED and importlib.util.find_spec("h2") is not None
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+_client: Optional[httpx.AsyncClient] = None
+_warned_http1 = False
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the process-wide HTTP client shared by all repo services."""
+    global _client, _warned_http1
+    if _client is None or _client.is_closed:
+        if HTTP2_REQUESTED and not HTTP2 and not _warned_http1:
+            print("HTTP/2 disabled: the h2 package is not installed (pip install 'httpx[http2]'), using HTTP/1.1")
+            _warned_http1 = True
+        _client = httpx.AsyncClient(
+            http2=HTTP2,
+            limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_KEEPALIVE),
+            timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            follow_redirects=True,
+        )
+    return _client
+
+async def aclose_http_client():
+    """Close the shared HTTP client (a new one is created on next use)."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+def _is_rate_limited(response: httpx.Response) -> bool:
+    # GitHub answers primary and secondary rate limits with 403
+    remaining = response.headers.get('x-ratelimit-remaining', response.headers.get('ratelimit-remaining'))
+    return response.status_code == 429 or (
+        response.status_code == 403 and (remaining == '0' or 'retry-after' in response.headers)
+    )
+
+def _backoff(attempt: int) -> float:
+    return min(2 ** attempt, HTTP_MAX_BACKOFF) * (0.5 + random.random() / 2)
+
+def _retry_delay(response: httpx.Response, attempt: int) -> float:
+    """Honor Retry-After, then rate-limit reset headers, then exponential backoff."""
+    retry_after = response.headers.get('retry-after')
+    if retry_after:
+        try:
+            delay = float(retry_after)
+        except ValueError:
+            delay = parsedate_to_datetime(retry_after).timestamp() - time.time()
+        return min(max(delay, 0.0), HTTP_MAX_BACKOFF)
+
+    remaining = response.headers.get('x-ratelimit-remaining', response.headers.get('ratelimit-remaining'))
+    reset = response.headers.get('x-ratelimit-reset', response.headers.get('ratelimit-reset'))
+    if remaining == '0' and reset:
+        return min(max(float(reset) - time.time(), 0.0) + 1, HTTP_MAX_BACKOFF)
+
+    return _backoff(attempt)
+
+async def get(url: str, headers: Optional[Dict[str, str]] = None, params: Optional[Dict[str, Any]] = None) -> httpx.Response:
+    """GET a URL with the shared client, within the request budget, with retries.
+
+    Rate-limited (429 / rate-limit 403) and transient 5xx responses as well as
+    transport errors are retried with exponential backoff, honoring
+    Retry-After and X-RateLimit-Reset / RateLimit-Reset headers.
+
+    Args:
+        url: The request URL.
+        headers: Request headers.
+        params: Query parameters.
+
+    Returns:
+        The final response (which may still be an error response).
+    """
+    for attempt in range(HTTP_MAX_RETRIES + 1):
+        try:
+            async with get_request_budget().acquire(url):
+                response = await get_http_client().get(url, headers=headers, params=params)
+        except httpx.TransportError as e:
+            if attempt == HTTP_MAX_RETRIES:
+                raise
+            delay = _backoff(attempt)
+            print(f"GET {url} failed ({e!r}), retrying in {delay:.1f}s...")
+        else:
+            if attempt == HTTP_MAX_RETRIES or not (
+                response.status_code in RETRYABLE_STATUS_CODES or _is_rate_limited(response)
+            ):
+                return response
+            delay = _retry_delay(response, attempt)
+            print(f"GET {url} returned {response.status_code}, retrying in {delay:.1f}s...")
+
+        # sleep outside the budget so waiting requests do not hold slots
+        await asyncio.sleep(delay)
@@ -0,0 +1,161 @@
+import os
+import re
+import asyncio
+import shutil
+import hashlib
+import tempfile
+from typing import List
+from urllib.parse import unquote, urlparse
+from urllib.request import pathname2url
+
+from .model import RepoFile, RepoServiceError
+
+git_clone_dir = os.getenv('GIT_CLONE_DIR', './.git-cache')
+git_clone_depth = int(os.getenv('GIT_CLONE_DEPTH', '1'))
+
+EXCLUDED_DIRS = {'.git', 'node_modules', '__pycache__'}
+
+# compliant with RepoService protocol
+class LocalService:
+    """Lists and reads markdown files from a directory on disk.
+
+    Handles local paths and `file://` URLs directly, and plain git URLs by
+    keeping a shallow, sparse (markdown only) clone under GIT_CLONE_DIR.
+    No hosted API is involved, so there are no rate limits.
+    """
+    async def get_repo_md_urls(self, repo_url: str) -> List[str]:
+        """
+        Get the .md file URLs of a local directory or git repository.
+
+        Args:
+            repo_url: A local path, `file://` URL or git URL.
+
+        Returns:
+            Directory of files.
+        """
+        return [f.url for f in await self.get_repo_md_files(repo_url)]
+
+    async def get_repo_md_files(self, repo_url: str) -> List[RepoFile]:
+        """
+        Walk a local directory (cloning or updating it first for git URLs) for .md files.
+
+        Args:
+            repo_url: A local path, `file://` URL or git URL.
+
+        Returns:
+            List of markdown files. The `sha` is the git blob SHA for git URLs
+            and a modification time/size signature for local directories, so
+            it changes whenever the file is edited.
+        """
+        if is_local_path(repo_url):
+            root = local_path(repo_url)
+            if not os.path.isdir(root):
+                raise RepoServiceError(repo_url, f"{root} is not a directory")
+            return await asyncio.to_thread(_walk_md_files, repo_url, root)
+
+        root = await _sync_clone(repo_url)
+        return await _git_md_files(repo_url, root)
+
+    async def get_file_content(self, file: RepoFile) -> str:
+        """
+        Read the content of a repository file from disk.
+
+        Args:
+            file: A file returned by `get_repo_md_files`.
+
+        Returns:
+            The raw markdown text.
+        """
+        root = local_path(file.repo_url) if is_local_path(file.repo_url) else clone_path(file.repo_url)
+        try:
+            return await asyncio.to_thread(_read_text, os.path.join(root, file.path))
+        except OSError as e:
+            raise RepoServiceError(file.repo_url, f"Failed to read {file.path}: {e}")
+
+def is_local_path(repo_url: str) -> bool:
+    """Return True for `file://` URLs and existing local directories."""
+    return repo_url.startswith('file://') or os.path.isdir(repo_url)
+
+def is_git_url(repo_url: str) -> bool:
+    """Return True for URLs that can only be read with `git clone`."""
+    return bool(re.match(r'^(git@|ssh://|git://)', repo_url)) or repo_url.rstrip('/').endswith('.git')
+
+def local_path(repo_url: str) -> str:
+    """Return the absolute directory of a local path or `file://` URL."""
+    if repo_url.startswith('file://'):
+        return os.path.abspath(unquote(urlparse(repo_url).path))
+    return os.path.abspath(repo_url)
+
+def clone_path(repo_url: str) -> str:
+    """Return the directory the clone of a git URL is kept in."""
+    name = re.sub(r'[^A-Za-z0-9_.-]+', '_', repo_url.rstrip('/').removesuffix('.git').split('/')[-1].split(':')[-1])
+    digest = hashlib.md5(repo_url.encode('utf-8')).hexdigest()[:8]
+    return os.path.abspath(os.path.join(git_clone_dir, f"{name}-{digest}"))
+
+async def _git(repo_url: str, *args: str, cwd: str = None) -> str:
+    process = await asyncio.create_subprocess_exec(
+        'git', *args, cwd=cwd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    stdout, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise RepoServiceError(repo_url, f"git {args[0]} failed: {stderr.decode(errors='replace').strip()}")
+    return stdout.decode('utf-8', errors='replace')
+
+async def _sync_clone(repo_url: str) -> str:
+    path = clone_path(repo_url)
+    if os.path.isdir(os.path.join(path, '.git')):
+        await _git(repo_url, 'fetch', f'--depth={git_clone_depth}', 'origin', 'HEAD', cwd=path)
+        await _git(repo_url, 'reset', '--hard', 'FETCH_HEAD', cwd=path)
+        return path
+
+    # clone next to the final path and move it into place once checked out,
+    # so a failed clone never leaves a directory later runs take for a clone
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = tempfile.mkdtemp(prefix=f"{os.path.basename(path)}.", suffix='.tmp', dir=os.path.dirname(path))
+    try:
+        # blobs of non-markdown files are never downloaded
+        await _git(repo_url, 'clone', f'--depth={git_clone_depth}', '--filter=blob:none', '--no-checkout', repo_url, tmp_path)
+        await _git(repo_url, 'sparse-checkout', 'set', '--no-cone', '*.md', cwd=tmp_path)
+        await _git(repo_url, 'checkout', cwd=tmp_path)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        os.rename(tmp_path, path)
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+    return path
+
+async def _git_md_files(repo_url: str, root: str) -> List[RepoFile]:
+    """List the markdown files of a clone with their git blob SHAs."""
+    files = []
+    for line in (await _git(repo_url, 'ls-files', '-s', '-z', cwd=root)).split('\0'):
+        if not line:
+            continue
+        # <mode> <blob sha> <stage>\t<path>
+        info, relative = line.split('\t', 1)
+        if not relative.endswith('.md') or EXCLUDED_DIRS.intersection(relative.split('/')[:-1]):
+            continue
+        files.append(RepoFile(repo_url=repo_url, path=relative, url=f"{repo_url}#{relative}", sha=info.split()[1]))
+    return sorted(files, key=lambda f: f.path)
+
+def _walk_md_files(repo_url: str, root: str) -> List[RepoFile]:
+    files = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in EXCLUDED_DIRS)
+        for filename in sorted(filenames):
+            if not filename.endswith('.md'):
+                continue
+            path = os.path.join(dirpath, filename)
+            stat = os.stat(path)
+            relative = os.path.relpath(path, root).replace(os.sep, '/')
+            files.append(RepoFile(
+                repo_url=repo_url,
+                path=relative,
+                url=f"file://{pathname2url(path)}",
+                sha=f"{stat.st_mtime_ns:x}-{stat.st_size:x}",
+            ))
+    return files
+
+def _read_text(path: str) -> str:
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        return f.read()
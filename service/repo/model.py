@@ -0,0 +1,31 @@
+from dataclasses import dataclass
+from typing import Optional
+
+@dataclass(frozen=True)
+class RepoFile:
+    """A markdown file discovered in a repository tree.
+
+    Attributes:
+        repo_url: The repository URL the file was listed from.
+        path: The file path relative to the repository root.
+        url: The browsable URL of the file (used as the document source).
+        sha: The git blob SHA reported by the tree API.
+        ref: The branch the tree was listed from.
+    """
+    repo_url: str
+    path: str
+    url: str
+    sha: str
+    ref: str = ""
+
+class RepoServiceError(Exception):
+    """Raised when a repository cannot be listed or a file cannot be fetched.
+
+    Attributes:
+        repo_url: The repository URL the request was made for.
+        status_code: The HTTP status code, if the failure came from an HTTP response.
+    """
+    def __init__(self, repo_url: str, message: str, status_code: Optional[int] = None):
+        super().__init__(f"{repo_url}: {message}")
+        self.repo_url = repo_url
+        self.status_code = status_code
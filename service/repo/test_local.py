@@ -0,0 +1,52 @@
+import asyncio
+import os
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from service.repo import local
+from service.repo.model import RepoServiceError
+
+def git(*args, cwd):
+    return subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True, text=True).stdout
+
+@pytest.fixture
+def origin(tmp_path):
+    """A git repository with two markdown files and one other file."""
+    repo = tmp_path / "origin"
+    (repo / "docs").mkdir(parents=True)
+    (repo / "README.md").write_text("# Readme\n", encoding="utf-8")
+    (repo / "docs" / "guide.md").write_text("# Guide\n", encoding="utf-8")
+    (repo / "main.py").write_text("print('hi')\n", encoding="utf-8")
+    git("init", "-q", cwd=repo)
+    git("add", ".", cwd=repo)
+    git("-c", "user.name=test", "-c", "user.email=test@example.com", "commit", "-q", "-m", "init", cwd=repo)
+    return repo
+
+@pytest.fixture
+def clone_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(local, "git_clone_dir", str(tmp_path / "clones"))
+    return tmp_path / "clones"
+
+async def clone_and_list(repo_url):
+    return await local._git_md_files(repo_url, await local._sync_clone(repo_url))
+
+def test_git_clone_lists_blob_shas(origin, clone_dir):
+    # an existing directory would be read in place, so clone it through the git code path directly
+    repo_url = f"{origin}/.git"
+    files = asyncio.run(clone_and_list(repo_url))
+
+    assert [f.path for f in files] == ["README.md", "docs/guide.md"]
+    assert [f.url for f in files] == [f"{repo_url}#README.md", f"{repo_url}#docs/guide.md"]
+    assert files[0].sha == git("rev-parse", "HEAD:README.md", cwd=origin).strip()
+    assert (Path(local.clone_path(repo_url)) / "docs" / "guide.md").read_text(encoding="utf-8") == "# Guide\n"
+    assert not (Path(local.clone_path(repo_url)) / "main.py").exists()
+
+def test_failed_clone_leaves_no_directory(tmp_path, clone_dir):
+    repo_url = f"{tmp_path}/missing.git"
+    with pytest.raises(RepoServiceError):
+        asyncio.run(clone_and_list(repo_url))
+
+    assert not os.path.exists(local.clone_path(repo_url))
+    assert os.listdir(clone_dir) == []
@@ -1,19 +1,34 @@
 from typing import List, Protocol
+from urllib.parse import urlparse
 
+from service.telemetry.metrics import metrics
+
+from .model import RepoFile
 from .github import GithubService
 from .gitlab import GitlabService
+from .local import LocalService, is_git_url, is_local_path
 
 class IRepoService(Protocol): 
     async def get_repo_md_urls(self, repo_url: str) -> List[str]:
         """Get repository markdown URLs."""
         pass
 
+    async def get_repo_md_files(self, repo_url: str) -> List[RepoFile]:
+        """Get repository markdown files along with their blob SHAs."""
+        pass
+
+    async def get_file_content(self, file: RepoFile) -> str:
+        """Get the raw content of a repository file."""
+        pass
+
 # dictionary to map repo types to their respective tool types
 # please note the dict value is a type, not an instance
 REPO_SERVICES = dict[str, type(IRepoService)]
 services: REPO_SERVICES = {
     "github": GithubService,
-    "gitlab": GitlabService
+    "gitlab": GitlabService,
+    "local": LocalService,
+    "git": LocalService
 }
 
 async def get_repo_md_urls(repo_url: str) -> List[str]:
@@ -27,6 +42,44 @@ async def get_repo_md_urls(repo_url: str) -> List[str]:
     """
     return await services[_get_repo_type(repo_url)]().get_repo_md_urls(repo_url)
 
+async def get_repo_md_files(repo_url: str) -> List[RepoFile]:
+    """Get repository markdown files along with their blob SHAs.
+
+    Args:
+        repo_url: The repository URL.
+
+    Returns:
+        List of markdown files.
+    """
+    repo_type = _get_repo_type(repo_url)
+    with metrics.span("repo_listing", repo_type=repo_type):
+        files = await services[repo_type]().get_repo_md_files(repo_url)
+    metrics.inc("repo_files_listed_total", len(files), repo_type=repo_type)
+    return files
+
+async def get_file_content(file: RepoFile) -> str:
+    """Get the raw content of a repository file.
+
+    Args:
+        file: A file returned by `get_repo_md_files`.
+
+    Returns:
+        The raw file content.
+    """
+    return await services[_get_repo_type(file.repo_url)]().get_file_content(file)
+
+def is_repo_url(url: str) -> bool:
+    """Return True if the URL points to a supported repository host."""
+    try:
+        _get_repo_type(url)
+        return True
+    except ValueError:
+        return False
+
+def is_hosted_repo_url(url: str) -> bool:
+    """Return True if the URL is served by a hosted API (GitHub/GitLab) rather than read from disk."""
+    return is_repo_url(url) and _get_repo_type(url) in ("github", "gitlab")
+
 def _get_repo_type(repo_url: str) -> str:
     """Determine the type of repository based on the URL.
 
@@ -34,12 +87,20 @@ def _get_repo_type(repo_url: str) -> str:
         repo_url: The repository URL.
 
     Returns:
-        str: The type of repository ('github' or 'gitlab').
+        str: The type of repository ('local', 'github', 'gitlab' or 'git').
     """
-    if "github" in repo_url:
+    if is_local_path(repo_url):
+        return "local"
+    # ssh, scp-style and git:// URLs can only be cloned, whatever the host
+    if not repo_url.startswith(("http://", "https://")) and is_git_url(repo_url):
+        return "git"
+    host = urlparse(repo_url).hostname or ""
+    if "github" in host:
         return "github"
-    elif "gitlab" in repo_url:
+    elif "gitlab" in host:
         return "gitlab"
+    elif is_git_url(repo_url):
+        return "git"
     else:
         raise ValueError("Unsupported repository URL format")
 
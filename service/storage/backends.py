@@ -0,0 +1,69 @@
+import os
+from typing import Dict
+
+# our backends: (LightRAG storage type, module)
+CUSTOM_STORAGES: Dict[str, tuple] = {
+    "SQLiteKVStorage": ("KV_STORAGE", "service.storage.sqlite"),
+    "SQLiteDocStatusStorage": ("DOC_STATUS_STORAGE", "service.storage.sqlite"),
+    "ChromaVectorDBStorage": ("VECTOR_STORAGE", "service.storage.chroma"),
+}
+
+# STORAGE_BACKEND presets; LightRAG's own defaults load every store fully into memory
+STORAGE_PRESETS: Dict[str, Dict[str, str]] = {
+    "json": {
+        "kv_storage": "JsonKVStorage",
+        "vector_storage": "NanoVectorDBStorage",
+        "graph_storage": "NetworkXStorage",
+        "doc_status_storage": "JsonDocStatusStorage",
+    },
+    "sqlite": {
+        "kv_storage": "SQLiteKVStorage",
+        "vector_storage": "NanoVectorDBStorage",
+        "graph_storage": "NetworkXStorage",
+        "doc_status_storage": "SQLiteDocStatusStorage",
+    },
+    "chroma": {
+        "kv_storage": "SQLiteKVStorage",
+        "vector_storage": "ChromaVectorDBStorage",
+        "graph_storage": "NetworkXStorage",
+        "doc_status_storage": "SQLiteDocStatusStorage",
+    },
+}
+
+# per-store overrides of the preset, named as in LightRAG's server
+STORAGE_ENV = {
+    "kv_storage": "LIGHTRAG_KV_STORAGE",
+    "vector_storage": "LIGHTRAG_VECTOR_STORAGE",
+    "graph_storage": "LIGHTRAG_GRAPH_STORAGE",
+    "doc_status_storage": "LIGHTRAG_DOC_STATUS_STORAGE",
+}
+
+_registered = False
+
+def register_storages():
+    """Make our backends known to LightRAG's storage registry (idempotent)."""
+    global _registered
+    if _registered:
+        return
+    from lightrag.kg import STORAGES, STORAGE_ENV_REQUIREMENTS, STORAGE_IMPLEMENTATIONS
+
+    for name, (storage_type, module) in CUSTOM_STORAGES.items():
+        # absolute module paths resolve regardless of the `lightrag` anchor package
+        STORAGES[name] = module
+        STORAGE_ENV_REQUIREMENTS.setdefault(name, [])
+        if name not in STORAGE_IMPLEMENTATIONS[storage_type]["implementations"]:
+            STORAGE_IMPLEMENTATIONS[storage_type]["implementations"].append(name)
+    _registered = True
+
+def storage_kwargs() -> Dict[str, str]:
+    """LightRAG storage arguments from STORAGE_BACKEND and the LIGHTRAG_*_STORAGE overrides.
+
+    Returns:
+        The `kv_storage`, `vector_storage`, `graph_storage` and
+        `doc_status_storage` keyword arguments of `LightRAG`.
+    """
+    preset = os.getenv("STORAGE_BACKEND", "json")
+    if preset not in STORAGE_PRESETS:
+        raise ValueError(f"Unsupported STORAGE_BACKEND: {preset} (expected one of {', '.join(STORAGE_PRESETS)})")
+    register_storages()
+    return {arg: os.getenv(env) or STORAGE_PRESETS[preset][arg] for arg, env in STORAGE_ENV.items()}
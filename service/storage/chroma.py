@@ -0,0 +1,153 @@
+import os
+import time
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from chromadb import PersistentClient
+from chromadb.config import Settings
+from lightrag.base import BaseVectorStorage
+from lightrag.constants import DEFAULT_QUERY_PRIORITY
+from lightrag.utils import compute_mdhash_id, logger, validate_workspace
+
+CHROMA_DIR = "chroma"
+# HNSW settings of new collections; search_ef trades query latency for recall
+CHROMA_HNSW = {
+    "hnsw:space": "cosine",
+    "hnsw:construction_ef": int(os.getenv("CHROMA_CONSTRUCTION_EF", "128")),
+    "hnsw:search_ef": int(os.getenv("CHROMA_SEARCH_EF", "64")),
+    "hnsw:M": int(os.getenv("CHROMA_M", "16")),
+}
+
+@dataclass
+class ChromaVectorDBStorage(BaseVectorStorage):
+    """LightRAG vector storage in an embedded, on-disk Chroma database.
+
+    Each namespace (entities, relationships, chunks) is a collection of a
+    `PersistentClient` at `WORKING_DIR/[workspace/]chroma`. Chroma keeps
+    its HNSW index on disk and pages it in on demand, so opening the index
+    does not parse a JSON file holding every vector as `NanoVectorDBStorage`
+    does. Meta fields are stored as Chroma metadata (values must be
+    scalars) and `content` as the document.
+    """
+    def __post_init__(self):
+        self._validate_embedding_func()
+        validate_workspace(self.workspace or "")
+        self.workspace = self.workspace or ""
+        working_dir = self.global_config["working_dir"]
+        path = os.path.join(working_dir, self.workspace, CHROMA_DIR) if self.workspace else os.path.join(working_dir, CHROMA_DIR)
+        os.makedirs(path, exist_ok=True)
+
+        config = self.global_config.get("vector_db_storage_cls_kwargs", {})
+        self.cosine_better_than_threshold = config.get("cosine_better_than_threshold", self.cosine_better_than_threshold)
+        self._max_batch_size = self.global_config["embedding_batch_num"]
+        self._client = PersistentClient(path=path, settings=Settings(anonymized_telemetry=False, allow_reset=True))
+        self._collection = self._client.get_or_create_collection(
+            name=self.namespace,
+            metadata={**CHROMA_HNSW, "dimension": self.embedding_func.embedding_dim},
+        )
+
+    def _metadata(self, item: Dict[str, Any], created_at: int) -> Dict[str, Any]:
+        metadata = {"created_at": created_at}
+        for key, value in item.items():
+            if key in self.meta_fields and key != "content" and value is not None:
+                metadata[key] = value if isinstance(value, (str, int, float, bool)) else str(value)
+        return metadata
+
+    @staticmethod
+    def _record(id: str, document: Optional[str], metadata: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        metadata = dict(metadata or {})
+        return {**metadata, "id": id, "content": document or "", "created_at": metadata.get("created_at")}
+
+    async def upsert(self, data: Dict[str, Dict[str, Any]]) -> None:
+        if not data:
+            return
+        created_at = int(time.time())
+        ids = list(data)
+        documents = [item.get("content", "") for item in data.values()]
+        metadatas = [self._metadata(item, created_at) for item in data.values()]
+
+        batches = [documents[i:i + self._max_batch_size] for i in range(0, len(documents), self._max_batch_size)]
+        embeddings = np.concatenate(await asyncio.gather(
+            *(self.embedding_func(batch, context="document") for batch in batches)
+        ))
+        for start in range(0, len(ids), self._max_batch_size):
+            end = start + self._max_batch_size
+            await asyncio.to_thread(
+                self._collection.upsert,
+                ids=ids[start:end], embeddings=embeddings[start:end].tolist(),
+                documents=documents[start:end], metadatas=metadatas[start:end],
+            )
+
+    async def query(self, query: str, top_k: int, query_embedding: List[float] = None) -> List[Dict[str, Any]]:
+        if query_embedding is None:
+            query_embedding = (await self.embedding_func(
+                [query], context="query", _priority=DEFAULT_QUERY_PRIORITY
+            ))[0]
+        count = self._collection.count()
+        if not count:
+            return []
+        results = await asyncio.to_thread(
+            self._collection.query,
+            query_embeddings=[np.asarray(query_embedding, dtype=np.float32).tolist()],
+            n_results=min(top_k, count),
+            include=["metadatas", "distances", "documents"],
+        )
+        matches = []
+        for id, distance, document, metadata in zip(
+            results["ids"][0], results["distances"][0], results["documents"][0], results["metadatas"][0]
+        ):
+            # Chroma returns cosine distance; LightRAG ranks by cosine similarity
+            similarity = 1 - distance
+            if similarity >= self.cosine_better_than_threshold:
+                matches.append({**self._record(id, document, metadata), "distance": similarity})
+        return matches
+
+    async def index_done_callback(self) -> None:
+        # PersistentClient writes through to disk
+        pass
+
+    async def delete(self, ids: List[str]):
+        if ids:
+            await asyncio.to_thread(self._collection.delete, ids=list(ids))
+
+    async def delete_entity(self, entity_name: str) -> None:
+        await self.delete([compute_mdhash_id(entity_name, prefix="ent-")])
+
+    async def delete_entity_relation(self, entity_name: str) -> None:
+        await asyncio.to_thread(
+            self._collection.delete, where={"$or": [{"src_id": entity_name}, {"tgt_id": entity_name}]}
+        )
+
+    async def get_by_id(self, id: str) -> Optional[Dict[str, Any]]:
+        return (await self.get_by_ids([id]))[0]
+
+    async def get_by_ids(self, ids: List[str]) -> List[Optional[Dict[str, Any]]]:
+        if not ids:
+            return []
+        result = await asyncio.to_thread(self._collection.get, ids=list(ids), include=["metadatas", "documents"])
+        found = {
+            id: self._record(id, document, metadata)
+            for id, document, metadata in zip(result["ids"], result["documents"], result["metadatas"])
+        }
+        return [found.get(id) for id in ids]
+
+    async def get_vectors_by_ids(self, ids: List[str]) -> Dict[str, List[float]]:
+        if not ids:
+            return {}
+        result = await asyncio.to_thread(self._collection.get, ids=list(ids), include=["embeddings"])
+        return {id: list(map(float, embedding)) for id, embedding in zip(result["ids"], result["embeddings"])}
+
+    async def drop(self) -> Dict[str, str]:
+        try:
+            self._client.delete_collection(self.namespace)
+            self._collection = self._client.get_or_create_collection(
+                name=self.namespace,
+                metadata={**CHROMA_HNSW, "dimension": self.embedding_func.embedding_dim},
+            )
+            logger.info(f"[{self.workspace}] Process {os.getpid()} drop Chroma collection {self.namespace}")
+            return {"status": "success", "message": "data dropped"}
+        except Exception as e:
+            logger.error(f"[{self.workspace}] Error dropping Chroma collection {self.namespace}: {e}")
+            return {"status": "error", "message": str(e)}
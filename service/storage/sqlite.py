@@ -0,0 +1,251 @@
+import os
+import json
+import time
+import sqlite3
+from dataclasses import dataclass
+from typing import Any, ClassVar, Dict, List, Optional
+
+from lightrag.base import BaseKVStorage
+from lightrag.exceptions import StorageNotInitializedError
+from lightrag.kg.json_doc_status_impl import JsonDocStatusStorage
+from lightrag.kg.shared_storage import (
+    clear_all_update_flags,
+    get_data_init_lock,
+    get_namespace_data,
+    get_namespace_lock,
+    get_update_flag,
+    set_all_update_flags,
+    try_initialize_namespace,
+)
+from lightrag.utils import logger, validate_workspace
+
+SQLITE_FILE = "kv_store.sqlite"
+# bound the number of ? placeholders per statement (SQLite's default limit is 999 on old builds)
+SQL_BATCH = 500
+
+class _Database:
+    """One SQLite connection per file, shared by every namespace stored in it.
+
+    Writes open an implicit transaction that is committed at LightRAG's
+    `index_done_callback`, so a batch of inserts lands atomically and
+    readers in other processes (the query server) only see whole batches.
+    Namespaces share the connection so they never lock each other out.
+    """
+    _open: ClassVar[Dict[str, "_Database"]] = {}
+
+    def __init__(self, path: str):
+        self.path = path
+        self.users = 0
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+
+    @classmethod
+    def acquire(cls, path: str) -> "_Database":
+        if path not in cls._open:
+            cls._open[path] = _Database(path)
+        db = cls._open[path]
+        db.users += 1
+        return db
+
+    def release(self):
+        self.conn.commit()
+        self.users -= 1
+        if self.users <= 0:
+            self.conn.close()
+            _Database._open.pop(self.path, None)
+
+def _storage_dir(global_config: Dict[str, Any], workspace: str) -> str:
+    validate_workspace(workspace)
+    path = os.path.join(global_config["working_dir"], workspace) if workspace else global_config["working_dir"]
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def _table(namespace: str) -> str:
+    return "kv_" + "".join(c if c.isalnum() else "_" for c in namespace)
+
+def _chunks(items: List[str]) -> List[List[str]]:
+    return [items[i:i + SQL_BATCH] for i in range(0, len(items), SQL_BATCH)]
+
+@dataclass
+class SQLiteKVStorage(BaseKVStorage):
+    """LightRAG KV storage in `WORKING_DIR/[workspace/]kv_store.sqlite`, one table per namespace.
+
+    Unlike `JsonKVStorage` nothing is loaded at startup: reads are indexed
+    point lookups against the file, so a query process opens the index in
+    constant time and memory regardless of corpus size. Writes go straight
+    to SQLite and are committed at `index_done_callback`.
+    """
+    supports_strict_point_reads: ClassVar[bool] = True
+
+    def __post_init__(self):
+        self.workspace = self.workspace or ""
+        self._path = os.path.join(_storage_dir(self.global_config, self.workspace), SQLITE_FILE)
+        self._table = _table(self.namespace)
+        self._db: Optional[_Database] = None
+
+    async def initialize(self):
+        self._db = _Database.acquire(self._path)
+        self._db.conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self._table} ("
+            " id TEXT PRIMARY KEY, value TEXT NOT NULL, create_time INTEGER, update_time INTEGER)"
+        )
+        self._db.conn.commit()
+
+    async def finalize(self):
+        if self._db is not None:
+            self._db.release()
+            self._db = None
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            raise StorageNotInitializedError("SQLiteKVStorage")
+        return self._db.conn
+
+    @staticmethod
+    def _row(id: str, value: str, create_time: int, update_time: int) -> Dict[str, Any]:
+        result = json.loads(value)
+        result["create_time"] = create_time or 0
+        result["update_time"] = update_time or 0
+        result["_id"] = id
+        return result
+
+    async def get_by_id(self, id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute(
+            f"SELECT id, value, create_time, update_time FROM {self._table} WHERE id = ?", (id,)
+        ).fetchone()
+        return self._row(*row) if row else None
+
+    async def get_by_id_strict(self, id: str) -> Optional[Dict[str, Any]]:
+        # every failure raises from sqlite3, so a miss is a confirmed absence
+        return await self.get_by_id(id)
+
+    async def get_by_ids(self, ids: List[str]) -> List[Optional[Dict[str, Any]]]:
+        found: Dict[str, Dict[str, Any]] = {}
+        for chunk in _chunks(list(ids)):
+            rows = self._conn().execute(
+                f"SELECT id, value, create_time, update_time FROM {self._table}"
+                f" WHERE id IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            found.update((row[0], self._row(*row)) for row in rows)
+        return [found.get(id) for id in ids]
+
+    async def filter_keys(self, keys: set[str]) -> set[str]:
+        existing = set()
+        for chunk in _chunks(list(keys)):
+            existing.update(row[0] for row in self._conn().execute(
+                f"SELECT id FROM {self._table} WHERE id IN ({','.join('?' * len(chunk))})", chunk
+            ))
+        return set(keys) - existing
+
+    async def upsert(self, data: Dict[str, Dict[str, Any]]) -> None:
+        if not data:
+            return
+        now = int(time.time())
+        rows = []
+        for key, value in data.items():
+            # same defaults JsonKVStorage applies on insert
+            if self.namespace.endswith("text_chunks"):
+                value.setdefault("llm_cache_list", [])
+            value["_id"] = key
+            stored = {k: v for k, v in value.items() if k not in ("create_time", "update_time")}
+            rows.append((key, json.dumps(stored, ensure_ascii=False), now, now))
+        # create_time survives updates of an existing key
+        self._conn().executemany(
+            f"INSERT INTO {self._table} (id, value, create_time, update_time) VALUES (?, ?, ?, ?)"
+            " ON CONFLICT(id) DO UPDATE SET value = excluded.value, update_time = excluded.update_time",
+            rows,
+        )
+
+    async def delete(self, ids: List[str]) -> None:
+        for chunk in _chunks(list(ids)):
+            self._conn().execute(f"DELETE FROM {self._table} WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+
+    async def is_empty(self) -> bool:
+        return self._conn().execute(f"SELECT 1 FROM {self._table} LIMIT 1").fetchone() is None
+
+    async def index_done_callback(self) -> None:
+        self._conn().commit()
+
+    async def drop(self) -> Dict[str, str]:
+        try:
+            self._conn().execute(f"DELETE FROM {self._table}")
+            self._conn().commit()
+            logger.info(f"[{self.workspace}] Process {os.getpid()} drop {self.namespace}")
+            return {"status": "success", "message": "data dropped"}
+        except Exception as e:
+            logger.error(f"[{self.workspace}] Error dropping {self.namespace}: {e}")
+            return {"status": "error", "message": str(e)}
+
+@dataclass
+class SQLiteDocStatusStorage(JsonDocStatusStorage):
+    """`JsonDocStatusStorage` persisted to SQLite instead of a JSON file.
+
+    Document statuses (one small row per document) stay in LightRAG's
+    shared in-memory dict, so every status query of the JSON backend is
+    reused unchanged; only loading and flushing go through the
+    `doc_status` table of `kv_store.sqlite`, which writes only the rows
+    that changed since the last flush instead of rewriting the whole file.
+    """
+    def __post_init__(self):
+        self.workspace = self.workspace or ""
+        self._path = os.path.join(_storage_dir(self.global_config, self.workspace), SQLITE_FILE)
+        self._table = _table(self.namespace)
+        self._db: Optional[_Database] = None
+        self._data = None
+        self._storage_lock = None
+        self.storage_updated = None
+        # rows as last written, to flush only what changed
+        self._flushed: Dict[str, str] = {}
+
+    async def initialize(self):
+        self._db = _Database.acquire(self._path)
+        self._db.conn.execute(f"CREATE TABLE IF NOT EXISTS {self._table} (id TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._db.conn.commit()
+
+        self._storage_lock = get_namespace_lock(self.namespace, workspace=self.workspace)
+        self.storage_updated = await get_update_flag(self.namespace, workspace=self.workspace)
+        async with get_data_init_lock():
+            need_init = await try_initialize_namespace(self.namespace, workspace=self.workspace)
+            self._data = await get_namespace_data(self.namespace, workspace=self.workspace)
+            if need_init:
+                self._flushed = dict(self._db.conn.execute(f"SELECT id, value FROM {self._table}"))
+                async with self._storage_lock:
+                    self._data.update({id: json.loads(value) for id, value in self._flushed.items()})
+                logger.info(
+                    f"[{self.workspace}] Process {os.getpid()} doc status load {self.namespace} with {len(self._flushed)} records"
+                )
+
+    async def finalize(self):
+        if self._db is not None:
+            await self.index_done_callback()
+            self._db.release()
+            self._db = None
+
+    async def index_done_callback(self) -> None:
+        async with self._storage_lock:
+            if not self.storage_updated.value:
+                return
+            current = {id: json.dumps(row, ensure_ascii=False, default=str) for id, row in self._data.copy().items()}
+            changed = [(id, value) for id, value in current.items() if self._flushed.get(id) != value]
+            removed = [id for id in self._flushed if id not in current]
+
+            conn = self._db.conn
+            conn.executemany(f"INSERT OR REPLACE INTO {self._table} (id, value) VALUES (?, ?)", changed)
+            for chunk in _chunks(removed):
+                conn.execute(f"DELETE FROM {self._table} WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+            conn.commit()
+            self._flushed = current
+            await clear_all_update_flags(self.namespace, workspace=self.workspace)
+
+    async def drop(self) -> Dict[str, str]:
+        try:
+            async with self._storage_lock:
+                self._data.clear()
+                await set_all_update_flags(self.namespace, workspace=self.workspace)
+            await self.index_done_callback()
+            logger.info(f"[{self.workspace}] Process {os.getpid()} drop {self.namespace}")
+            return {"status": "success", "message": "data dropped"}
+        except Exception as e:
+            logger.error(f"[{self.workspace}] Error dropping {self.namespace}: {e}")
+            return {"status": "error", "message": str(e)}
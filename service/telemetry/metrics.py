@@ -0,0 +1,182 @@
+import os
+import json
+import time
+import bisect
+import functools
+import dataclasses
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# latency buckets in seconds (Prometheus `le` bounds)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+MAX_SAMPLES = 10000
+MAX_SPANS = int(os.getenv("METRICS_MAX_SPANS", "10000"))
+
+Labels = Tuple[Tuple[str, str], ...]
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token)."""
+    return len(text) // 4 + 1 if text else 0
+
+class _Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.samples: List[float] = []
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+        if len(self.samples) < MAX_SAMPLES:
+            self.samples.append(value)
+
+    def quantile(self, q: float) -> float:
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+class Metrics:
+    """In-process spans, counters and latency histograms for the build and query paths.
+
+    Spans also go to logfire when it is configured (LOGFIRE_TOKEN set or
+    METRICS_LOGFIRE=1).
+    """
+    def __init__(self):
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.histograms: Dict[Tuple[str, Labels], _Histogram] = {}
+        self.spans: List[Dict[str, Any]] = []
+        self._logfire = None
+        if os.getenv("LOGFIRE_TOKEN") or os.getenv("METRICS_LOGFIRE") == "1":
+            import logfire
+            logfire.configure(send_to_logfire="if-token-present")
+            self._logfire = logfire
+
+    def reset(self):
+        """Drop every counter, histogram and span recorded so far."""
+        self.counters.clear()
+        self.histograms.clear()
+        self.spans.clear()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, _labels(labels))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, _labels(labels))
+        if key not in self.histograms:
+            self.histograms[key] = _Histogram()
+        self.histograms[key].observe(value)
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        """Time a block: records a span and a `<name>_seconds` histogram.
+
+        Only low-cardinality `attrs` should be passed, they become histogram labels.
+        """
+        start = time.perf_counter()
+        started_at = time.time()
+        error = None
+        logfire_span = self._logfire.span(name, **attrs) if self._logfire else None
+        try:
+            if logfire_span:
+                with logfire_span:
+                    yield
+            else:
+                yield
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            self.observe(f"{name}_seconds", duration, **attrs)
+            if error:
+                self.inc(f"{name}_errors_total", **attrs)
+            if len(self.spans) < MAX_SPANS:
+                self.spans.append({"name": name, "start": started_at, "duration": duration, "error": error, **attrs})
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return every metric as plain JSON-serializable data."""
+        return {
+            "counters": [{"name": n, "labels": dict(l), "value": v} for (n, l), v in sorted(self.counters.items())],
+            "histograms": [
+                {"name": n, "labels": dict(l), "count": h.count, "sum": h.sum,
+                 "p50": h.quantile(0.5), "p95": h.quantile(0.95), "max": max(h.samples, default=0.0)}
+                for (n, l), h in sorted(self.histograms.items())
+            ],
+            "spans": self.spans,
+        }
+
+    def prometheus_text(self) -> str:
+        """Render counters and histograms in the Prometheus text exposition format."""
+        def fmt(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+            items = list(labels) + ([extra] if extra else [])
+            return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}" if items else ""
+
+        lines = []
+        for name in sorted({n for n, _ in self.counters}):
+            lines.append(f"# TYPE {name} counter")
+            lines.extend(f"{name}{fmt(l)} {v}" for (n, l), v in sorted(self.counters.items()) if n == name)
+        for name in sorted({n for n, _ in self.histograms}):
+            lines.append(f"# TYPE {name} histogram")
+            for (n, l), h in sorted(self.histograms.items()):
+                if n != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(BUCKETS + (float("inf"),), h.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{fmt(l, ('le', '+Inf' if bound == float('inf') else str(bound)))} {cumulative}")
+                lines.append(f"{name}_sum{fmt(l)} {h.sum}")
+                lines.append(f"{name}_count{fmt(l)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str):
+        """Write `<path>` as JSON and `<path minus .json>.prom` as Prometheus text."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2)
+        with open(os.path.splitext(path)[0] + ".prom", "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+
+    def summary_table(self) -> str:
+        """Return a per-stage table of call counts and latencies."""
+        rows = [f"{'stage':<40} {'count':>8} {'total s':>10} {'p50 ms':>10} {'p95 ms':>10}"]
+        for (name, labels), h in sorted(self.histograms.items()):
+            label = name.removesuffix("_seconds") + ("" if not labels else " " + ",".join(f"{k}={v}" for k, v in labels))
+            rows.append(f"{label:<40} {h.count:>8} {h.sum:>10.2f} {h.quantile(0.5) * 1000:>10.1f} {h.quantile(0.95) * 1000:>10.1f}")
+        for (name, labels), value in sorted(self.counters.items()):
+            label = name + ("" if not labels else " " + ",".join(f"{k}={v}" for k, v in labels))
+            rows.append(f"{label:<40} {value:>8.0f}")
+        return "\n".join(rows)
+
+metrics = Metrics()
+
+def instrument_llm_func(func: Callable, provider: str) -> Callable:
+    """Wrap a LightRAG `llm_model_func` with spans, call counts and token usage."""
+    @functools.wraps(func)
+    async def wrapper(prompt, system_prompt=None, history_messages=None, **kwargs):
+        metrics.inc("llm_calls_total", provider=provider)
+        metrics.inc("llm_prompt_tokens_total", estimate_tokens(prompt) + estimate_tokens(system_prompt or "")
+                    + sum(estimate_tokens(str(m.get("content", ""))) for m in history_messages or []), provider=provider)
+        with metrics.span("llm_call", provider=provider):
+            response = await func(prompt, system_prompt=system_prompt, history_messages=history_messages or [], **kwargs)
+        if isinstance(response, str):
+            metrics.inc("llm_completion_tokens_total", estimate_tokens(response), provider=provider)
+        return response
+    return wrapper
+
+def instrument_embedding_func(embedding_func, provider: str):
+    """Wrap a LightRAG `EmbeddingFunc` with spans, call counts and text counts."""
+    func = embedding_func.func
+
+    @functools.wraps(func)
+    async def wrapper(texts, *args, **kwargs):
+        metrics.inc("embedding_calls_total", provider=provider)
+        metrics.inc("embedding_texts_total", len(texts), provider=provider)
+        metrics.inc("embedding_tokens_total", sum(estimate_tokens(t) for t in texts), provider=provider)
+        with metrics.span("embedding_call", provider=provider):
+            return await func(texts, *args, **kwargs)
+
+    return dataclasses.replace(embedding_func, func=wrapper)
@@ -0,0 +1,147 @@
+import asyncio
+import json
+import os
+
+import build
+from service.build.manifest import MANIFEST_FILE, BuildManifest
+
+SHARED = "## Shared setup\n\n" + " ".join(f"step{i} install configure deploy" for i in range(80)) + "\n"
+
+def write_doc(path, title: str, body: str = SHARED):
+    """Write a markdown document with its own long intro followed by `body`."""
+    intro = " ".join(f"{title.lower()}{i} notes" for i in range(150))
+    path.write_text(f"# {title}\n\n{intro}\n\n{body}", encoding="utf-8")
+
+def url(path) -> str:
+    return f"file://{path}"
+
+def run_build(docs, args):
+    result = asyncio.run(build.build_repos([str(docs)], args))
+    assert result["errors"] == []
+    return result["stats"], BuildManifest(os.path.join(build.WORKING_DIR, MANIFEST_FILE))
+
+def section_duplicate(workdir, build_args):
+    """Build two documents sharing a section; return (docs dir, source doc, doc that lost the section)."""
+    docs = workdir / "docs"
+    docs.mkdir()
+    write_doc(docs / "alpha.md", "Alpha")
+    write_doc(docs / "beta.md", "Beta")
+    stats, manifest = run_build(docs, build_args(max_concurrent=1))
+    assert stats["inserted"] == 2
+    (dropped,) = [name for name in ("alpha.md", "beta.md") if manifest.get(url(docs / name)).get("section_sources")]
+    source = "beta.md" if dropped == "alpha.md" else "alpha.md"
+    assert manifest.get(url(docs / dropped))["section_sources"] == [url(docs / source)]
+    return docs, source, dropped
+
+def test_incremental_build_applies_manifest_diff(workdir, build_args):
+    docs = workdir / "docs"
+    docs.mkdir()
+    for title in ("Alpha", "Beta", "Gamma"):
+        write_doc(docs / f"{title.lower()}.md", title, body="")
+    stats, manifest = run_build(docs, build_args())
+    assert stats["inserted"] == 3
+
+    stats, _ = run_build(docs, build_args(incremental=True))
+    assert stats["fetched"] == 0
+
+    write_doc(docs / "alpha.md", "Alpha", body="## Changed\n\nA new paragraph.\n")
+    (docs / "beta.md").unlink()
+    write_doc(docs / "delta.md", "Delta", body="")
+    stats, manifest = run_build(docs, build_args(incremental=True))
+    assert stats["fetched"] == 2
+    assert stats["inserted"] == 2
+    assert set(manifest.entries) == {url(docs / name) for name in ("alpha.md", "gamma.md", "delta.md")}
+
+def test_section_duplicate_reinserted_when_source_changes(workdir, build_args):
+    docs, source, dropped = section_duplicate(workdir, build_args)
+
+    write_doc(docs / source, source[:-3].title(), body="## Other\n\nNothing in common any more.\n")
+    stats, manifest = run_build(docs, build_args(incremental=True))
+    assert stats["fetched"] == 2
+    assert stats["inserted"] == 2
+    assert not manifest.get(url(docs / dropped)).get("section_sources")
+
+def test_section_duplicate_reinserted_when_source_deleted(workdir, build_args):
+    docs, source, dropped = section_duplicate(workdir, build_args)
+
+    (docs / source).unlink()
+    stats, manifest = run_build(docs, build_args(incremental=True))
+    assert stats["inserted"] == 1
+    assert set(manifest.entries) == {url(docs / dropped)}
+    assert not manifest.get(url(docs / dropped)).get("section_sources")
+
+def test_duplicate_document_inserted_when_original_deleted(workdir, build_args):
+    docs = workdir / "docs"
+    docs.mkdir()
+    write_doc(docs / "alpha.md", "Alpha")
+    (docs / "copy.md").write_text((docs / "alpha.md").read_text(encoding="utf-8"), encoding="utf-8")
+    stats, manifest = run_build(docs, build_args(max_concurrent=1))
+    assert stats["duplicates"] == 1
+    (original,) = [name for name in ("alpha.md", "copy.md") if manifest.get(url(docs / name))["doc_id"]]
+    duplicate = "copy.md" if original == "alpha.md" else "alpha.md"
+
+    (docs / original).unlink()
+    stats, manifest = run_build(docs, build_args(incremental=True))
+    assert stats["inserted"] == 1
+    assert manifest.get(url(docs / duplicate))["doc_id"]
+
+def build_shards_from_api(repos, repo_urls, args, monkeypatch):
+    """Build `repo_urls` as shards, served by the bench stand-in for the GitHub API."""
+    from bench.fake_repo_api import FakeRepoApi
+
+    with FakeRepoApi(repos, latency_ms=2) as api:
+        # spawned workers read their settings from the environment at import time
+        for name, value in {"GITHUB_TOKEN": "test", "GITHUB_API_URL": api.url, "GITHUB_RAW_URL": f"{api.url}/raw",
+                            "HTTP_CACHE": "0", "HTTP_MAX_RETRIES": "0",
+                            "REPO_MAX_IN_FLIGHT": "1", "REPO_MAX_PER_HOST": "1"}.items():
+            monkeypatch.setenv(name, value)
+        return asyncio.run(build.build_shards(repo_urls, args))
+
+def test_sharded_build_reuses_worker(workdir, build_args, monkeypatch):
+    from lightrag import QueryParam
+
+    from bench.corpus import generate_corpus
+    from service.query.shards import ShardRegistry, load_sharded_rag, shard_name
+
+    corpus = sorted(generate_corpus("small").items())
+    repos = {"bench/one": dict(corpus[:6]), "bench/two": dict(corpus[6:12])}
+    repo_urls = ["https://github.com/bench/one", "https://github.com/bench/two"]
+    # one worker builds both shards, each under its own event loop
+    errors = build_shards_from_api(repos, repo_urls, build_args(shard_workers=1, metrics=str(workdir / "metrics.json")),
+                                   monkeypatch)
+
+    assert errors == []
+    assert set(ShardRegistry(build.WORKING_DIR).shards) == {shard_name(repo_url) for repo_url in repo_urls}
+    for repo_url in repo_urls:
+        shard = shard_name(repo_url)
+        manifest = BuildManifest(os.path.join(build.WORKING_DIR, shard, MANIFEST_FILE))
+        assert len([entry for entry in manifest.entries.values() if entry["doc_id"]]) == 6
+        # each shard's metrics cover that shard only
+        with open(workdir / f"metrics.{shard}.json", encoding="utf-8") as f:
+            counters = {counter["name"]: counter["value"] for counter in json.load(f)["counters"] if not counter["labels"]}
+        assert counters["inserted_docs_total"] == 6
+
+    async def ask():
+        # the fake embeddings hash words, so quoting a document is what reliably matches its chunks
+        rag = await load_sharded_rag("fake", build.WORKING_DIR)
+        query = corpus[0][1][:1000]
+        try:
+            return (await rag.aquery(query, QueryParam(mode="naive", only_need_context=True)),
+                    await rag.aquery(query, QueryParam(mode="naive")))
+        finally:
+            await rag.finalize_storages()
+
+    context, answer = asyncio.run(ask())
+    assert "### Source: https://github.com/bench/one" in context
+    assert answer.startswith("Fake answer")
+
+def test_sharded_build_skips_failed_shard(workdir, build_args, monkeypatch):
+    from bench.corpus import generate_corpus
+    from service.query.shards import ShardRegistry, shard_name
+
+    repos = {"bench/one": dict(sorted(generate_corpus("small").items())[:3])}
+    repo_urls = ["https://github.com/bench/one", "https://github.com/bench/missing"]
+    errors = build_shards_from_api(repos, repo_urls, build_args(shard_workers=1), monkeypatch)
+
+    assert len(errors) == 1 and errors[0].startswith(shard_name(repo_urls[1]))
+    assert set(ShardRegistry(build.WORKING_DIR).shards) == {shard_name(repo_urls[0])}